@@ -0,0 +1,105 @@
+from django.conf import settings
+from .caching import TTLCache
+from .models import User, UAdmin, UAdminAgency, Ba, BaProject, Project
+
+
+class AccessScope:
+    """
+    The agencies (companies), projects and BAs a principal is allowed to see.
+    All ids are frozensets so permission checks are plain set lookups.
+    """
+
+    def __init__(self, agency_ids=(), project_ids=(), ba_ids=()):
+        self.agency_ids = frozenset(agency_ids)
+        self.project_ids = frozenset(project_ids)
+        self.ba_ids = frozenset(ba_ids)
+
+    def __repr__(self):
+        return (
+            f"AccessScope(agencies={len(self.agency_ids)}, "
+            f"projects={len(self.project_ids)}, bas={len(self.ba_ids)})"
+        )
+
+
+EMPTY_SCOPE = AccessScope()
+
+scope_cache = TTLCache(
+    max_entries=getattr(settings, 'ACCESS_SCOPE_CACHE_MAX_ENTRIES', 5000),
+    ttl=getattr(settings, 'ACCESS_SCOPE_CACHE_TTL', 30),
+)
+
+
+def principal_key(user):
+    if isinstance(user, UAdmin):
+        return ('admin', user.pk)
+    if isinstance(user, Ba):
+        return ('ba', user.pk)
+    if isinstance(user, User):
+        return ('user', user.pk)
+    return None
+
+
+def compute_access_scope(user):
+    """
+    Build the access scope for a principal straight from the database:
+    - UAdmin: their agencies, the projects of those agencies and the BAs of those agencies
+    - Ba: their company, the projects assigned through BaProject and themselves
+    - User: their agency, the projects of that agency and the BAs of that agency
+    """
+    if isinstance(user, UAdmin):
+        agency_ids = list(UAdminAgency.objects.filter(uadmin_id=user.id).values_list('agency_id', flat=True))
+        if not agency_ids:
+            return EMPTY_SCOPE
+        return AccessScope(
+            agency_ids=agency_ids,
+            project_ids=Project.objects.filter(company__in=agency_ids).values_list('id', flat=True),
+            ba_ids=Ba.objects.filter(company__in=agency_ids).values_list('id', flat=True),
+        )
+
+    if isinstance(user, Ba):
+        return AccessScope(
+            agency_ids=[user.company] if user.company else [],
+            project_ids=BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True),
+            ba_ids=[user.id],
+        )
+
+    if isinstance(user, User) and user.agency_id:
+        return AccessScope(
+            agency_ids=[user.agency_id],
+            project_ids=Project.objects.filter(company=user.agency_id).values_list('id', flat=True),
+            ba_ids=Ba.objects.filter(company=user.agency_id).values_list('id', flat=True),
+        )
+
+    return EMPTY_SCOPE
+
+
+def get_access_scope(request):
+    """
+    Return the access scope of the authenticated principal.
+    Computed at most once per request and shared across requests of the same
+    principal for ACCESS_SCOPE_CACHE_TTL seconds.
+    """
+    scope = getattr(request, '_access_scope', None)
+    if scope is not None:
+        return scope
+
+    user = request.user
+    key = principal_key(user)
+    if key is None:
+        scope = EMPTY_SCOPE
+    else:
+        scope = scope_cache.get(key)
+        if scope is None:
+            scope = compute_access_scope(user)
+            scope_cache.set(key, scope)
+
+    request._access_scope = scope
+    return scope
+
+
+def invalidate_access_scopes():
+    """
+    Forget every cached scope. Project, BaProject, agency membership and principal
+    changes can widen or narrow many scopes at once, so the whole cache is dropped.
+    """
+    scope_cache.clear()
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+from .collection_query import CollectionQuery, int_param
+
+AGGREGATE_FUNCTIONS = {
+    'count': 'COUNT',
+    'sum': 'SUM',
+    'avg': 'AVG',
+    'min': 'MIN',
+    'max': 'MAX',
+    'count_distinct': 'COUNT',
+}
+DATE_GRANULARITIES = ('day', 'week', 'month')
+
+
+class AggregateQuery(CollectionQuery):
+    """
+    A validated GROUP BY over one data table, computed entirely in SQL.
+    Accepts the filters of CollectionQuery (project, start_date, end_date, min_id, max_id)
+    plus:
+    - group_by: comma-separated dimensions: project, ba_id, t_date (by day) or
+      t_date:day|week|month, and any sub_* column
+    - metrics: comma-separated aggregates: count, or <function>:<column> with function one
+      of sum, avg, min, max, count_distinct (default: count)
+    - ba_id: only rows of this BA
+    - limit: most groups returned (default and maximum AGGREGATE_MAX_GROUPS)
+    Rows are restricted to project_ids, the projects the caller may see.
+    """
+
+    def __init__(self, table, params, project_ids):
+        super().__init__(table, params)
+        # Aggregates are never keyset-paged
+        self.paginated = False
+        self._restrict_projects(project_ids)
+        self._parse_ba(params)
+        self.dimensions = self._parse_group_by(params.get('group_by'))
+        self.metrics = self._parse_metrics(params.get('metrics'))
+
+        max_groups = getattr(settings, 'AGGREGATE_MAX_GROUPS', 10000)
+        limit = int_param(params, 'limit')
+        if limit is None:
+            limit = max_groups
+        if limit < 1:
+            raise ValidationError({'limit': 'Must be a positive integer.'})
+        self.limit = min(limit, max_groups)
+
+    def _restrict_projects(self, project_ids):
+        self._require_column('project', 'table')
+        if not project_ids:
+            self.conditions.append('1 = 0')
+            return
+        placeholders = ', '.join(['%s'] * len(project_ids))
+        self.conditions.append(f"{connection.ops.quote_name('project')} IN ({placeholders})")
+        self.values.extend(sorted(project_ids))
+
+    def _parse_ba(self, params):
+        ba_id = int_param(params, 'ba_id')
+        if ba_id is not None:
+            self._require_column('ba_id', 'ba_id')
+            self._add('ba_id', '=', ba_id)
+
+    def _parse_group_by(self, value):
+        """[(output name, SQL expression, params)] for each requested dimension"""
+        quote = connection.ops.quote_name
+        dimensions = []
+        for name in [part.strip() for part in (value or '').split(',') if part.strip()]:
+            column, _, granularity = name.partition(':')
+            if column == 't_date':
+                granularity = granularity or 'day'
+                if granularity not in DATE_GRANULARITIES:
+                    raise ValidationError({'group_by': f"t_date can be grouped by {', '.join(DATE_GRANULARITIES)}."})
+                self._require_column('t_date', 'group_by')
+                sql, params = connection.ops.date_trunc_sql(granularity, quote('t_date'), ())
+                dimensions.append((f't_date_{granularity}', sql, list(params)))
+            elif granularity:
+                raise ValidationError({'group_by': f'Only t_date takes a granularity, not {column}.'})
+            elif column in ('project', 'ba_id') or column.startswith('sub_'):
+                self._require_column(column, 'group_by')
+                dimensions.append((column, quote(column), []))
+            else:
+                raise ValidationError({'group_by': f'Cannot group by {column}; use project, ba_id, t_date or a sub_* column.'})
+        names = [name for name, _, _ in dimensions]
+        if len(set(names)) != len(names):
+            raise ValidationError({'group_by': 'Each dimension can only be given once.'})
+        return dimensions
+
+    def _parse_metrics(self, value):
+        """[(output name, SQL expression)] for each requested aggregate"""
+        quote = connection.ops.quote_name
+        metrics = []
+        for name in [part.strip() for part in (value or 'count').split(',') if part.strip()]:
+            function, _, column = name.partition(':')
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValidationError({'metrics': f"Unknown aggregate {function}; use {', '.join(AGGREGATE_FUNCTIONS)}."})
+            if function == 'count' and not column:
+                metrics.append(('count', 'COUNT(*)'))
+                continue
+            if not column:
+                raise ValidationError({'metrics': f'{function} needs a column, e.g. {function}:sub_quantity.'})
+            self._require_column(column, 'metrics')
+            distinct = 'DISTINCT ' if function == 'count_distinct' else ''
+            metrics.append((f'{function}_{column}', f'{AGGREGATE_FUNCTIONS[function]}({distinct}{quote(column)})'))
+        return list(dict(metrics).items())
+
+    @property
+    def output_columns(self):
+        return [name for name, _, _ in self.dimensions] + [name for name, _ in self.metrics]
+
+    def sql(self, paginate=False):
+        """Return (sql, params); groups are ordered by their dimensions"""
+        quote = connection.ops.quote_name
+        select = [f'{sql} AS {quote(name)}' for name, sql, _ in self.dimensions]
+        select += [f'{sql} AS {quote(name)}' for name, sql in self.metrics]
+        params = [param for _, _, dimension_params in self.dimensions for param in dimension_params]
+
+        sql = f"SELECT {', '.join(select)} FROM {quote(self.table)}"
+        if self.conditions:
+            sql += ' WHERE ' + ' AND '.join(self.conditions)
+        if self.dimensions:
+            # Ordinals avoid repeating the dimension expressions (and their params)
+            ordinals = ', '.join(str(position) for position in range(1, len(self.dimensions) + 1))
+            sql += f' GROUP BY {ordinals} ORDER BY {ordinals}'
+        # One extra group tells whether the result was cut off
+        sql += f' LIMIT {self.limit + 1}'
+        return sql, params + list(self.values)
+
+    def split_page(self, rows):
+        """Returns (rows, truncated)"""
+        return [list(row) for row in rows[:self.limit]], len(rows) > self.limit
@@ -0,0 +1,159 @@
+import math
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import transaction
+from .caching import TTLCache
+from .models import ProjectAssoc, SubmissionAnswer
+from .form_definitions import get_form_version
+
+# How each answer is typed, from the ProjectAssoc field_type of its field (exact values only:
+# substrings would also catch types like "update" or "phone_number")
+NUMBER_FIELD_TYPES = frozenset(('number', 'numeric', 'integer', 'int', 'decimal', 'float', 'amount', 'price', 'quantity'))
+DATE_FIELD_TYPES = frozenset(('date', 'datetime', 'datetime-local'))
+
+# ({column_name: kind}, {field id: column_name}) per project, keyed by form definition
+# version so edits take effect at once
+project_fields_cache = TTLCache(max_entries=1000, ttl=300)
+
+def projection_enabled():
+    return getattr(settings, 'ANSWER_PROJECTION_ENABLED', False)
+
+
+def field_kind(field_type):
+    """'number', 'date' or 'text' for a ProjectAssoc field_type"""
+    field_type = (field_type or '').strip().lower()
+    if field_type in DATE_FIELD_TYPES:
+        return 'date'
+    if field_type in NUMBER_FIELD_TYPES:
+        return 'number'
+    return 'text'
+
+
+def get_project_fields(project_ids):
+    """
+    {project_id: ({column_name: kind}, {field id: column_name})} for the given projects,
+    one query for those not cached. Field ids are strings, as they arrive in answers.
+    """
+    fields = {}
+    missing = []
+    for project_id in set(project_ids):
+        cached = project_fields_cache.get((project_id, get_form_version(project_id)))
+        if cached is None:
+            missing.append(project_id)
+        else:
+            fields[project_id] = cached
+
+    if missing:
+        loaded = {project_id: ({}, {}) for project_id in missing}
+        for field_id, project_id, column_name, field_type in ProjectAssoc.objects.filter(project__in=missing) \
+                .values_list('id', 'project', 'column_name', 'field_type'):
+            kinds, columns = loaded[project_id]
+            kinds[column_name] = field_kind(field_type)
+            columns[str(field_id)] = column_name
+        for project_id, entry in loaded.items():
+            project_fields_cache.set((project_id, get_form_version(project_id)), entry)
+        fields.update(loaded)
+    return fields
+
+
+def iter_answers(answers, field_columns=None):
+    """
+    (column_name, value) pairs of a submission's answers: either {column_name: value} or a
+    list of {"column_name"/"field_id": ..., "value"/"answer": ...} entries. A field_id that is
+    a ProjectAssoc id is mapped to its column through field_columns ({field id: column_name});
+    otherwise it is taken as the column name, which is what form definitions serve as field_id.
+    """
+    field_columns = field_columns or {}
+    if isinstance(answers, dict):
+        yield from answers.items()
+    elif isinstance(answers, list):
+        for entry in answers:
+            if not isinstance(entry, dict):
+                continue
+            key = entry.get('column_name')
+            if key is None and entry.get('field_id') is not None:
+                key = field_columns.get(str(entry['field_id']), entry['field_id'])
+            if key is not None:
+                yield str(key), entry.get('value', entry.get('answer'))
+
+
+def _to_number(value):
+    try:
+        if isinstance(value, (bool, int, float)):
+            number = float(value)
+        else:
+            number = float(str(value).strip().replace(',', ''))
+    except (ValueError, OverflowError):
+        return None
+    # nan and inf parse fine but the database rejects them, failing the whole submission
+    return number if math.isfinite(number) else None
+
+
+def _to_date(value):
+    text = str(value).strip()
+    for parse in (date.fromisoformat, lambda v: datetime.fromisoformat(v).date()):
+        try:
+            return parse(text)
+        except ValueError:
+            continue
+    return None
+
+
+def typed_values(value, kind):
+    """
+    The SubmissionAnswer value columns for one answer value. Lists (multiple choice)
+    give one entry per item; empty answers give none.
+    """
+    values = value if isinstance(value, list) else [value]
+    typed = []
+    for item in values:
+        if item is None or item == '' or isinstance(item, (dict, list)):
+            continue
+        text = str(item).lower() if isinstance(item, bool) else str(item)
+        entry = {'value_text': text[:255], 'value_number': None, 'value_date': None}
+        if kind == 'number' or (kind == 'text' and isinstance(item, (int, float))):
+            entry['value_number'] = _to_number(item)
+        elif kind == 'date':
+            entry['value_date'] = _to_date(item)
+        typed.append(entry)
+    return typed
+
+
+def extract_answers(submission, columns, field_columns=None):
+    """
+    SubmissionAnswer rows (unsaved) for the answers of a submission that match its project's
+    fields; columns is {column_name: kind}, field_columns {field id: column_name}
+    """
+    rows = []
+    for key, value in iter_answers(submission.answers, field_columns):
+        kind = columns.get(key)
+        if kind is None:
+            # Not a field of the project (stale or client-side key)
+            continue
+        for entry in typed_values(value, kind):
+            rows.append(SubmissionAnswer(
+                submission_id=submission.pk, project=submission.project_id, column_name=key[:128], **entry
+            ))
+    return rows
+
+
+def project_answers(submissions, replace=False):
+    """
+    Write the SubmissionAnswer rows of the given (saved) submissions. With replace=True
+    the rows they already have are dropped first. Returns the number of rows written.
+    """
+    submissions = [submission for submission in submissions if submission.pk is not None]
+    if not submissions:
+        return 0
+    fields = get_project_fields({submission.project_id for submission in submissions})
+    rows = [
+        row
+        for submission in submissions
+        for row in extract_answers(submission, *fields.get(submission.project_id, ({}, {})))
+    ]
+    with transaction.atomic():
+        if replace:
+            SubmissionAnswer.objects.filter(submission__in=[submission.pk for submission in submissions]).delete()
+        SubmissionAnswer.objects.bulk_create(rows, batch_size=getattr(settings, 'BULK_INSERT_BATCH_SIZE', 500))
+    return len(rows)
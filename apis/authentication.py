@@ -1,86 +1,133 @@
+import copy
+from collections import namedtuple
+
+from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from .caching import TTLCache
 from .models import AuthToken, AdminAuthToken, BaAuthToken, User, UAdmin, Ba
 
-class TokenAuthentication(BaseAuthentication):
+# Maps the Authorization header prefix to (token model, principal field, error message)
+TOKEN_TYPES = {
+    'token': (AuthToken, 'user', 'Invalid token.'),
+    'admin_token': (AdminAuthToken, 'admin', 'Invalid admin token.'),
+    'ba_token': (BaAuthToken, 'ba', 'Invalid BA token.'),
+}
+
+# What the token cache remembers for a key: the principal type ('user', 'admin', 'ba'),
+# its primary key, whether it may log in, and the token row with its principal attached.
+CachedToken = namedtuple('CachedToken', ['principal_type', 'principal_id', 'is_active', 'token'])
+
+token_cache = TTLCache(
+    max_entries=getattr(settings, 'TOKEN_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+def resolve_token(token_type, token_key):
     """
-    Custom authentication for User tokens.
-    Expects Authorization header: "Token <token_key>"
+    Resolve a token key to (principal, token) for the given token type.
+    Warm keys are served from the in-process token cache without touching the database.
+    Raises AuthenticationFailed for unknown keys and inactive accounts.
     """
-    def authenticate(self, request):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return None
+    model, principal_field, invalid_message = TOKEN_TYPES[token_type]
 
+    entry = token_cache.get((token_type, token_key))
+    if entry is None:
         try:
-            token_type, token_key = auth_header.split()
-            if token_type.lower() != 'token':
-                return None
-        except ValueError:
-            return None
+            token = model.objects.select_related(principal_field).get(key=token_key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(invalid_message)
 
-        try:
-            token = AuthToken.objects.select_related('user').get(key=token_key)
-        except AuthToken.DoesNotExist:
-            raise AuthenticationFailed('Invalid token.')
+        principal = getattr(token, principal_field)
+        entry = CachedToken(
+            principal_type=principal_field,
+            principal_id=principal.pk,
+            is_active=getattr(principal, 'is_active', True),
+            token=token,
+        )
+        token_cache.set((token_type, token_key), entry)
 
-        if not token.user.is_active:
-            raise AuthenticationFailed('User account inactive.')
+    if not entry.is_active:
+        raise AuthenticationFailed('User account inactive.')
 
-        return (token.user, token)
+    # Hand each request its own copies so per-request attribute caching never leaks
+    # between requests sharing the cached entry.
+    principal = copy.copy(getattr(entry.token, principal_field))
+    token = copy.copy(entry.token)
+    setattr(token, principal_field, principal)
+    return (principal, token)
 
-class AdminTokenAuthentication(BaseAuthentication):
-    """
-    Custom authentication for UAdmin tokens.
-    Expects Authorization header: "Admin_Token <token_key>"
-    """
-    def authenticate(self, request):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return None
 
-        try:
-            token_type, token_key = auth_header.split()
-            if token_type.lower() != 'admin_token':
-                return None
-        except ValueError:
-            return None
+def invalidate_token(token_type, token_key):
+    """Drop a single token key from the token cache"""
+    token_cache.delete((token_type, token_key))
 
-        try:
-            token = AdminAuthToken.objects.select_related('admin').get(key=token_key)
-        except AdminAuthToken.DoesNotExist:
-            raise AuthenticationFailed('Invalid admin token.')
 
-        # Add any active status check for UAdmin if applicable
-        # if not token.admin.is_active:
-        #     raise AuthenticationFailed('Admin account inactive.')
+def invalidate_principal(principal_type, principal_id):
+    """Drop every cached token belonging to the given principal"""
+    return token_cache.delete_where(
+        lambda key, entry: entry.principal_type == principal_type and entry.principal_id == principal_id
+    )
 
-        return (token.admin, token)
 
-class BaTokenAuthentication(BaseAuthentication):
+def parse_authorization_header(request):
     """
-    Custom authentication for BA tokens.
-    Expects Authorization header: "Ba_Token <token_key>"
+    Split the Authorization header into (lowercased prefix, token key).
+    Returns None when the header is missing or not of the form "<prefix> <key>".
     """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+
+    try:
+        token_type, token_key = auth_header.split()
+    except ValueError:
+        return None
+    return (token_type.lower(), token_key)
+
+
+class MultiTokenAuthentication(BaseAuthentication):
+    """
+    Single-pass authentication for every token type.
+    Parses the Authorization header once and routes on its prefix:
+    "Token <key>" -> User, "Admin_Token <key>" -> UAdmin, "Ba_Token <key>" -> Ba.
+    The principal is resolved in at most one query (none when the token cache is warm)
+    and views receive the same User/UAdmin/Ba instances as before.
+    """
+    token_types = tuple(TOKEN_TYPES)
+
     def authenticate(self, request):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
+        parsed = parse_authorization_header(request)
+        if parsed is None:
             return None
 
-        try:
-            token_type, token_key = auth_header.split()
-            if token_type.lower() != 'ba_token':
-                return None
-        except ValueError:
+        token_type, token_key = parsed
+        if token_type not in self.token_types:
             return None
 
-        try:
-            token = BaAuthToken.objects.select_related('ba').get(key=token_key)
-        except BaAuthToken.DoesNotExist:
-            raise AuthenticationFailed('Invalid BA token.')
+        return resolve_token(token_type, token_key)
+
+
+class TokenAuthentication(MultiTokenAuthentication):
+    """
+    Custom authentication for User tokens.
+    Expects Authorization header: "Token <token_key>"
+    """
+    token_types = ('token',)
 
-        # Add any active status check for Ba if applicable
-        # if not token.ba.is_active:
-        #     raise AuthenticationFailed('BA account inactive.')
+class AdminTokenAuthentication(MultiTokenAuthentication):
+    """
+    Custom authentication for UAdmin tokens.
+    Expects Authorization header: "Admin_Token <token_key>"
+    """
+    # UAdmin has no is_active flag yet, so resolve_token treats admins as active
+    token_types = ('admin_token',)
 
-        return (token.ba, token)
\ No newline at end of file
+class BaTokenAuthentication(MultiTokenAuthentication):
+    """
+    Custom authentication for BA tokens.
+    Expects Authorization header: "Ba_Token <token_key>"
+    """
+    # Ba has no is_active flag yet, so resolve_token treats BAs as active
+    token_types = ('ba_token',)
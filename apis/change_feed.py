@@ -0,0 +1,187 @@
+import base64
+import binascii
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .collection_query import int_param
+
+# Column whose presence switches a feed from id order to modification order
+UPDATED_AT = 'updated_at'
+
+
+def encode_feed_cursor(last_id, updated_at=None):
+    """Opaque position in a feed: the last row's id, plus its updated_at in modification order"""
+    if updated_at is None:
+        value = f'id:{last_id}'
+    else:
+        value = f'ts:{updated_at.isoformat()}|{last_id}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_feed_cursor(token):
+    """Returns (updated_at or None, last_id)"""
+    try:
+        prefix, _, value = base64.urlsafe_b64decode(token.encode()).decode().partition(':')
+        if prefix == 'id':
+            return None, int(value)
+        if prefix == 'ts':
+            updated_at, _, last_id = value.rpartition('|')
+            return datetime.fromisoformat(updated_at), int(last_id)
+        raise ValueError
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+def _aware(value):
+    if settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value, timezone.get_default_timezone())
+    return value
+
+
+class ChangeFeed(ABC):
+    """
+    One page of a table's changes after a cursor, built from query params:
+    - cursor: the next_cursor of the previous page (default: the start of the table)
+    - since: start from this date or ISO datetime instead (tables with updated_at only)
+    - limit: rows per page (default CHANGE_FEED_PAGE_SIZE, at most CHANGE_FEED_MAX_PAGE_SIZE)
+    Rows come in id order, or in (updated_at, id) order when the table has an updated_at
+    column, so edits show up again as changes. An id feed only sees new rows.
+
+    Ids and timestamps are assigned before a transaction commits, so a row can become
+    visible after rows that sort later have been read, and the cursor would pass it by.
+    Rows written less than CHANGE_FEED_SETTLE_SECONDS ago are held back until the next
+    sync: by updated_at, or in an id feed by settle_column (a creation timestamp), with the
+    page ending before the first unsettled id. An id feed without a settle_column (the
+    collection tables have no creation time) cannot hold rows back and can miss a row
+    whose transaction commits after a higher id was read.
+    """
+
+    def __init__(self, columns, params, settle_column=None):
+        self.columns = list(columns)
+        self.mode = UPDATED_AT if UPDATED_AT in self.columns else 'id'
+        self.settle_column = UPDATED_AT if self.mode == UPDATED_AT else settle_column
+        settle_seconds = getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 60)
+        self.settled_before = timezone.now() - timedelta(seconds=settle_seconds) \
+            if self.settle_column and settle_seconds > 0 else None
+
+        max_limit = getattr(settings, 'CHANGE_FEED_MAX_PAGE_SIZE', 10000)
+        limit = int_param(params, 'limit')
+        if limit is None:
+            limit = getattr(settings, 'CHANGE_FEED_PAGE_SIZE', 1000)
+        if limit < 1:
+            raise ValidationError({'limit': 'Must be a positive integer.'})
+        self.limit = min(limit, max_limit)
+
+        self.after_updated_at, self.after_id = None, 0
+        if params.get('cursor'):
+            self.after_updated_at, self.after_id = decode_feed_cursor(params['cursor'])
+            if (self.after_updated_at is not None) != (self.mode == UPDATED_AT):
+                raise ValidationError({'cursor': 'The cursor does not belong to this feed.'})
+        elif params.get('since'):
+            if self.mode != UPDATED_AT:
+                raise ValidationError({'since': 'This feed has no updated_at column; page by cursor instead.'})
+            try:
+                since = datetime.fromisoformat(params['since'])
+            except ValueError:
+                raise ValidationError({'since': 'Must be a date or an ISO 8601 datetime.'})
+            # An id below every row's, so rows modified at exactly `since` are included
+            self.after_updated_at, self.after_id = since, -1
+        if self.after_updated_at is not None:
+            self.after_updated_at = _aware(self.after_updated_at)
+
+    @abstractmethod
+    def fetch(self):
+        """The rows after the cursor in feed order, as tuples of self.columns; at most limit + 1"""
+
+    def row_updated_at(self, value):
+        return value
+
+    def page(self):
+        """Returns (rows, next_cursor, has_more); next_cursor is set even on an empty page"""
+        rows = self.fetch()
+        has_more = len(rows) > self.limit
+        rows = [list(row) for row in rows[:self.limit]]
+        if rows:
+            last = rows[-1]
+            last_id = last[self.columns.index('id')]
+            updated_at = self.row_updated_at(last[self.columns.index(UPDATED_AT)]) if self.mode == UPDATED_AT else None
+            next_cursor = encode_feed_cursor(last_id, updated_at)
+        else:
+            next_cursor = encode_feed_cursor(self.after_id, self.after_updated_at)
+        return rows, next_cursor, has_more
+
+
+class TableChangeFeed(ChangeFeed):
+    """Change feed over a raw table (the collection tables, whose columns are introspected)"""
+
+    def __init__(self, table, columns, params):
+        super().__init__(columns, params)
+        self.table = table
+
+    def row_updated_at(self, value):
+        # Raw cursors return naive datetimes, which are UTC when USE_TZ is on
+        if settings.USE_TZ and timezone.is_naive(value):
+            return timezone.make_aware(value, dt_timezone.utc)
+        return value
+
+    def sql(self):
+        quote = connection.ops.quote_name
+        sql = f"SELECT {', '.join(quote(col) for col in self.columns)} FROM {quote(self.table)}"
+        conditions, params = [], []
+        if self.mode == UPDATED_AT:
+            if self.after_updated_at is not None:
+                updated_at = connection.ops.adapt_datetimefield_value(self.after_updated_at)
+                conditions.append(f"({quote(UPDATED_AT)} > %s OR ({quote(UPDATED_AT)} = %s AND {quote('id')} > %s))")
+                params += [updated_at, updated_at, self.after_id]
+            if self.settled_before is not None:
+                conditions.append(f"{quote(UPDATED_AT)} <= %s")
+                params.append(connection.ops.adapt_datetimefield_value(self.settled_before))
+            order = f"{quote(UPDATED_AT)}, {quote('id')}"
+        else:
+            conditions.append(f"{quote('id')} > %s")
+            params.append(self.after_id)
+            order = quote('id')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return sql + f" ORDER BY {order} LIMIT {self.limit + 1}", params
+
+    def fetch(self):
+        with connection.cursor() as cursor:
+            cursor.execute(*self.sql())
+            return cursor.fetchall()
+
+
+class QuerySetChangeFeed(ChangeFeed):
+    """Change feed over a queryset (model tables), so fields come back converted (JSON, UUIDs)"""
+
+    def __init__(self, queryset, params, settle_column=None):
+        columns = [field.attname for field in queryset.model._meta.concrete_fields]
+        super().__init__(columns, params, settle_column)
+        self.queryset = queryset
+
+    def fetch(self):
+        queryset = self.queryset
+        if self.mode == UPDATED_AT:
+            if self.after_updated_at is not None:
+                queryset = queryset.filter(
+                    Q(updated_at__gt=self.after_updated_at)
+                    | Q(updated_at=self.after_updated_at, id__gt=self.after_id)
+                )
+            if self.settled_before is not None:
+                queryset = queryset.filter(updated_at__lte=self.settled_before)
+            queryset = queryset.order_by(UPDATED_AT, 'id')
+        else:
+            queryset = queryset.filter(id__gt=self.after_id)
+            if self.settled_before is not None:
+                # End the page before the first row that may still have lower ids committing
+                first_unsettled = queryset.filter(**{f'{self.settle_column}__gt': self.settled_before}) \
+                    .order_by('id').values_list('id', flat=True).first()
+                if first_unsettled is not None:
+                    queryset = queryset.filter(id__lt=first_unsettled)
+            queryset = queryset.order_by('id')
+        return list(queryset.values_list(*self.columns)[:self.limit + 1])
@@ -0,0 +1,211 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, models
+from rest_framework.exceptions import ValidationError
+from .caching import TTLCache
+
+ALLOWED_COLLECTION_TABLES = [
+    'app_data', 'saff_combined', 'coke_combined', 'airtel_combined',
+    'baims_combined', 'kspca_combined', 'redbull_outlet', 'total_kenya',
+    'coop', 'coop2'
+]
+
+# Real column lists of the collection tables. Most of their sub_* columns are not on the
+# Django models, so they are read from the database and kept for a few minutes.
+column_cache = TTLCache(max_entries=len(ALLOWED_COLLECTION_TABLES), ttl=300)
+column_field_cache = TTLCache(max_entries=len(ALLOWED_COLLECTION_TABLES), ttl=300)
+
+
+def get_table_columns(table):
+    """Return the column names of a collection table, in table order, from introspection"""
+    if table not in ALLOWED_COLLECTION_TABLES:
+        raise ValidationError({'collection': f'Invalid or disallowed collection: {table}'})
+    columns = column_cache.get(table)
+    if columns is None:
+        with connection.cursor() as cursor:
+            description = connection.introspection.get_table_description(cursor, table)
+        columns = [col.name for col in description]
+        column_cache.set(table, columns)
+    return columns
+
+
+def get_column_fields(table):
+    """
+    {column: unbound Django field} for a collection table, built from introspection the
+    way inspectdb builds them, so values for the sub_* columns can be type-checked with
+    to_python() and run_validators() like declared fields. Columns of unknown type are left out.
+    """
+    get_table_columns(table)
+    fields = column_field_cache.get(table)
+    if fields is None:
+        with connection.cursor() as cursor:
+            description = connection.introspection.get_table_description(cursor, table)
+        fields = {}
+        for column in description:
+            try:
+                field_type = connection.introspection.get_field_type(column.type_code, column)
+            except KeyError:
+                continue
+            field_class = getattr(models, field_type, None)
+            if field_class is None:
+                continue
+            params = {}
+            if field_type == 'CharField' and column.display_size:
+                params['max_length'] = int(column.display_size)
+            elif field_type == 'DecimalField':
+                params['max_digits'] = column.precision if column.precision is not None else 10
+                params['decimal_places'] = column.scale if column.scale is not None else 5
+            fields[column.name] = field_class(null=True, **params)
+        column_field_cache.set(table, fields)
+    return fields
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(f'id:{last_id}'.encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        prefix, _, value = base64.urlsafe_b64decode(token.encode()).decode().partition(':')
+        if prefix != 'id':
+            raise ValueError
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+def int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an integer.'})
+
+
+def date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: 'Must be a date in YYYY-MM-DD format.'})
+
+
+class CollectionQuery:
+    """
+    A validated, parameterized SELECT over one collection table built from query params:
+    - columns: comma-separated column names (default: every column)
+    - project: one project id or a comma-separated list
+    - start_date / end_date: inclusive t_date range (YYYY-MM-DD)
+    - min_id / max_id: inclusive id range
+    - cursor / page_size: keyset page on id; either one turns paging on
+    Identifiers are only ever taken from the table's introspected columns and
+    every value is passed as a query parameter.
+    """
+
+    def __init__(self, table, params):
+        self.table = table
+        self.table_columns = get_table_columns(table)
+        self.columns = self._parse_columns(params.get('columns'))
+        self.conditions = []
+        self.values = []
+        self._parse_filters(params)
+
+        self.paginated = 'cursor' in params or 'page_size' in params
+        self.page_size = None
+        if self.paginated:
+            max_page_size = getattr(settings, 'KEYSET_PAGE_SIZE_MAX', 500)
+            page_size = int_param(params, 'page_size')
+            if page_size is None:
+                page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+            if page_size < 1:
+                raise ValidationError({'page_size': 'Must be a positive integer.'})
+            self.page_size = min(page_size, max_page_size)
+            if params.get('cursor'):
+                self._add('id', '>', decode_cursor(params['cursor']))
+
+    def _parse_columns(self, value):
+        if not value:
+            return list(self.table_columns)
+        columns = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in columns if name not in self.table_columns]
+        if unknown:
+            raise ValidationError({'columns': f"Unknown columns for {self.table}: {', '.join(unknown)}"})
+        return list(dict.fromkeys(columns))
+
+    def _require_column(self, column, param):
+        if column not in self.table_columns:
+            raise ValidationError({param: f'{self.table} has no {column} column.'})
+
+    def _add(self, column, operator, value):
+        self.conditions.append(f'{connection.ops.quote_name(column)} {operator} %s')
+        self.values.append(value)
+
+    def _parse_filters(self, params):
+        project = params.get('project')
+        if project:
+            self._require_column('project', 'project')
+            try:
+                project_ids = [int(pid) for pid in project.split(',') if pid.strip()]
+            except ValueError:
+                raise ValidationError({'project': 'Must be an integer or a comma-separated list of integers.'})
+            placeholders = ', '.join(['%s'] * len(project_ids))
+            self.conditions.append(f"{connection.ops.quote_name('project')} IN ({placeholders})")
+            self.values.extend(project_ids)
+
+        start_date = date_param(params, 'start_date')
+        end_date = date_param(params, 'end_date')
+        if start_date or end_date:
+            self._require_column('t_date', 'start_date' if start_date else 'end_date')
+        if start_date:
+            self._add('t_date', '>=', start_date)
+        if end_date:
+            self._add('t_date', '<=', end_date)
+
+        min_id = int_param(params, 'min_id')
+        max_id = int_param(params, 'max_id')
+        if min_id is not None:
+            self._add('id', '>=', min_id)
+        if max_id is not None:
+            self._add('id', '<=', max_id)
+
+    @property
+    def select_columns(self):
+        """Columns actually selected; id is added to keyset pages so the cursor can advance"""
+        if self.paginated and 'id' not in self.columns:
+            return self.columns + ['id']
+        return self.columns
+
+    def sql(self, paginate=True):
+        """
+        Return (sql, params) for the query. With paginate=False (streamed exports) the
+        cursor still filters on id but every remaining row is selected.
+        """
+        paginate = paginate and self.paginated
+        quote = connection.ops.quote_name
+        columns = self.select_columns if paginate else self.columns
+        sql = f"SELECT {', '.join(quote(col) for col in columns)} FROM {quote(self.table)}"
+        if self.conditions:
+            sql += ' WHERE ' + ' AND '.join(self.conditions)
+        if paginate:
+            sql += f" ORDER BY {quote('id')} LIMIT {self.page_size + 1}"
+        return sql, list(self.values)
+
+    def split_page(self, rows):
+        """
+        Trim the look-ahead row off a keyset page.
+        Returns (rows, next_cursor) with rows restricted to the requested columns.
+        """
+        next_cursor = None
+        if self.paginated and len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            next_cursor = encode_cursor(rows[-1][self.select_columns.index('id')])
+        if len(self.select_columns) != len(self.columns):
+            rows = [row[:len(self.columns)] for row in rows]
+        return rows, next_cursor
@@ -0,0 +1,225 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .streaming import iter_query
+
+COLUMNAR_CONTENT_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+    'arrows': 'application/vnd.apache.arrow.stream',
+}
+
+# Text columns that only ever hold numbers; exported as floats so analysts need not parse them
+FLOAT_TEXT_COLUMNS = ('latitude', 'longitude')
+
+# Column kind by the Django field type introspection reports for it
+FIELD_KINDS = {
+    'AutoField': 'int', 'BigAutoField': 'int', 'SmallAutoField': 'int',
+    'IntegerField': 'int', 'BigIntegerField': 'int', 'SmallIntegerField': 'int',
+    'PositiveIntegerField': 'int', 'PositiveBigIntegerField': 'int', 'PositiveSmallIntegerField': 'int',
+    'FloatField': 'float', 'DecimalField': 'float',
+    'BooleanField': 'bool',
+    'DateField': 'date', 'DateTimeField': 'datetime', 'TimeField': 'time',
+}
+
+
+def columnar_available():
+    """Whether pyarrow, which the Parquet and Arrow exports need, is installed"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_column_kinds(table):
+    """{column: kind} for a table, kind being int, float, bool, date, datetime, time or text"""
+    with connection.cursor() as cursor:
+        description = connection.introspection.get_table_description(cursor, table)
+    kinds = {}
+    for column in description:
+        try:
+            field_type = connection.introspection.get_field_type(column.type_code, column)
+        except KeyError:
+            field_type = None
+        kinds[column.name] = 'float' if column.name in FLOAT_TEXT_COLUMNS else FIELD_KINDS.get(field_type, 'text')
+    return kinds
+
+
+# Converters: raw driver values to what the column's Arrow type takes; bad values become null
+
+def _to_int(value):
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    if value is None or isinstance(value, float):
+        return value
+    try:
+        return float(str(value).strip().replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _to_bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 't', 'yes')
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _to_datetime(value):
+    if value is not None and not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value is not None and timezone.is_aware(value):
+        value = timezone.make_naive(value, dt_timezone.utc)
+    return value
+
+
+def _to_time(value):
+    if value is None or isinstance(value, time):
+        return value
+    try:
+        return time.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+CONVERTERS = {
+    'int': _to_int, 'float': _to_float, 'bool': _to_bool,
+    'date': _to_date, 'datetime': _to_datetime, 'time': _to_time, 'text': _to_text,
+}
+
+
+def arrow_schema(columns, kinds):
+    import pyarrow as pa
+
+    types = {
+        'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(),
+        'date': pa.date32(), 'datetime': pa.timestamp('us'), 'time': pa.time64('us'), 'text': pa.string(),
+    }
+    return pa.schema([(column, types[kinds.get(column, 'text')]) for column in columns])
+
+
+def record_batch(schema, kinds, rows):
+    """Pivot a batch of row tuples into one typed Arrow column per field"""
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    return pa.record_batch([
+        pa.array([convert(value) for value in values], type=field.type)
+        for field, values, convert in zip(
+            schema, columns, (CONVERTERS[kinds.get(name, 'text')] for name in schema.names)
+        )
+    ], schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object collecting what the Arrow writers emit until it is drained"""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _open_writer(export_format, sink, schema):
+    import pyarrow as pa
+
+    if export_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(sink, schema, compression='snappy')
+    if export_format == 'arrow':
+        return pa.ipc.new_file(sink, schema)
+    return pa.ipc.new_stream(sink, schema)
+
+
+def write_columnar(batches, kinds, export_format, handle):
+    """
+    Write iter_query output to handle as Parquet (one row group per batch), an Arrow
+    IPC file or an Arrow IPC stream. Returns the number of rows written.
+    """
+    columns = next(batches)
+    schema = arrow_schema(columns, kinds)
+    written = 0
+    writer = _open_writer(export_format, handle, schema)
+    try:
+        for rows in batches:
+            writer.write_batch(record_batch(schema, kinds, rows))
+            written += len(rows)
+    finally:
+        writer.close()
+    return written
+
+
+def columnar_chunks(batches, kinds, export_format):
+    """Encode iter_query output in a columnar format, yielding the bytes as each batch is written"""
+    columns = next(batches, None)
+    if columns is None:
+        return
+    schema = arrow_schema(columns, kinds)
+    sink = _ChunkSink()
+    writer = _open_writer(export_format, sink, schema)
+    for rows in batches:
+        writer.write_batch(record_batch(schema, kinds, rows))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def columnar_query_response(table, sql, params, export_format, filename):
+    """
+    Stream the result of sql over table as a Parquet or Arrow download. Rows are read off a
+    server-side cursor COLUMNAR_BATCH_SIZE at a time and each batch becomes one record batch
+    (or Parquet row group), so memory is bounded by the batch size. Requires pyarrow.
+    """
+    batch_size = getattr(settings, 'COLUMNAR_BATCH_SIZE', 50000)
+    response = StreamingHttpResponse(
+        columnar_chunks(iter_query(sql, params, batch_size=batch_size), get_column_kinds(table), export_format),
+        content_type=COLUMNAR_CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from .caching import TTLCache
+
+
+class CountStrategy:
+    """
+    Decides the `count` reported by list endpoints.
+    `items` is the list of rows already fetched for the response (the whole result or
+    a single page), so strategies can avoid a COUNT(*) when the answer is at hand.
+    """
+
+    def count(self, queryset, items):
+        raise NotImplementedError
+
+
+class PageLengthCount(CountStrategy):
+    """Count of the rows actually returned. Never queries the database."""
+
+    def count(self, queryset, items):
+        return len(items)
+
+
+class ExactCount(CountStrategy):
+    """
+    Exact total, computed at most once per response. When the whole result was
+    materialized (its cache is filled) the length of that result is used instead.
+    """
+
+    def count(self, queryset, items):
+        if queryset._result_cache is not None:
+            return len(queryset._result_cache)
+        return queryset.count()
+
+
+class EstimatedCount(ExactCount):
+    """
+    Row estimate from MySQL table statistics for unfiltered scans, which would
+    otherwise need a full index scan on InnoDB. Filtered querysets and other
+    databases fall back to an exact count.
+    """
+
+    def count(self, queryset, items):
+        if queryset._result_cache is None and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'mysql':
+                estimate = self._table_rows(connection, queryset.model._meta.db_table)
+                if estimate is not None:
+                    return estimate
+        return super().count(queryset, items)
+
+    def _table_rows(self, connection, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] is not None else None
+
+
+class CachedCount(ExactCount):
+    """Exact count remembered per (table, SQL, params) for `ttl` seconds."""
+
+    def __init__(self, ttl=None, max_entries=1000):
+        self.cache = TTLCache(
+            max_entries=max_entries,
+            ttl=ttl if ttl is not None else getattr(settings, 'COUNT_CACHE_TTL', 60),
+        )
+
+    def count(self, queryset, items):
+        if queryset._result_cache is not None:
+            return len(queryset._result_cache)
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            # e.g. id__in=[]: Django answers without a query
+            return 0
+        key = (queryset.db, sql, tuple(params))
+        total = self.cache.get(key)
+        if total is None:
+            total = queryset.count()
+            self.cache.set(key, total)
+        return total
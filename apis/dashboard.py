@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from .models import Agency, Ba, Project, ProjectHead
+from .rollups import DATA_TABLE_MODELS, has_project_column, rollups_enabled, project_totals
+
+
+def count_projects_by_company(company_ids):
+    """{company_id: number of projects}, in one grouped query"""
+    rows = (
+        Project.objects.filter(company__in=company_ids)
+        .values_list('company')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    return dict(rows)
+
+
+def count_entries_by_project(projects):
+    """
+    {project_id: number of rows in the project's top_table}, with one
+    GROUP BY project query per distinct top_table, read from the rollup table
+    when DATA_ROLLUPS_ENABLED is on.
+    projects is an iterable of (project_id, top_table) pairs.
+    """
+    projects_by_table = defaultdict(list)
+    for project_id, top_table in projects:
+        # Tables without a project column cannot be attributed to a project
+        if top_table in DATA_TABLE_MODELS and has_project_column(DATA_TABLE_MODELS[top_table]):
+            projects_by_table[top_table].append(project_id)
+
+    counts = {}
+    for top_table, project_ids in projects_by_table.items():
+        if rollups_enabled():
+            # Incrementally maintained totals: a read per project instead of a table scan
+            counts.update(project_totals(top_table, project_ids))
+            continue
+        rows = (
+            DATA_TABLE_MODELS[top_table].objects.filter(project__in=project_ids)
+            .values_list('project')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        counts.update(rows)
+    return counts
+
+
+def count_entries_by_company(company_ids):
+    """{company_id: total data entries across the company's projects}"""
+    projects = list(Project.objects.filter(company__in=company_ids).values_list('id', 'top_table', 'company'))
+    entries = count_entries_by_project((project_id, top_table) for project_id, top_table, _ in projects)
+
+    totals = defaultdict(int)
+    for project_id, _, company_id in projects:
+        totals[company_id] += entries.get(project_id, 0)
+    return dict(totals)
+
+
+def build_dashboard_counts(company_ids):
+    """
+    Everything ProjectHeadWithProjectCountSerializer needs for the project heads of
+    the given companies; pass it as context={'dashboard_counts': ...}.
+    """
+    company_ids = set(company_ids)
+    return {
+        'project_counts': count_projects_by_company(company_ids),
+        'data_entries': count_entries_by_company(company_ids),
+    }
+
+
+# Materialized per-agency dashboard snapshots
+
+SNAPSHOT_KEY = 'dashboard_snapshot:{agency_id}'
+
+
+def build_agency_snapshots(agency_ids):
+    """
+    Compute the dashboard snapshot of each agency: its project heads with project and
+    data-entry counts, and its BA count. Returns {agency_id: snapshot}.
+    """
+    from .serializers import ProjectHeadWithProjectCountSerializer
+
+    agency_ids = set(agency_ids)
+    generated_at = timezone.now().isoformat()
+    heads = list(ProjectHead.objects.filter(company__in=agency_ids).order_by('id'))
+    counts = build_dashboard_counts(agency_ids)
+    heads_data = ProjectHeadWithProjectCountSerializer(
+        heads, many=True, context={'dashboard_counts': counts}
+    ).data
+    ba_counts = dict(
+        Ba.objects.filter(company__in=agency_ids).values_list('company').annotate(total=Count('id')).order_by()
+    )
+
+    snapshots = {
+        agency_id: {
+            'agency_id': agency_id,
+            'generated_at': generated_at,
+            'project_heads': [],
+            'total_bas': ba_counts.get(agency_id, 0),
+        }
+        for agency_id in agency_ids
+    }
+    for head, head_data in zip(heads, heads_data):
+        snapshots[head.company]['project_heads'].append(head_data)
+    return snapshots
+
+
+def store_snapshots(snapshots):
+    timeout = getattr(settings, 'DASHBOARD_SNAPSHOT_TIMEOUT', 900)
+    cache.set_many(
+        {SNAPSHOT_KEY.format(agency_id=agency_id): snapshot for agency_id, snapshot in snapshots.items()},
+        timeout=timeout,
+    )
+
+
+def get_agency_snapshots(agency_ids, fresh=False):
+    """
+    Return {agency_id: snapshot} from the cache. Agencies without a snapshot, or all of
+    them when fresh is true, are recomputed and stored.
+    """
+    agency_ids = set(agency_ids)
+    snapshots = {}
+    if not fresh:
+        keys = {SNAPSHOT_KEY.format(agency_id=agency_id): agency_id for agency_id in agency_ids}
+        snapshots = {keys[key]: snapshot for key, snapshot in cache.get_many(keys).items()}
+
+    missing = agency_ids - set(snapshots)
+    if missing:
+        computed = build_agency_snapshots(missing)
+        store_snapshots(computed)
+        snapshots.update(computed)
+    return snapshots
+
+
+def refresh_dashboard_snapshots():
+    """Recompute and store the snapshot of every agency"""
+    snapshots = build_agency_snapshots(Agency.objects.values_list('id', flat=True))
+    store_snapshots(snapshots)
+    return snapshots
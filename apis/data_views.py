@@ -1,10 +1,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import models
+from django.db import models, connection
+from rest_framework.exceptions import ValidationError
 from django.core.exceptions import ObjectDoesNotExist
 from datetime import datetime, date
-from .authentication import TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication
+from .authentication import MultiTokenAuthentication
+from .access_scope import get_access_scope
+from .form_schema import load_form_schema
+from .aggregation import AggregateQuery
 from rest_framework.permissions import IsAuthenticated
 from .models import (
     User, UAdmin, Ba, Agency, Project, FormSection, ProjectAssoc, InputOptions,
@@ -12,12 +16,20 @@ from .models import (
     BaProject
 )
 
+WIDE_TABLE_MODELS = {
+    'airtel_combined': AirtelCombined,
+    'coke_combined': CokeCombined,
+    'baims_combined': BaimsCombined,
+    'kspca_combined': KspcaCombined,
+    'saff_combined': SaffCombined,
+}
+
 
 class WideDataFilterView(APIView):
     """
     View for filtering data from wide tables (airtel_combined, coke_combined, etc.)
     """
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -143,21 +155,69 @@ class WideDataFilterView(APIView):
     
     def _get_model_class(self, table_name):
         """Get the Django model class for a given table name"""
-        table_mapping = {
-            'airtel_combined': AirtelCombined,
-            'coke_combined': CokeCombined,
-            'baims_combined': BaimsCombined,
-            'kspca_combined': KspcaCombined,
-            'saff_combined': SaffCombined,
-        }
-        return table_mapping.get(table_name)
+        return WIDE_TABLE_MODELS.get(table_name)
+
+
+class AggregateDataView(APIView):
+    """
+    Grouped counts and aggregates over a wide table, computed in SQL so clients
+    no longer download raw rows to summarize them
+    """
+    authentication_classes = [MultiTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Aggregate a wide table over the projects the caller can access.
+
+        Query Parameters (see AggregateQuery):
+        - table: The wide table name (airtel_combined, coke_combined, etc.)
+        - group_by: project, ba_id, t_date[:day|week|month] and/or sub_* columns
+        - metrics: count, sum:<col>, avg:<col>, min:<col>, max:<col>, count_distinct:<col>
+        - project, ba_id, start_date, end_date: filters
+        - limit: maximum number of groups
+        """
+        table_name = request.query_params.get('table')
+        if table_name not in WIDE_TABLE_MODELS:
+            return Response({
+                'response': 'error',
+                'message': f'Invalid table name: {table_name}' if table_name else 'Table name is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            query = AggregateQuery(table_name, request.query_params, get_access_scope(request).project_ids)
+            with connection.cursor() as cursor:
+                cursor.execute(*query.sql())
+                rows, truncated = query.split_page(cursor.fetchall())
+
+            return Response({
+                'response': 'success',
+                'table': table_name,
+                'columns': query.output_columns,
+                'count': len(rows),
+                'truncated': truncated,
+                'data': rows
+            })
+
+        except ValidationError as e:
+            return Response({
+                'response': 'error',
+                'message': 'Invalid query parameters',
+                'errors': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        except Exception as e:
+            return Response({
+                'response': 'error',
+                'message': f'An error occurred: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class ProjectDataView(APIView):
     """
     View for getting project data with form structure and actual data records
     """
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request, project_id):
@@ -183,26 +243,29 @@ class ProjectDataView(APIView):
             # Get project, ensuring the user has permission
             try:
                 allowed_projects = self._get_allowed_projects(user)
-                project = allowed_projects.select_related('company').get(id=project_id)
+                project = allowed_projects.get(id=project_id)
             except Project.DoesNotExist:
                 return Response({
                     'response': 'error',
                     'message': f'Project with ID {project_id} not found or you do not have permission to access it.'
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            # Get form sections
-            form_sections = FormSection.objects.filter(project=project).order_by('rank')
-            
+            # Sections, fields and options in three queries
+            schema = load_form_schema(project.id)
+
+            # Fetch every field's values from the wide table in one query up front
+            data_values = None
+            if include_data and data_table:
+                data_values = self._get_data_values(schema.column_names, ba_id, start_date, end_date, data_table)
+
             forms_data = []
-            for form_section in form_sections:
-                form_data = self._get_form_data(
-                    form_section, ba_id, start_date, end_date, include_data, data_table
-                )
+            for form_section in schema.sections:
+                form_data = self._get_form_data(form_section, schema, data_values)
                 if form_data:
                     forms_data.append(form_data)
             
-            # Get agency name
-            agency_name = project.company.name if project.company else "Unknown Agency"
+            # Get agency name (Project.company holds the agency id)
+            agency_name = Agency.objects.filter(id=project.company).values_list('name', flat=True).first() or "Unknown Agency"
 
             
             response_data = {
@@ -228,28 +291,15 @@ class ProjectDataView(APIView):
         if isinstance(user, UAdmin):
             return Project.objects.all()
 
-        # BA sees projects they are assigned to via BaProject
-        if isinstance(user, Ba):
-            project_ids = BaProject.objects.filter(ba=user).values_list('project_id', flat=True)
-            return Project.objects.filter(id__in=project_ids)
-
-        # Regular User sees projects for their agency
-        if hasattr(user, 'agency') and user.agency:
-            return Project.objects.filter(company=user.agency.id)
-            
-        # Default to no projects
-        return Project.objects.none()
+        # BA sees projects they are assigned to via BaProject,
+        # a regular User the projects of their agency
+        return Project.objects.filter(id__in=get_access_scope(self.request).project_ids)
     
-    def _get_form_data(self, form_section, ba_id, start_date, end_date, include_data, data_table):
+    def _get_form_data(self, form_section, schema, data_values):
         """Get form data with fields and optionally data records"""
-        # Get project associations (fields)
-        project_assocs = ProjectAssoc.objects.filter(project=form_section.project).order_by('rank')
-        
         fields_data = []
-        for project_assoc in project_assocs:
-            field_data = self._get_field_data(
-                project_assoc, ba_id, start_date, end_date, include_data, data_table
-            )
+        for project_assoc in schema.fields:
+            field_data = self._get_field_data(project_assoc, schema.options_for(project_assoc), data_values)
             if field_data:
                 fields_data.append(field_data)
         
@@ -267,10 +317,11 @@ class ProjectDataView(APIView):
             "form_fields": fields_data
         }
     
-    def _get_field_data(self, project_assoc, ba_id, start_date, end_date, include_data, data_table):
-        """Get field data with options and optionally data values"""
-        # Get input options
-        input_options = InputOptions.objects.filter(field=project_assoc).order_by('rank') # Use FK
+    def _get_field_data(self, project_assoc, input_options, data_values):
+        """
+        Get field data with its prefetched options and optionally data values.
+        data_values maps column names to their values, or is None when data is not requested.
+        """
         options_data = []
         for option in input_options:
             options_data.append({
@@ -290,21 +341,23 @@ class ProjectDataView(APIView):
             "field_input_options": options_data
         }
         
-        # If include_data is True, get actual data values
-        if include_data and data_table:
-            field_data['data_values'] = self._get_field_data_values(
-                project_assoc.column_name, ba_id, start_date, end_date, data_table
-            )
+        # If include_data is True, attach this field's slice of the prefetched values
+        if data_values is not None:
+            field_data['data_values'] = data_values.get(project_assoc.column_name, [])
         
         return field_data
     
-    def _get_field_data_values(self, column_name, ba_id, start_date, end_date, data_table):
-        """Get actual data values for a specific field from the wide table"""
+    def _get_data_values(self, column_names, ba_id, start_date, end_date, data_table):
+        """
+        Get actual data values for all requested fields from the wide table with a single
+        values_list() query. Returns {column_name: [value, ...]}; columns the table model
+        does not define are left out, so their fields get no values.
+        """
         try:
             # Get the model class
             model_class = self._get_model_class(data_table)
             if not model_class:
-                return []
+                return {}
             
             # Build queryset
             queryset = model_class.objects.all()
@@ -321,20 +374,22 @@ class ProjectDataView(APIView):
                 end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
                 queryset = queryset.filter(t_date__lte=end_date_obj)
             
-            # Get values for the specific column
-            values = list(queryset.values_list(column_name, flat=True))
-            return [str(v) if v is not None else '' for v in values]
+            # Only columns the model knows can be selected
+            model_columns = {field.attname for field in model_class._meta.concrete_fields}
+            columns = [name for name in dict.fromkeys(column_names) if name in model_columns]
+            if not columns:
+                return {}
+
+            # One pass over the rows, split column-wise into per-field lists
+            values = {column: [] for column in columns}
+            for row in queryset.values_list(*columns).iterator():
+                for column, value in zip(columns, row):
+                    values[column].append(str(value) if value is not None else '')
+            return values
             
         except Exception as e:
-            return []
+            return {}
     
     def _get_model_class(self, table_name):
         """Get the Django model class for a given table name"""
-        table_mapping = {
-            'airtel_combined': AirtelCombined,
-            'coke_combined': CokeCombined,
-            'baims_combined': BaimsCombined,
-            'kspca_combined': KspcaCombined,
-            'saff_combined': SaffCombined,
-        }
-        return table_mapping.get(table_name) 
\ No newline at end of file
+        return WIDE_TABLE_MODELS.get(table_name) 
\ No newline at end of file
@@ -0,0 +1,149 @@
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from .models import Project
+from .caching import cache_is_shared
+from .form_schema import load_form_schemas
+
+# A project's rendered form definition (projects -> forms -> form_fields -> field_input_options)
+# as JSON bytes, with a strong ETag derived from the bytes themselves.
+FormDefinition = namedtuple('FormDefinition', ['project_id', 'etag', 'body'])
+
+VERSION_KEY = 'form_definition_version:{project_id}'
+DOCUMENT_KEY = 'form_definition:{project_id}:v{version}'
+
+
+def get_form_version(project_id):
+    """Current version of a project's form definition; starts at 1"""
+    key = VERSION_KEY.format(project_id=project_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_form_version(project_id):
+    """
+    Move a project's form definition to a new version. Documents cached under the old
+    version are never served again and simply age out of the cache. With a per-process
+    cache only this worker sees the bump; see definition_cache_timeout.
+    """
+    key = VERSION_KEY.format(project_id=project_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version yet: whatever gets built next is already current
+        cache.add(key, 1, timeout=None)
+
+
+def render_form_definition(project, form_schemas=None):
+    """
+    Render a project's form definition to JSON bytes. form_schemas ({project_id: FormSchema})
+    lets callers load the schemas of many projects at once.
+    """
+    from .nested_serializers import ProjectNestedSerializer
+    context = {'form_schemas': form_schemas} if form_schemas else {}
+    return JSONRenderer().render(ProjectNestedSerializer(project, context=context).data)
+
+
+def definition_cache_timeout():
+    """
+    Seconds a rendered definition stays cached. A version bump only reaches the workers
+    sharing the cache, so with a per-process cache the other workers would keep serving
+    the old document (and answering its ETag with 304) until it expires; there it is
+    capped at FORM_DEFINITION_LOCAL_CACHE_TIMEOUT.
+    """
+    timeout = getattr(settings, 'FORM_DEFINITION_CACHE_TIMEOUT', 86400)
+    if cache_is_shared():
+        return timeout
+    return min(timeout, getattr(settings, 'FORM_DEFINITION_LOCAL_CACHE_TIMEOUT', 30))
+
+
+def _make_definition(project_id, body):
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    return FormDefinition(project_id, etag, body)
+
+
+def get_form_definitions(project_ids):
+    """
+    Return {project_id: FormDefinition} for the given projects. Cached documents are
+    served without touching the database; the rest are rendered and cached in one go.
+    Unknown project ids are left out.
+    """
+    project_ids = list(dict.fromkeys(project_ids))
+    keys = {
+        project_id: DOCUMENT_KEY.format(project_id=project_id, version=get_form_version(project_id))
+        for project_id in project_ids
+    }
+    cached = cache.get_many(keys.values())
+
+    definitions = {}
+    missing = []
+    for project_id in project_ids:
+        entry = cached.get(keys[project_id])
+        if entry is None:
+            missing.append(project_id)
+        else:
+            definitions[project_id] = FormDefinition(project_id, *entry)
+
+    if missing:
+        timeout = definition_cache_timeout()
+        rendered = {}
+        projects = list(Project.objects.filter(id__in=missing))
+        schemas = load_form_schemas([project.id for project in projects])
+        for project in projects:
+            definition = _make_definition(project.id, render_form_definition(project, schemas))
+            definitions[project.id] = definition
+            rendered[keys[project.id]] = (definition.etag, definition.body)
+        cache.set_many(rendered, timeout=timeout)
+
+    return definitions
+
+
+def get_form_definition(project_id):
+    """Return the FormDefinition of one project, or None if it does not exist"""
+    return get_form_definitions([project_id]).get(project_id)
+
+
+def render_ba_document(ba, agency_name, definitions):
+    """
+    Assemble the BaNestedSerializer document of a BA from its header fields and the
+    pre-rendered form definitions of its projects, without re-serializing them.
+    """
+    head = JSONRenderer().render({
+        "response": "success",
+        "name": ba.name,
+        "ba_id": str(ba.id),
+        "company": agency_name,
+        "pass_code": ba.pass_code,
+    })
+    projects = b','.join(definition.body for definition in definitions)
+    return head[:-1] + b',"projects":[' + projects + b']}'
+
+
+def combine_etags(*parts):
+    """Strong ETag for a document assembled from other documents and values"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return '"%s"' % digest
+
+
+def etag_response(request, etag, build_body):
+    """
+    Answer 304 when the client's If-None-Match already has etag, otherwise call
+    build_body() and return its JSON bytes with the ETag attached.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(build_body(), content_type='application/json')
+    response['ETag'] = etag
+    # Always revalidate; unchanged forms cost a 304
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from .models import FormSection, ProjectAssoc, InputOptions
+
+
+class FormSchema:
+    """
+    A project's form definition held in memory: its form sections, its fields
+    (ProjectAssoc rows, shared by every section of the project) and the input
+    options of each field grouped by field_id.
+    """
+
+    def __init__(self, project_id, sections=None, fields=None, options=None):
+        self.project_id = project_id
+        self.sections = sections or []
+        self.fields = fields or []
+        self.options = options or {}
+
+    def options_for(self, field):
+        return self.options.get(field.id, [])
+
+    @property
+    def column_names(self):
+        return [field.column_name for field in self.fields]
+
+
+def group_input_options(field_ids):
+    """Fetch the input options of many fields in one query, grouped by field_id in rank order"""
+    options = defaultdict(list)
+    if field_ids:
+        for option in InputOptions.objects.filter(field_id__in=field_ids).order_by('field_id', 'rank'):
+            options[option.field_id].append(option)
+    return dict(options)
+
+
+def load_form_schemas(project_ids):
+    """
+    Load the form schema of several projects in three queries in total
+    (sections, fields, options). Returns {project_id: FormSchema}.
+    """
+    project_ids = set(project_ids)
+    schemas = {project_id: FormSchema(project_id) for project_id in project_ids}
+    if not project_ids:
+        return schemas
+
+    for section in FormSection.objects.filter(project__in=project_ids).order_by('rank'):
+        schemas[section.project_id].sections.append(section)
+
+    fields = list(ProjectAssoc.objects.filter(project__in=project_ids).order_by('rank'))
+    for field in fields:
+        schemas[field.project].fields.append(field)
+
+    options = group_input_options([field.id for field in fields])
+    for schema in schemas.values():
+        schema.options = {field.id: options.get(field.id, []) for field in schema.fields}
+    return schemas
+
+
+def load_form_schema(project_id):
+    """Load the form schema of a single project"""
+    return load_form_schemas([project_id])[project_id]
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from apis.models import FormSubmission
+from apis.answers import project_answers
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the submission_answer table from FormSubmission.answers, e.g. after "
+        "creating the table or changing a project's field types"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help="Only submissions of this project (repeatable)")
+        parser.add_argument('--after-id', type=int, default=0,
+                            help="Resume after this submission id")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Submissions per transaction (default 1000)")
+
+    def handle(self, *args, **options):
+        submissions = FormSubmission.objects.only('id', 'project_id', 'answers').order_by('id')
+        if options['projects']:
+            submissions = submissions.filter(project_id__in=options['projects'])
+
+        last_id = options['after_id']
+        done = written = 0
+        while True:
+            batch = list(submissions.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            written += project_answers(batch, replace=True)
+            done += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"{done} submissions, {written} answers (last id {last_id})")
+        self.stdout.write(self.style.SUCCESS(f"Projected {written} answers from {done} submissions."))
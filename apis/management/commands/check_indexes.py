@@ -0,0 +1,117 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+# Per-index usage counters, since server start or the last stats reset
+UNUSED_INDEX_QUERIES = {
+    'mysql': (
+        "SELECT OBJECT_NAME, INDEX_NAME FROM performance_schema.table_io_waits_summary_by_index_usage "
+        "WHERE OBJECT_SCHEMA = DATABASE() AND INDEX_NAME IS NOT NULL AND INDEX_NAME <> 'PRIMARY' "
+        "AND COUNT_STAR = 0 ORDER BY OBJECT_NAME, INDEX_NAME"
+    ),
+    'postgresql': (
+        "SELECT s.relname, s.indexrelname FROM pg_stat_user_indexes s "
+        "JOIN pg_index i ON i.indexrelid = s.indexrelid "
+        "WHERE s.idx_scan = 0 AND NOT i.indisprimary ORDER BY s.relname, s.indexrelname"
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the indexes declared on the apis models with the live schema and report "
+        "the ones that are missing (e.g. after `migrate --fake`) and the ones never used"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='*', help="Only check these tables (default: every apis table)")
+        parser.add_argument('--sql', action='store_true',
+                            help="Print CREATE INDEX statements for the missing model indexes")
+
+    def handle(self, *args, **options):
+        models = {
+            model._meta.db_table: model
+            for model in apps.get_app_config('apis').get_models()
+            if model._meta.managed and not model._meta.proxy
+        }
+        tables = options['tables'] or sorted(models)
+        unknown = [table for table in tables if table not in models]
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(unknown)}")
+
+        with connection.cursor() as cursor:
+            live_tables = set(connection.introspection.table_names(cursor))
+            missing = []
+            for table in tables:
+                if table not in live_tables:
+                    self.stdout.write(self.style.WARNING(f"{table}: table does not exist"))
+                    continue
+                live = connection.introspection.get_constraints(cursor, table)
+                for columns, index in self._expected_indexes(models[table]):
+                    if not self._covered(columns, live):
+                        missing.append((models[table], columns, index))
+
+            self._report_missing(missing, options['sql'])
+            self._report_unused(cursor, tables)
+
+    def _expected_indexes(self, model):
+        """(columns, Index or None) for every index the model declares or implies"""
+        meta = model._meta
+        for index in meta.indexes:
+            yield [meta.get_field(name).column for name in index.fields], index
+        for field in meta.local_fields:
+            if field.primary_key:
+                continue
+            if field.db_index or field.unique:
+                yield [field.column], None
+        for fields in meta.unique_together:
+            yield [meta.get_field(name).column for name in fields], None
+        for constraint in meta.constraints:
+            if getattr(constraint, 'fields', None):
+                yield [meta.get_field(name).column for name in constraint.fields], None
+
+    def _covered(self, columns, live):
+        """Whether a live index (or key) starts with the given columns"""
+        return any(
+            (info['index'] or info['unique'] or info['primary_key'])
+            and info['columns'][:len(columns)] == columns
+            for info in live.values()
+        )
+
+    def _report_missing(self, missing, print_sql):
+        if not missing:
+            self.stdout.write(self.style.SUCCESS("No missing indexes."))
+            return
+        self.stdout.write(self.style.WARNING(f"{len(missing)} missing indexes:"))
+        for model, columns, index in missing:
+            name = f" ({index.name})" if index else ''
+            self.stdout.write(f"  {model._meta.db_table} ({', '.join(columns)}){name}")
+
+        declared = [(model, index) for model, _, index in missing if index is not None]
+        if print_sql and declared:
+            with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+                for model, index in declared:
+                    editor.add_index(model, index)
+            for statement in editor.collected_sql:
+                self.stdout.write(statement)
+
+    def _report_unused(self, cursor, tables):
+        query = UNUSED_INDEX_QUERIES.get(connection.vendor)
+        if query is None:
+            self.stdout.write(f"Index usage statistics are not available on {connection.vendor}.")
+            return
+        try:
+            cursor.execute(query)
+            rows = [(table, index) for table, index in cursor.fetchall() if table in tables]
+        except DatabaseError as e:
+            self.stdout.write(self.style.WARNING(f"Could not read index usage statistics: {e}"))
+            return
+
+        if not rows:
+            self.stdout.write(self.style.SUCCESS("No unused indexes."))
+            return
+        self.stdout.write(self.style.WARNING(
+            f"{len(rows)} indexes not used since the statistics were last reset:"
+        ))
+        for table, index in rows:
+            self.stdout.write(f"  {table}.{index}")
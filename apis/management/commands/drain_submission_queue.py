@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from apis.submission_queue import drain_queue, queue_enabled, requeue_abandoned
+
+
+class Command(BaseCommand):
+    help = "Write form submissions queued with ?async=1 to the database, until stopped or the queue is empty (--once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Drain what is queued now and exit")
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty (default 1)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Tickets claimed at a time (default SUBMISSION_QUEUE_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        if not queue_enabled():
+            raise CommandError("SUBMISSION_QUEUE_ENABLED is off")
+
+        # Tickets a stopped worker left half done are taken again; claims younger than
+        # SUBMISSION_QUEUE_VISIBILITY_TIMEOUT may belong to a drainer that is still running
+        requeued = requeue_abandoned()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} unfinished tickets")
+
+        total = 0
+        while True:
+            processed = drain_queue(options['batch_size'])
+            close_old_connections()
+            total += processed
+            if processed:
+                self.stdout.write(f"Processed {processed} tickets ({total} total)")
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} tickets."))
@@ -0,0 +1,58 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from apis.models import Project
+from apis.streaming import csv_chunks
+from apis.submission_export import EXPORT_FORMATS, iter_submission_rows, write_xlsx
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value}; use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = (
+        "Export a project's form submissions with their answers flattened to one column per "
+        "field (report_display_name, in rank order), as CSV or XLSX"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('--output', '-o', default='-',
+                            help="Output file (default: CSV on stdout)")
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS),
+                            help="Output format (default: from the output file extension, else csv)")
+        parser.add_argument('--start-date', type=_date, help="First submission date (YYYY-MM-DD)")
+        parser.add_argument('--end-date', type=_date, help="Last submission date (YYYY-MM-DD)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Submissions read per query (default STREAM_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        project_id, output = options['project_id'], options['output']
+        if not Project.objects.filter(id=project_id).exists():
+            raise CommandError(f"Project {project_id} does not exist")
+        export_format = options['format'] or ('xlsx' if output.endswith('.xlsx') else 'csv')
+        if export_format == 'xlsx' and output == '-':
+            raise CommandError("XLSX needs an --output file")
+
+        rows = iter_submission_rows(project_id, options['start_date'], options['end_date'], options['batch_size'])
+        if export_format == 'xlsx':
+            try:
+                with open(output, 'wb') as handle:
+                    write_xlsx(rows, handle, title=f'Project {project_id}')
+            except ImportError:
+                raise CommandError("XLSX export needs openpyxl (pip install openpyxl)")
+        elif output == '-':
+            for chunk in csv_chunks(rows):
+                sys.stdout.write(chunk)
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as handle:
+                for chunk in csv_chunks(rows):
+                    handle.write(chunk)
+
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f"Exported project {project_id} submissions to {output}"))
@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from apis.collection_query import ALLOWED_COLLECTION_TABLES, get_table_columns
+from apis.rollups import ROLLUP_SOURCES, record_rows, rollups_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a CSV or NDJSON export into a data collection table. Columns are matched by name "
+        "against the table's real columns (including sub_* columns the models do not declare). "
+        "Rows are inserted in fixed-size transactions and progress is checkpointed, so rerunning "
+        "an interrupted import resumes after the last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', help=f"One of {', '.join(ALLOWED_COLLECTION_TABLES)}")
+        parser.add_argument('path', help="CSV (with a header row) or NDJSON file")
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help="Input format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Rows per transaction (default 5000)")
+        parser.add_argument('--project', type=int,
+                            help="Project id for rows that have none")
+        parser.add_argument('--encoding', default='utf-8-sig', help="CSV encoding (default utf-8-sig)")
+        parser.add_argument('--checkpoint',
+                            help="Checkpoint file (default: <path>.checkpoint)")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore an existing checkpoint and start from the beginning")
+
+    def handle(self, *args, **options):
+        table, path = options['table'], options['path']
+        if table not in ALLOWED_COLLECTION_TABLES:
+            raise CommandError(f"Unknown table {table}; use one of {', '.join(ALLOWED_COLLECTION_TABLES)}")
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        export_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+
+        self.table = table
+        self.table_columns = get_table_columns(table)
+        self.default_project = options['project']
+        self.track_rollups = table in ROLLUP_SOURCES and rollups_enabled()
+
+        checkpoint = self._load_checkpoint(checkpoint_path, path, table, options['restart'])
+        if checkpoint['offset']:
+            self.stdout.write(f"Resuming after {checkpoint['rows']} rows (byte {checkpoint['offset']})")
+
+        with open(path, 'rb') as handle:
+            if export_format == 'csv':
+                rows = self._csv_records(handle, checkpoint, options['encoding'])
+            else:
+                rows = self._ndjson_records(handle, checkpoint)
+            self._import(rows, checkpoint, checkpoint_path, options['batch_size'])
+
+    # Checkpoints
+
+    def _load_checkpoint(self, checkpoint_path, path, table, restart):
+        fresh = {'path': os.path.abspath(path), 'size': os.path.getsize(path), 'table': table,
+                 'offset': 0, 'rows': 0, 'columns': None}
+        if restart or not os.path.exists(checkpoint_path):
+            return fresh
+        with open(checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('table') != table or checkpoint.get('size') != fresh['size']:
+            raise CommandError(
+                f"{checkpoint_path} belongs to another file or table (or the file changed); "
+                "use --restart to import from the beginning"
+            )
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint_path, checkpoint):
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        temporary = f'{checkpoint_path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(checkpoint, handle)
+        os.replace(temporary, checkpoint_path)
+
+    # Readers: yield (values by column, byte offset just after the record)
+
+    def _csv_records(self, handle, checkpoint, encoding):
+        offset = 0
+
+        def lines():
+            nonlocal offset
+            for line in handle:
+                offset += len(line)
+                yield line.decode(encoding)
+
+        reader = csv.reader(lines())
+        try:
+            header = [name.strip() for name in next(reader)]
+        except StopIteration:
+            return
+        if checkpoint['offset']:
+            handle.seek(checkpoint['offset'])
+            offset = checkpoint['offset']
+        for record in reader:
+            if not record:
+                continue
+            yield {name: (value if value != '' else None) for name, value in zip(header, record)}, offset
+
+    def _ndjson_records(self, handle, checkpoint):
+        offset = checkpoint['offset']
+        handle.seek(offset)
+        for line in handle:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise CommandError(f"Invalid JSON at byte {offset - len(line)}: {e}")
+            if not isinstance(record, dict):
+                raise CommandError(f"Expected a JSON object per line at byte {offset - len(line)}")
+            yield {
+                key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                for key, value in record.items()
+            }, offset
+
+    # Loading
+
+    def _columns_for(self, record, checkpoint):
+        """Fix the column list from the first record (or the checkpoint, when resuming)"""
+        if checkpoint.get('columns'):
+            return checkpoint['columns']
+        unknown = sorted(set(record) - set(self.table_columns))
+        if unknown:
+            self.stdout.write(self.style.WARNING(f"Ignoring columns not in {self.table}: {', '.join(unknown)}"))
+        columns = [name for name in record if name in self.table_columns]
+        # The ORM fills these on create (auto_now_add, explicit project); raw inserts must too
+        for required in ('project', 't_date'):
+            if required in self.table_columns and required not in columns:
+                columns.append(required)
+        if not columns:
+            raise CommandError(f"None of the input columns exist in {self.table}")
+        checkpoint['columns'] = columns
+        return columns
+
+    def _row(self, record, columns, today):
+        values = []
+        for name in columns:
+            value = record.get(name)
+            if value is None and name == 'project':
+                value = self.default_project
+            elif value is None and name == 't_date':
+                value = today
+            values.append(value)
+        return values
+
+    def _import(self, records, checkpoint, checkpoint_path, batch_size):
+        quote = connection.ops.quote_name
+        today = date.today().isoformat()
+        columns = sql = None
+        started = time.monotonic()
+        imported = 0
+        batch, offset = [], checkpoint['offset']
+
+        def flush():
+            nonlocal imported, batch
+            batch_started = time.monotonic()
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.executemany(sql, batch)
+                if self.track_rollups:
+                    self._record_rollups(columns, batch)
+            checkpoint['offset'] = offset
+            checkpoint['rows'] += len(batch)
+            self._save_checkpoint(checkpoint_path, checkpoint)
+
+            imported += len(batch)
+            elapsed = time.monotonic() - started
+            batch_rate = len(batch) / max(time.monotonic() - batch_started, 1e-6)
+            self.stdout.write(
+                f"{checkpoint['rows']} rows ({imported / max(elapsed, 1e-6):.0f} rows/s, "
+                f"last batch {batch_rate:.0f} rows/s)"
+            )
+            batch = []
+
+        try:
+            for record, record_end in records:
+                if columns is None:
+                    columns = self._columns_for(record, checkpoint)
+                    placeholders = ', '.join(['%s'] * len(columns))
+                    sql = (f"INSERT INTO {quote(self.table)} ({', '.join(quote(name) for name in columns)}) "
+                           f"VALUES ({placeholders})")
+                batch.append(self._row(record, columns, today))
+                offset = record_end
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+        except CommandError:
+            raise
+        except Exception as e:
+            raise CommandError(
+                f"Import stopped after {checkpoint['rows']} rows: {e}. "
+                "Fix the input and rerun the command to resume from the checkpoint."
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} rows into {self.table} in {elapsed:.1f}s "
+            f"({imported / max(elapsed, 1e-6):.0f} rows/s); {checkpoint['rows']} in total."
+        ))
+
+    def _record_rollups(self, columns, batch):
+        """Raw inserts send no signals; count the batch into the rollup per project and day"""
+        project_index, date_index = columns.index('project'), columns.index('t_date')
+        counts = Counter()
+        for row in batch:
+            project, day = row[project_index], row[date_index]
+            if project is None or day is None:
+                continue
+            counts[(int(project), date.fromisoformat(str(day)[:10]))] += 1
+        for (project, day), delta in counts.items():
+            record_rows(self.table, project, day, delta)
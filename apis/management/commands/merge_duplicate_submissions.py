@@ -0,0 +1,73 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apis.models import FormSubmission
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge form submissions that were stored more than once by client retries: same user, "
+        "project, form section and answers, submitted within --window seconds of each other. "
+        "The earliest row is kept and takes over a submission_uuid from the rows removed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=600,
+                            help="Seconds between two identical submissions for them to count as a retry (default 600)")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows deleted per transaction (default 1000)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report what would be merged")
+
+    def handle(self, *args, **options):
+        window = timedelta(seconds=options['window'])
+        merges = self._find_duplicates(window)
+        removed = sum(len(duplicates) for _, duplicates, _ in merges)
+        self.stdout.write(f"{removed} duplicate submissions in {len(merges)} groups")
+        if options['dry_run'] or not merges:
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(merges), batch_size):
+            with transaction.atomic():
+                batch = merges[start:start + batch_size]
+                duplicate_ids = [pk for _, duplicates, _ in batch for pk in duplicates]
+                # Deleted one by one through the ORM so the rollup counts follow
+                FormSubmission.objects.filter(id__in=duplicate_ids).delete()
+                for kept_id, _, submission_uuid in batch:
+                    if submission_uuid:
+                        FormSubmission.objects.filter(id=kept_id, submission_uuid__isnull=True) \
+                            .update(submission_uuid=submission_uuid)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} duplicate submissions."))
+
+    def _find_duplicates(self, window):
+        """
+        Walk the table in (user, project, section, time) order and return
+        [(kept_id, [duplicate ids], submission_uuid to carry over or None)].
+        """
+        rows = (
+            FormSubmission.objects.order_by('user_id', 'project_id', 'form_section_id', 'submitted_at', 'id')
+            .values_list('id', 'user_id', 'project_id', 'form_section_id', 'answers', 'submitted_at', 'submission_uuid')
+            .iterator(chunk_size=2000)
+        )
+        merges = {}
+        group = None
+        kept = {}
+        for pk, user_id, project_id, section_id, answers, submitted_at, submission_uuid in rows:
+            if (user_id, project_id, section_id) != group:
+                group = (user_id, project_id, section_id)
+                kept = {}
+            answers_key = json.dumps(answers, sort_keys=True)
+            last = kept.get(answers_key)
+            if last is not None and submitted_at - last['submitted_at'] <= window:
+                merge = merges.setdefault(last['id'], [[], last['uuid']])
+                merge[0].append(pk)
+                if merge[1] is None:
+                    merge[1] = submission_uuid
+                # Chains of retries are measured from the latest copy
+                last['submitted_at'] = submitted_at
+            else:
+                kept[answers_key] = {'id': pk, 'submitted_at': submitted_at, 'uuid': submission_uuid}
+        return [(kept_id, duplicates, submission_uuid) for kept_id, (duplicates, submission_uuid) in merges.items()]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from apis.rollups import ROLLUP_SOURCES, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the data_rollup table (rows per project and day) from the data collection tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables', nargs='*',
+            help=f"Tables to rebuild (default: all of {', '.join(ROLLUP_SOURCES)})",
+        )
+
+    def handle(self, *args, **options):
+        tables = options['tables']
+        unknown = [table for table in tables if table not in ROLLUP_SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(unknown)}")
+
+        for table, written in rebuild_rollups(tables or None).items():
+            self.stdout.write(f"{table}: {written} rollup rows")
+        self.stdout.write(self.style.SUCCESS("Rollups rebuilt."))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=64)),
+                ('project', models.IntegerField()),
+                ('t_date', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Data Rollup',
+                'verbose_name_plural': 'Data Rollups',
+                'db_table': 'data_rollup',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='datarollup',
+            constraint=models.UniqueConstraint(fields=('table', 'project', 't_date'), name='data_rollup_table_project_day'),
+        ),
+    ]
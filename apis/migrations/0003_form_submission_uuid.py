@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0002_data_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='submission_uuid',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0003_form_submission_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project', models.IntegerField()),
+                ('column_name', models.CharField(max_length=128)),
+                ('value_text', models.CharField(blank=True, max_length=255, null=True)),
+                ('value_number', models.FloatField(blank=True, null=True)),
+                ('value_date', models.DateField(blank=True, null=True)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_values', to='apis.formsubmission')),
+            ],
+            options={
+                'verbose_name': 'Submission Answer',
+                'verbose_name_plural': 'Submission Answers',
+                'db_table': 'submission_answer',
+                'indexes': [models.Index(fields=['project', 'column_name', 'value_text'], name='submission_answer_text'), models.Index(fields=['project', 'column_name', 'value_number'], name='submission_answer_number'), models.Index(fields=['project', 'column_name', 'value_date'], name='submission_answer_date')],
+            },
+        ),
+    ]
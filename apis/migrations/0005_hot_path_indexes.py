@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0004_submission_answer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airtelcombined',
+            index=models.Index(fields=['project', 't_date'], name='airtelcombined_proj_tdate'),
+        ),
+        migrations.AddIndex(
+            model_name='ba',
+            index=models.Index(fields=['company'], name='ba_company'),
+        ),
+        migrations.AddIndex(
+            model_name='baimscombined',
+            index=models.Index(fields=['project', 't_date'], name='baimscombined_proj_tdate'),
+        ),
+        migrations.AddIndex(
+            model_name='baproject',
+            index=models.Index(fields=['ba_id', 'project_id'], name='ba_project_ba_project'),
+        ),
+        migrations.AddIndex(
+            model_name='baproject',
+            index=models.Index(fields=['project_id'], name='ba_project_project'),
+        ),
+        migrations.AddIndex(
+            model_name='cokecombined',
+            index=models.Index(fields=['project', 't_date'], name='cokecombined_proj_tdate'),
+        ),
+        migrations.AddIndex(
+            model_name='formsubmission',
+            index=models.Index(fields=['project', 'submitted_at'], name='form_submission_proj_time'),
+        ),
+        migrations.AddIndex(
+            model_name='inputoptions',
+            index=models.Index(fields=['field_id', 'rank'], name='input_options_field_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='kspcacombined',
+            index=models.Index(fields=['project', 't_date'], name='kspcacombined_proj_tdate'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['company'], name='project_company'),
+        ),
+        migrations.AddIndex(
+            model_name='projectassoc',
+            index=models.Index(fields=['project', 'rank'], name='project_assoc_project_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='projecthead',
+            index=models.Index(fields=['company'], name='project_head_company'),
+        ),
+        migrations.AddIndex(
+            model_name='saffcombined',
+            index=models.Index(fields=['project', 't_date'], name='saffcombined_proj_tdate'),
+        ),
+    ]
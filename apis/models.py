@@ -60,6 +60,9 @@ class Project(models.Model):
         db_table = 'project'
         verbose_name = 'Project'
         verbose_name_plural = 'Projects'
+        indexes = [
+            models.Index(fields=['company'], name='project_company'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.client})"
@@ -82,6 +85,9 @@ class ProjectHead(models.Model):
         db_table = 'project_head'
         verbose_name = 'Project Head'
         verbose_name_plural = 'Project Heads'
+        indexes = [
+            models.Index(fields=['company'], name='project_head_company'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.aka_name})"
@@ -235,6 +241,10 @@ class DataCollectionBase(models.Model):
     
     class Meta:
         abstract = True
+        # Every read filters on project__in plus a t_date range
+        indexes = [
+            models.Index(fields=['project', 't_date'], name='%(class)s_proj_tdate'),
+        ]
 
 
 class AirtelCombined(DataCollectionBase):
@@ -242,7 +252,7 @@ class AirtelCombined(DataCollectionBase):
     # This table has many sub_1_* fields (sub_1_1 to sub_1_41)
     # For now, I'll add a few key fields and use a JSON field for the rest
     
-    class Meta:
+    class Meta(DataCollectionBase.Meta):
         db_table = 'airtel_combined'
         verbose_name = 'Airtel Combined Data'
         verbose_name_plural = 'Airtel Combined Data'
@@ -251,7 +261,7 @@ class AirtelCombined(DataCollectionBase):
 class CokeCombined(DataCollectionBase):
     """Coke combined data collection table"""
     
-    class Meta:
+    class Meta(DataCollectionBase.Meta):
         db_table = 'coke_combined'
         verbose_name = 'Coke Combined Data'
         verbose_name_plural = 'Coke Combined Data'
@@ -260,7 +270,7 @@ class CokeCombined(DataCollectionBase):
 class BaimsCombined(DataCollectionBase):
     """Baims combined data collection table"""
     
-    class Meta:
+    class Meta(DataCollectionBase.Meta):
         db_table = 'baims_combined'
         verbose_name = 'Baims Combined Data'
         verbose_name_plural = 'Baims Combined Data'
@@ -269,7 +279,7 @@ class BaimsCombined(DataCollectionBase):
 class KspcaCombined(DataCollectionBase):
     """KPSCA combined data collection table"""
     
-    class Meta:
+    class Meta(DataCollectionBase.Meta):
         db_table = 'kspca_combined'
         verbose_name = 'KPSCA Combined Data'
         verbose_name_plural = 'KPSCA Combined Data'
@@ -278,7 +288,7 @@ class KspcaCombined(DataCollectionBase):
 class SaffCombined(DataCollectionBase):
     """Safaricom combined data collection table"""
     
-    class Meta:
+    class Meta(DataCollectionBase.Meta):
         db_table = 'saff_combined'
         verbose_name = 'Safaricom Combined Data'
         verbose_name_plural = 'Safaricom Combined Data'
@@ -324,6 +334,9 @@ class Ba(models.Model):
         db_table = 'ba'
         verbose_name = 'BA'
         verbose_name_plural = 'BAs'
+        indexes = [
+            models.Index(fields=['company'], name='ba_company'),
+        ]
 
     @property
     def is_authenticated(self):
@@ -350,6 +363,10 @@ class BaProject(models.Model):
         db_table = 'ba_project'
         verbose_name = 'BA Project'
         verbose_name_plural = 'BA Projects'
+        indexes = [
+            models.Index(fields=['ba_id', 'project_id'], name='ba_project_ba_project'),
+            models.Index(fields=['project_id'], name='ba_project_project'),
+        ]
 
 
 class ProjectAssoc(models.Model):
@@ -367,6 +384,9 @@ class ProjectAssoc(models.Model):
         db_table = 'project_assoc'
         verbose_name = 'Project Association'
         verbose_name_plural = 'Project Associations'
+        indexes = [
+            models.Index(fields=['project', 'rank'], name='project_assoc_project_rank'),
+        ]
 
 
 class Containers(models.Model):
@@ -444,6 +464,9 @@ class InputOptions(models.Model):
         db_table = 'input_options'
         verbose_name = 'Input Option'
         verbose_name_plural = 'Input Options'
+        indexes = [
+            models.Index(fields=['field_id', 'rank'], name='input_options_field_rank'),
+        ]
 
 
 class AuthToken(models.Model):
@@ -472,11 +495,61 @@ class FormSubmission(models.Model):
     form_section_id = models.IntegerField(null=True, blank=True)
     answers = models.JSONField()
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Client-generated id of the submission; retries carrying the same id return the original row
+    submission_uuid = models.UUIDField(null=True, blank=True, unique=True)
 
     class Meta:
         db_table = 'form_submission'
         verbose_name = 'Form Submission'
         verbose_name_plural = 'Form Submissions'
+        indexes = [
+            models.Index(fields=['project', 'submitted_at'], name='form_submission_proj_time'),
+        ]
 
     def __str__(self):
         return f"Submission for {self.project} by {self.user}"
+
+
+class DataRollup(models.Model):
+    """Number of rows per project and day in a data collection table (see apis/rollups.py)"""
+    table = models.CharField(max_length=64)
+    project = models.IntegerField()
+    t_date = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'data_rollup'
+        verbose_name = 'Data Rollup'
+        verbose_name_plural = 'Data Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'project', 't_date'], name='data_rollup_table_project_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.table} / project {self.project} / {self.t_date}: {self.count}"
+
+
+class SubmissionAnswer(models.Model):
+    """
+    One answer of a FormSubmission, projected out of its answers JSON with a typed value
+    (see apis/answers.py). Multiple-choice answers have one row per selected value.
+    """
+    submission = models.ForeignKey(FormSubmission, on_delete=models.CASCADE, related_name='answer_values')
+    project = models.IntegerField()
+    column_name = models.CharField(max_length=128)
+    value_text = models.CharField(max_length=255, null=True, blank=True)
+    value_number = models.FloatField(null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'submission_answer'
+        verbose_name = 'Submission Answer'
+        verbose_name_plural = 'Submission Answers'
+        indexes = [
+            models.Index(fields=['project', 'column_name', 'value_text'], name='submission_answer_text'),
+            models.Index(fields=['project', 'column_name', 'value_number'], name='submission_answer_number'),
+            models.Index(fields=['project', 'column_name', 'value_date'], name='submission_answer_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.column_name} = {self.value_text} (submission {self.submission_id})"
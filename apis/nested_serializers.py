@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import (
     Ba, Agency, Project, FormSection, ProjectAssoc, InputOptions
 )
+from .form_schema import load_form_schema, load_form_schemas
 
 
 class InputOptionsNestedSerializer(serializers.ModelSerializer):
@@ -22,7 +23,11 @@ class InputOptionsNestedSerializer(serializers.ModelSerializer):
 
 
 class ProjectAssocNestedSerializer(serializers.ModelSerializer):
-    """Nested serializer for project associations with input options"""
+    """
+    Nested serializer for project associations with input options.
+    Pass context={'input_options': {field_id: [options]}} (see apis.form_schema)
+    to avoid a query per field.
+    """
     
     class Meta:
         model = ProjectAssoc
@@ -34,7 +39,10 @@ class ProjectAssocNestedSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Custom representation to match the expected format"""
         # Get input options for this field
-        input_options = InputOptions.objects.filter(field_id=instance.id)
+        if 'input_options' in self.context:
+            input_options = self.context['input_options'].get(instance.id, [])
+        else:
+            input_options = InputOptions.objects.filter(field_id=instance.id)
         options_data = InputOptionsNestedSerializer(input_options, many=True).data
         
         return {
@@ -50,7 +58,11 @@ class ProjectAssocNestedSerializer(serializers.ModelSerializer):
 
 
 class FormSectionNestedSerializer(serializers.ModelSerializer):
-    """Nested serializer for form sections"""
+    """
+    Nested serializer for form sections.
+    Reads fields and options from context['form_schemas'] ({project_id: FormSchema})
+    when given, otherwise loads the section's project schema.
+    """
     
     class Meta:
         model = FormSection
@@ -59,8 +71,12 @@ class FormSectionNestedSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Custom representation to match the expected format"""
         # Get project associations for this section
-        project_assocs = ProjectAssoc.objects.filter(project=instance.project).order_by('rank')
-        fields_data = ProjectAssocNestedSerializer(project_assocs, many=True).data
+        schema = self.context.get('form_schemas', {}).get(instance.project_id)
+        if schema is None:
+            schema = load_form_schema(instance.project_id)
+        fields_data = ProjectAssocNestedSerializer(
+            schema.fields, many=True, context={'input_options': schema.options}
+        ).data
         
         return {
             "0": instance.title,
@@ -87,8 +103,12 @@ class ProjectNestedSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Custom representation to match the expected format"""
         # Get form sections for this project
-        form_sections = FormSection.objects.filter(project=instance.id).order_by('rank')
-        forms_data = FormSectionNestedSerializer(form_sections, many=True).data
+        schemas = self.context.get('form_schemas', {})
+        if instance.id not in schemas:
+            schemas = {instance.id: load_form_schema(instance.id)}
+        forms_data = FormSectionNestedSerializer(
+            schemas[instance.id].sections, many=True, context={'form_schemas': schemas}
+        ).data
         
         return {
             "project_title": instance.name,
@@ -117,9 +137,10 @@ class BaNestedSerializer(serializers.ModelSerializer):
         except Agency.DoesNotExist:
             pass
         
-        # Get projects for this BA's company
-        projects = Project.objects.filter(company=instance.company, status=1).order_by('rank')
-        projects_data = ProjectNestedSerializer(projects, many=True).data
+        # Get projects for this BA's company, with all their form schemas in three queries
+        projects = list(Project.objects.filter(company=instance.company, status=1).order_by('rank'))
+        schemas = load_form_schemas([project.id for project in projects])
+        projects_data = ProjectNestedSerializer(projects, many=True, context={'form_schemas': schemas}).data
         
         return {
             "response": "success",
@@ -0,0 +1,28 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Opt-in keyset pagination on `id`.
+    Clients ask for it with ?page_size=<n> and/or ?cursor=<token>; each page is a single
+    `WHERE id > <last id> ORDER BY id LIMIT n + 1` query, so deep pages cost the same as
+    the first one. The cursor is the opaque token DRF issues for the next page.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'KEYSET_PAGE_SIZE_MAX', 500)
+
+    def is_requested(self, request):
+        """Whether the client opted into keyset pagination for this request"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_next_cursor(self):
+        """Return the cursor token for the next page, or None on the last page"""
+        link = self.get_next_link()
+        if link is None:
+            return None
+        return parse_qs(urlparse(link).query).get(self.cursor_query_param, [None])[0]
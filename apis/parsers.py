@@ -0,0 +1,38 @@
+import codecs
+import csv
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def read_csv_rows(stream, encoding='utf-8'):
+    """
+    Dicts of the rows of a CSV byte stream, keyed by its header row. Empty cells become
+    None so optional fields validate as missing values.
+    """
+    # utf-8-sig drops the byte order mark spreadsheet exports often start with
+    if codecs.lookup(encoding).name == 'utf-8':
+        encoding = 'utf-8-sig'
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding=encoding, newline=''))
+    for row in reader:
+        yield {
+            key.strip(): (value if value != '' else None)
+            for key, value in row.items()
+            if key is not None
+        }
+
+
+class CSVParser(BaseParser):
+    """Parses a text/csv request body into a list of row dicts"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            # The request stream is not a full file object; CSV bodies are read whole
+            return list(read_csv_rows(io.BytesIO(stream.read()), encoding))
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError(f'CSV parse error - {e}')
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Registers ?format=ndjson. Streaming views return their own response, so this
+    only renders regular payloads such as error envelopes, as a single JSON line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Registers ?format=csv. Streaming views return their own response, so this
+    only renders regular payloads such as error envelopes, as a header row and a value row.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if isinstance(data, dict):
+            writer.writerow(data.keys())
+            writer.writerow(data.values())
+        else:
+            for row in data:
+                writer.writerow(row)
+        return buffer.getvalue().encode(self.charset)
+
+
+class ParquetRenderer(BaseRenderer):
+    """
+    Registers ?format=parquet. Columnar exports return their own response, so this
+    only renders regular payloads such as error envelopes, as JSON.
+    """
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+class ArrowFileRenderer(ParquetRenderer):
+    """Registers ?format=arrow (Arrow IPC file); see ParquetRenderer"""
+    media_type = 'application/vnd.apache.arrow.file'
+    format = 'arrow'
+
+
+class ArrowStreamRenderer(ParquetRenderer):
+    """Registers ?format=arrows (Arrow IPC stream); see ParquetRenderer"""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrows'
@@ -1,12 +1,18 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import HttpResponse
 from django.db.models import Q
 from django.core.exceptions import ObjectDoesNotExist
 from datetime import datetime
 from .models import Ba, Agency, Project, FormSection, ProjectAssoc, InputOptions
 from .nested_serializers import BaNestedSerializer
 from .models import UAdmin
+from .access_scope import get_access_scope
+from .authentication import MultiTokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from .form_schema import load_form_schemas
+from .form_definitions import get_form_definition, get_form_definitions, render_ba_document, combine_etags, etag_response
 
 
 class BaRichDataView(APIView):
@@ -37,17 +43,26 @@ class BaRichDataView(APIView):
             # If ba_id is provided, get specific BA
             if ba_id:
                 try:
-                    ba = Ba.objects.select_related('company').get(id=ba_id) # Optimize query
+                    # BAs outside the caller's scope are reported as missing, not forbidden
+                    if ba_id not in get_access_scope(request).ba_ids:
+                        raise Ba.DoesNotExist
+                    ba = Ba.objects.get(id=ba_id)
                 except Ba.DoesNotExist:
                     return Response({
                         'response': 'error',
                         'message': f'BA with ID {ba_id} not found'
                     }, status=status.HTTP_404_NOT_FOUND)
                 
-                # Apply filters
-                ba.projects = self._get_filtered_projects(ba, start_date, end_date, project_id, form_id) # Assign filtered projects
-                serializer = BaNestedSerializer(ba)
-                return Response(serializer.data)
+                # Same document as BaNestedSerializer, assembled from cached per-project form
+                # definitions; unchanged forms are answered with a 304
+                project_ids = list(
+                    Project.objects.filter(company=ba.company, status=1).order_by('rank').values_list('id', flat=True)
+                )
+                agency_name = Agency.objects.filter(id=ba.company).values_list('name', flat=True).first() or "Unknown Agency"
+                definitions = get_form_definitions(project_ids)
+                definitions = [definitions[pid] for pid in project_ids if pid in definitions]
+                etag = combine_etags(ba.id, ba.name, ba.pass_code, agency_name, *[d.etag for d in definitions])
+                return etag_response(request, etag, lambda: render_ba_document(ba, agency_name, definitions))
             
             # If no ba_id, get all BAs with filters
             queryset = Ba.objects.all()
@@ -63,19 +78,38 @@ class BaRichDataView(APIView):
                         'message': f'Company {company} not found'
                     }, status=status.HTTP_404_NOT_FOUND)
             
-            # Get BAs and apply filters
-            bas = []
-            for ba in queryset:
-                ba.projects = self._get_filtered_projects(ba, start_date, end_date, project_id, form_id)
-                if ba.projects.exists(): # Only include BA if they have projects after filtering
-                    serializer = BaNestedSerializer(ba)
-                    bas.append(serializer.data)
-            
-            return Response({
-                'response': 'success',
-                'count': len(bas),
-                'data': bas
-            })
+            # Work per company rather than per BA: every BA of a company gets the same
+            # agency name and project documents, so each is loaded once and shared
+            bas = list(queryset)
+            company_ids = {ba.company for ba in bas}
+
+            # Only include BAs whose company still has projects after filtering
+            matching_companies = set(
+                self._get_filtered_projects(company_ids, start_date, end_date, project_id, form_id)
+                .values_list('company', flat=True).distinct()
+            )
+            agency_names = dict(Agency.objects.filter(id__in=company_ids).values_list('id', 'name'))
+
+            company_projects = {}
+            for pid, company_id in Project.objects.filter(company__in=matching_companies, status=1) \
+                    .order_by('rank').values_list('id', 'company'):
+                company_projects.setdefault(company_id, []).append(pid)
+            definitions = get_form_definitions(
+                [pid for project_ids in company_projects.values() for pid in project_ids]
+            )
+
+            documents = []
+            for ba in bas:
+                if ba.company not in matching_companies:
+                    continue
+                documents.append(render_ba_document(
+                    ba,
+                    agency_names.get(ba.company, "Unknown Agency"),
+                    [definitions[pid] for pid in company_projects.get(ba.company, []) if pid in definitions],
+                ))
+
+            body = b'{"response":"success","count":%d,"data":[' % len(documents) + b','.join(documents) + b']}'
+            return HttpResponse(body, content_type='application/json')
             
         except Exception as e:
             return Response({
@@ -83,13 +117,12 @@ class BaRichDataView(APIView):
                 'message': f'An error occurred: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def _get_filtered_projects(self, ba, start_date, end_date, project_id, form_id):
+    def _get_filtered_projects(self, company_ids, start_date, end_date, project_id, form_id):
         """
-        Apply filters to projects associated with a BA's company and return a filtered queryset.
+        Apply filters to the projects of the given companies and return a filtered queryset.
         """
-        # Get projects for this BA's company
-        projects = Project.objects.filter(company=ba.company, status=True).order_by('rank') \
-            .prefetch_related('form_sections__associations__input_options') # Optimize queries
+        # Get projects for these companies
+        projects = Project.objects.filter(company__in=company_ids, status=True).order_by('rank')
         # Apply project filter
         if project_id:
             try:
@@ -154,7 +187,7 @@ class BaDataWithRecordsView(APIView):
             # === Permission Check ===
             user = request.user
             if isinstance(user, UAdmin):
-                if ba.company not in user.agencies.values_list('id', flat=True):
+                if ba.company not in get_access_scope(request).agency_ids:
                     return Response({'response': 'error', 'message': 'Forbidden: You do not have permission to access this BA.'}, status=status.HTTP_403_FORBIDDEN)
             elif isinstance(user, Ba):
                 if user.id != ba.id:
@@ -172,23 +205,26 @@ class BaDataWithRecordsView(APIView):
                 agency_name = "Unknown Agency"
             
             # Get projects
-            projects = Project.objects.filter(company=ba.company, status=True).order_by('rank') \
-                .prefetch_related('form_sections__associations__input_options') # Optimize queries
+            projects = Project.objects.filter(company=ba.company, status=True).order_by('rank')
             
             # Apply project filter
             if project_id:
                 try:
-                    projects = projects.filter(id=project_id)
+                    projects = projects.filter(id=int(project_id))
                 except ValueError:
                     return Response({
                         'response': 'error',
                         'message': f'Invalid project ID: {project_id}'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
+            # Sections, fields and options of every project in three queries
+            projects = list(projects)
+            schemas = load_form_schemas([project.id for project in projects])
+
             # Build response
             projects_data = []
             for project in projects:
-                project_data = self._get_project_data(project, ba, start_date, end_date, include_data)
+                project_data = self._get_project_data(project, schemas[project.id], ba, start_date, end_date, include_data)
                 if project_data:
                     projects_data.append(project_data)
             
@@ -208,16 +244,13 @@ class BaDataWithRecordsView(APIView):
                 'message': f'An error occurred: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def _get_project_data(self, project, ba, start_date, end_date, include_data):
+    def _get_project_data(self, project, schema, ba, start_date, end_date, include_data):
         """
         Get project data with forms and optionally data records
         """
-        # Get form sections
-        form_sections = FormSection.objects.filter(project=project).order_by('rank')
-        
         forms_data = []
-        for form_section in form_sections:
-            form_data = self._get_form_data(form_section, ba, start_date, end_date, include_data)
+        for form_section in schema.sections:
+            form_data = self._get_form_data(form_section, project, schema, ba, start_date, end_date, include_data)
             if form_data:
                 forms_data.append(form_data)
         
@@ -230,16 +263,13 @@ class BaDataWithRecordsView(APIView):
             "forms": forms_data
         }
     
-    def _get_form_data(self, form_section, ba, start_date, end_date, include_data):
+    def _get_form_data(self, form_section, project, schema, ba, start_date, end_date, include_data):
         """
         Get form data with fields and optionally data records
         """
-        # Get project associations (fields)
-        project_assocs = ProjectAssoc.objects.filter(project=form_section.project).order_by('rank')
-        
         fields_data = []
-        for project_assoc in project_assocs:
-            field_data = self._get_field_data(project_assoc)
+        for project_assoc in schema.fields:
+            field_data = self._get_field_data(project_assoc, schema.options_for(project_assoc))
             if field_data:
                 fields_data.append(field_data)
         
@@ -247,17 +277,15 @@ class BaDataWithRecordsView(APIView):
             "form_title": form_section.title,
             "form_id": str(form_section.id),
             "form_rank": str(form_section.rank),
-            "location_status": form_section.project.location_status,
-            "image_required": form_section.project.image_required,
+            "location_status": project.location_status,
+            "image_required": project.image_required,
             "form_fields": fields_data
         }
     
-    def _get_field_data(self, project_assoc):
+    def _get_field_data(self, project_assoc, input_options):
         """
-        Get field data with options and optionally data values
+        Get field data with its prefetched options
         """
-        # Get input options
-        input_options = InputOptions.objects.filter(field_id=project_assoc.id).order_by('rank')
         options_data = []
         for option in input_options:
             options_data.append({
@@ -273,4 +301,29 @@ class BaDataWithRecordsView(APIView):
             "multiple_choice": str(project_assoc.multiple).lower(),
             "options_available": str(project_assoc.options_available),
             "field_input_options": options_data
-        } 
\ No newline at end of file
+        } 
+
+
+class ProjectFormDefinitionView(APIView):
+    """
+    Cached form definition of a single project (forms, fields and input options),
+    served as pre-rendered JSON with an ETag. Send If-None-Match to get a 304 when
+    the form has not changed.
+    """
+    authentication_classes = [MultiTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, project_id):
+        if project_id not in get_access_scope(request).project_ids:
+            return Response({
+                'response': 'error',
+                'message': f'Project with ID {project_id} not found or you do not have permission to access it.'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        definition = get_form_definition(project_id)
+        if definition is None:
+            return Response({
+                'response': 'error',
+                'message': f'Project with ID {project_id} not found or you do not have permission to access it.'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return etag_response(request, definition.etag, lambda: definition.body)
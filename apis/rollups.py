@@ -0,0 +1,119 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import (
+    DataRollup, FormSubmission, AirtelCombined, CokeCombined, BaimsCombined, KspcaCombined,
+    SaffCombined, TotalKenya, AppData
+)
+
+# Wide tables that data entries are counted in, keyed by Project.top_table
+DATA_TABLE_MODELS = {
+    'airtel_combined': AirtelCombined,
+    'coke_combined': CokeCombined,
+    'baims_combined': BaimsCombined,
+    'kspca_combined': KspcaCombined,
+    'saff_combined': SaffCombined,
+    'total_kenya': TotalKenya,
+    'app_data': AppData,
+}
+
+
+def has_project_column(model):
+    return any(field.name == 'project' for field in model._meta.concrete_fields)
+
+
+# Tables whose rows are rolled up: {table name: (model, date field)}.
+# Collection tables without a project column cannot be attributed and are left out.
+ROLLUP_SOURCES = {
+    table: (model, 't_date')
+    for table, model in DATA_TABLE_MODELS.items()
+    if has_project_column(model)
+}
+ROLLUP_SOURCES['form_submission'] = (FormSubmission, 'submitted_at')
+
+
+def rollups_enabled():
+    return getattr(settings, 'DATA_ROLLUPS_ENABLED', False)
+
+
+def _as_date(value):
+    if hasattr(value, 'date'):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def record_rows(table, project_id, day, delta=1):
+    """Add delta (negative for deletes) to the rollup row of (table, project, day)"""
+    day = _as_date(day)
+    updated = DataRollup.objects.filter(table=table, project=project_id, t_date=day) \
+        .update(count=F('count') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DataRollup.objects.create(table=table, project=project_id, t_date=day, count=delta)
+    except IntegrityError:
+        # Another request created the row first
+        DataRollup.objects.filter(table=table, project=project_id, t_date=day) \
+            .update(count=F('count') + delta)
+
+
+def record_created(table, instances):
+    """
+    Count rows inserted without post_save signals (bulk_create) into the rollup,
+    with one update per (project, day) rather than per row
+    """
+    if not rollups_enabled():
+        return
+    model, date_field = ROLLUP_SOURCES[table]
+    deltas = Counter(
+        (getattr(instance, 'project_id', None) or instance.project, _as_date(getattr(instance, date_field)))
+        for instance in instances
+    )
+    for (project_id, day), delta in deltas.items():
+        record_rows(table, project_id, day, delta)
+
+
+def rebuild_rollups(tables=None):
+    """
+    Recompute the rollup rows of the given tables (default: all) from the source tables.
+    Returns {table: number of rollup rows written}.
+    """
+    written = {}
+    for table in tables or ROLLUP_SOURCES:
+        model, date_field = ROLLUP_SOURCES[table]
+        day = TruncDate(date_field) if date_field == 'submitted_at' else F(date_field)
+        rows = (
+            model.objects.annotate(day=day)
+            .values_list('project', 'day')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        rollups = [
+            DataRollup(table=table, project=project_id, t_date=t_date, count=total)
+            for project_id, t_date, total in rows
+            if t_date is not None
+        ]
+        with transaction.atomic():
+            DataRollup.objects.filter(table=table).delete()
+            DataRollup.objects.bulk_create(rollups, batch_size=1000)
+        written[table] = len(rollups)
+    return written
+
+
+def project_totals(table, project_ids):
+    """{project_id: rows in table} read from the rollup"""
+    rows = (
+        DataRollup.objects.filter(table=table, project__in=project_ids)
+        .values_list('project')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+    return dict(rows)
+
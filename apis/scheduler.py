@@ -0,0 +1,84 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process election, every process runs its jobs
+    fcntl = None
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_started = set()
+_lock = threading.Lock()
+# Lock files held by this process, one per job it was elected to run, and when each
+# job's election was last tried
+_leases = {}
+_last_attempt = {}
+
+
+def celery_enabled():
+    """Whether periodic jobs are left to Celery beat (a broker is configured)"""
+    return bool(getattr(settings, 'CELERY_BROKER_URL', ''))
+
+
+def _elect(name):
+    """
+    Try to become the one process on this host that runs job `name`, by taking an
+    exclusive lock on a lock file and keeping it open for the life of the process.
+    When the elected worker exits the lock is released and another worker takes over.
+    """
+    if fcntl is None:
+        return True
+    handle = open(os.path.join(tempfile.gettempdir(), f'baims-periodic-{name}.lock'), 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _leases[name] = handle
+    return True
+
+
+def start_periodic(name, interval, func, shared=True):
+    """
+    Run func every `interval` seconds on a daemon thread. Used when no Celery broker is
+    configured (otherwise beat schedules the job). Only one web worker per host is
+    elected to run each job; the others retry the election at most once per interval,
+    so it is safe to call on every request.
+
+    shared=False is for jobs whose result only the running process sees (filling a
+    per-process cache): every process then runs its own copy, with or without Celery.
+    """
+    if interval <= 0 or (shared and celery_enabled()):
+        return False
+    with _lock:
+        if name in _started:
+            return False
+        if shared:
+            now = time.monotonic()
+            if name in _last_attempt and now - _last_attempt[name] < interval:
+                return False
+            _last_attempt[name] = now
+            if not _elect(name):
+                return False
+        _started.add(name)
+
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                func()
+            except Exception:
+                logger.exception("Periodic job %s failed", name)
+            finally:
+                close_old_connections()
+
+    threading.Thread(target=run, name=f'periodic-{name}', daemon=True).start()
+    return True
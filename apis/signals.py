@@ -0,0 +1,118 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.db import transaction
+from .models import (
+    AuthToken, AdminAuthToken, BaAuthToken, User, UAdmin, UAdminAgency, Ba, BaProject, Project,
+    FormSection, ProjectAssoc, InputOptions, FormSubmission
+)
+from .authentication import invalidate_token, invalidate_principal
+from .access_scope import invalidate_access_scopes
+from .form_definitions import bump_form_version
+from .rollups import ROLLUP_SOURCES, rollups_enabled, record_rows
+from .answers import projection_enabled, project_answers
+
+
+# Token cache invalidation
+
+@receiver(post_delete, sender=AuthToken)
+def auth_token_deleted(sender, instance, **kwargs):
+    invalidate_token('token', instance.key)
+
+
+@receiver(post_delete, sender=AdminAuthToken)
+def admin_auth_token_deleted(sender, instance, **kwargs):
+    invalidate_token('admin_token', instance.key)
+
+
+@receiver(post_delete, sender=BaAuthToken)
+def ba_auth_token_deleted(sender, instance, **kwargs):
+    invalidate_token('ba_token', instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Covers active_status toggles as well as any other change to the cached user
+    invalidate_principal('user', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UAdmin)
+def admin_changed(sender, instance, **kwargs):
+    invalidate_principal('admin', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Ba)
+def ba_changed(sender, instance, **kwargs):
+    invalidate_principal('ba', instance.pk)
+
+
+# Access scope invalidation
+
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=BaProject)
+@receiver([post_save, post_delete], sender=UAdminAgency)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UAdmin)
+@receiver([post_save, post_delete], sender=Ba)
+def scope_source_changed(sender, **kwargs):
+    invalidate_access_scopes()
+
+
+@receiver(m2m_changed, sender=UAdmin.agencies.through)
+def admin_agencies_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_access_scopes()
+
+
+# Form definition versioning
+
+def _bump_on_commit(project_id):
+    # Bumping inside the transaction would let a reader cache the uncommitted
+    # definition under the new version; outside a transaction this runs at once
+    transaction.on_commit(lambda: bump_form_version(project_id))
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_form_changed(sender, instance, **kwargs):
+    _bump_on_commit(instance.id)
+
+
+@receiver([post_save, post_delete], sender=FormSection)
+def form_section_changed(sender, instance, **kwargs):
+    _bump_on_commit(instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=ProjectAssoc)
+def form_field_changed(sender, instance, **kwargs):
+    _bump_on_commit(instance.project)
+
+
+@receiver([post_save, post_delete], sender=InputOptions)
+def input_option_changed(sender, instance, **kwargs):
+    project_id = ProjectAssoc.objects.filter(id=instance.field_id).values_list('project', flat=True).first()
+    if project_id is not None:
+        _bump_on_commit(project_id)
+
+
+# Row-count rollups
+
+def _rollup_receiver(table, date_field, delta):
+    def receiver(sender, instance, created=True, **kwargs):
+        if created and rollups_enabled():
+            record_rows(table, getattr(instance, 'project_id', None) or instance.project,
+                        getattr(instance, date_field), delta)
+    return receiver
+
+
+for _table, (_model, _date_field) in ROLLUP_SOURCES.items():
+    post_save.connect(_rollup_receiver(_table, _date_field, 1), sender=_model, weak=False,
+                      dispatch_uid=f'rollup_insert_{_table}')
+    post_delete.connect(_rollup_receiver(_table, _date_field, -1), sender=_model, weak=False,
+                        dispatch_uid=f'rollup_delete_{_table}')
+
+
+# Typed answer projection
+
+@receiver(post_save, sender=FormSubmission)
+def form_submission_saved(sender, instance, created, **kwargs):
+    if projection_enabled():
+        project_answers([instance], replace=not created)
@@ -0,0 +1,109 @@
+import csv
+import json
+import re
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.http import StreamingHttpResponse
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# Leading characters that make Excel read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Control characters XML, and so openpyxl, does not allow in a cell
+ILLEGAL_CHARACTERS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Plain numbers, which may keep a leading sign
+NUMBER_RE = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?')
+
+
+def server_side_cursor(connection):
+    """
+    Return a cursor that leaves the result set on the database server.
+    MySQL's default cursor buffers the whole result client-side, so an unbuffered
+    SSCursor is opened on the raw MySQLdb connection instead; other backends use
+    Django's chunked cursor.
+    """
+    if connection.vendor == 'mysql':
+        from MySQLdb.cursors import SSCursor
+        connection.ensure_connection()
+        return connection.connection.cursor(SSCursor)
+    return connection.chunked_cursor()
+
+
+def iter_query(sql, params=None, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Execute sql on a server-side cursor and yield the column names, then the rows
+    in fetchmany() batches. Nothing runs until the first item is requested, and
+    the cursor is closed when the generator is exhausted or closed.
+    """
+    batch_size = batch_size or getattr(settings, 'STREAM_BATCH_SIZE', 2000)
+    cursor = server_side_cursor(connections[using])
+    try:
+        cursor.execute(sql, params or [])
+        yield [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def safe_text(value):
+    """
+    A field-entered string made safe for a spreadsheet: control characters are dropped and
+    text that Excel would run as a formula gets a leading ' (plain numbers like -5 are kept)
+    """
+    value = ILLEGAL_CHARACTERS_RE.sub('', value)
+    if value.startswith(FORMULA_PREFIXES) and not NUMBER_RE.fullmatch(value):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_chunks(batches):
+    """Encode iter_query output as newline-delimited JSON objects, one chunk per batch"""
+    columns = next(batches, None)
+    if columns is None:
+        return
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+            for row in rows
+        )
+
+
+def _csv_cell(value):
+    return safe_text(value) if isinstance(value, str) else value
+
+
+def csv_chunks(batches):
+    """Encode iter_query output as CSV with a header row, one chunk per batch"""
+    columns = next(batches, None)
+    if columns is None:
+        return
+    writer = csv.writer(_Echo())
+    yield writer.writerow([_csv_cell(column) for column in columns])
+    for rows in batches:
+        yield ''.join(writer.writerow([_csv_cell(value) for value in row]) for row in rows)
+
+
+def streaming_query_response(sql, params, export_format, filename, batch_size=None):
+    """Stream the result of sql as an NDJSON or CSV download without buffering it"""
+    encode = ndjson_chunks if export_format == 'ndjson' else csv_chunks
+    response = StreamingHttpResponse(
+        encode(iter_query(sql, params, batch_size=batch_size)),
+        content_type=STREAM_CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
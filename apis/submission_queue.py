@@ -0,0 +1,282 @@
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .models import User, UAdmin, Ba
+from .access_scope import compute_access_scope, principal_key
+from .submissions import ingest_submissions
+
+# Ticket states: queued -> processing -> done | failed
+QUEUED, PROCESSING, DONE, FAILED = 'queued', 'processing', 'done', 'failed'
+
+PRINCIPAL_MODELS = {'admin': UAdmin, 'ba': Ba, 'user': User}
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def _now():
+    return timezone.now().isoformat()
+
+
+class RedisSubmissionQueue:
+    """
+    Queue held in Redis: a list of pending entries, a list of entries being processed
+    (so a crashed worker's entries can be put back) and one key per ticket.
+    """
+    PENDING = 'submission_queue:pending'
+    PROCESSING = 'submission_queue:processing'
+    TICKET_KEY = 'submission_ticket:{ticket}'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ticket_ttl = getattr(settings, 'SUBMISSION_TICKET_TTL', 604800)
+
+    def _set_ticket(self, pipe, ticket):
+        pipe.set(self.TICKET_KEY.format(ticket=ticket['ticket']), _dumps(ticket), ex=self.ticket_ttl)
+
+    def enqueue(self, ticket_id, principal, items):
+        ticket = {'ticket': ticket_id, 'state': QUEUED, 'principal': principal,
+                  'created_at': _now(), 'updated_at': _now(), 'result': None}
+        pipe = self.client.pipeline()
+        self._set_ticket(pipe, ticket)
+        pipe.lpush(self.PENDING, _dumps({'ticket': ticket_id, 'principal': principal, 'items': items}))
+        pipe.execute()
+
+    def claim(self, limit):
+        claimed = []
+        for _ in range(limit):
+            raw = self.client.rpoplpush(self.PENDING, self.PROCESSING)
+            if raw is None:
+                break
+            entry = json.loads(raw)
+            entry['token'] = raw
+            self._update(entry['ticket'], state=PROCESSING)
+            claimed.append(entry)
+        return claimed
+
+    def complete(self, entry, state, result):
+        self._update(entry['ticket'], state=state, result=result)
+        self.client.lrem(self.PROCESSING, 1, entry['token'])
+
+    def requeue_stale(self, older_than=None):
+        """
+        Put back entries left in processing by a worker that stopped: all of them, or with
+        older_than (a datetime) those whose ticket was last updated before it. Ingestion is
+        idempotent, so an entry that was in fact still running is only written once.
+        """
+        moved = 0
+        for raw in self.client.lrange(self.PROCESSING, 0, -1):
+            if older_than is not None:
+                ticket = self.get_ticket(json.loads(raw)['ticket'])
+                if ticket and ticket.get('updated_at', '') >= older_than.isoformat():
+                    continue
+            # Only the process that removes the entry puts it back
+            if self.client.lrem(self.PROCESSING, 1, raw):
+                self.client.lpush(self.PENDING, raw)
+                moved += 1
+        return moved
+
+    def get_ticket(self, ticket_id):
+        raw = self.client.get(self.TICKET_KEY.format(ticket=ticket_id))
+        return json.loads(raw) if raw else None
+
+    def _update(self, ticket_id, **changes):
+        ticket = self.get_ticket(ticket_id) or {'ticket': ticket_id}
+        ticket.update(changes, updated_at=_now())
+        pipe = self.client.pipeline()
+        self._set_ticket(pipe, ticket)
+        pipe.execute()
+
+
+class SQLiteSubmissionQueue:
+    """
+    Queue kept in a local SQLite file, for deployments without Redis. Tickets are
+    claimed under an immediate (write-locked) transaction so several worker processes
+    on the same host never claim the same ticket.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ticket_ttl = getattr(settings, 'SUBMISSION_TICKET_TTL', 604800)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS submission_queue ("
+                " ticket TEXT PRIMARY KEY, state TEXT NOT NULL, principal TEXT NOT NULL,"
+                " items TEXT, result TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS submission_queue_state ON submission_queue (state)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, ticket_id, principal, items):
+        now = _now()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO submission_queue (ticket, state, principal, items, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [ticket_id, QUEUED, _dumps(principal), _dumps(items), now, now],
+            )
+
+    def claim(self, limit):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT ticket, principal, items FROM submission_queue"
+                " WHERE state = ? ORDER BY rowid LIMIT ?", [QUEUED, limit],
+            ).fetchall()
+            conn.executemany(
+                "UPDATE submission_queue SET state = ?, updated_at = ? WHERE ticket = ?",
+                [(PROCESSING, _now(), row['ticket']) for row in rows],
+            )
+            # Forget finished tickets once nobody can be polling them any more
+            expired = (timezone.now() - timedelta(seconds=self.ticket_ttl)).isoformat()
+            conn.execute(
+                "DELETE FROM submission_queue WHERE state IN (?, ?) AND updated_at < ?",
+                [DONE, FAILED, expired],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [
+            {'ticket': row['ticket'], 'principal': json.loads(row['principal']), 'items': json.loads(row['items'])}
+            for row in rows
+        ]
+
+    def complete(self, entry, state, result):
+        with closing(self._connect()) as conn:
+            # The items are no longer needed once the ticket is settled
+            conn.execute(
+                "UPDATE submission_queue SET state = ?, result = ?, items = NULL, updated_at = ? WHERE ticket = ?",
+                [state, _dumps(result), _now(), entry['ticket']],
+            )
+
+    def requeue_stale(self, older_than=None):
+        """
+        Put back tickets left in processing by a worker that stopped: all of them, or with
+        older_than (a datetime) those last updated before it. Ingestion is idempotent.
+        """
+        sql, params = "UPDATE submission_queue SET state = ?, updated_at = ? WHERE state = ?", [QUEUED, _now(), PROCESSING]
+        if older_than is not None:
+            sql += " AND updated_at < ?"
+            params.append(older_than.isoformat())
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).rowcount
+
+    def get_ticket(self, ticket_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT ticket, state, principal, result, created_at, updated_at"
+                " FROM submission_queue WHERE ticket = ?", [ticket_id],
+            ).fetchone()
+        if row is None:
+            return None
+        ticket = dict(row)
+        ticket['principal'] = json.loads(ticket['principal'])
+        ticket['result'] = json.loads(ticket['result']) if ticket['result'] else None
+        return ticket
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def queue_enabled():
+    return getattr(settings, 'SUBMISSION_QUEUE_ENABLED', False)
+
+
+def get_queue():
+    """The configured queue: Redis when SUBMISSION_QUEUE_URL is set, the SQLite file otherwise"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            url = getattr(settings, 'SUBMISSION_QUEUE_URL', '')
+            if url:
+                _queue = RedisSubmissionQueue(url)
+            else:
+                _queue = SQLiteSubmissionQueue(settings.SUBMISSION_QUEUE_PATH)
+    return _queue
+
+
+def wants_async(request):
+    """
+    Whether a submission request should be queued: the queue must be enabled and the
+    client must opt in with ?async=1 or a `Prefer: respond-async` header.
+    """
+    if not queue_enabled():
+        return False
+    if request.query_params.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def enqueue_submissions(user, items):
+    """Queue shape-validated submission items for user; returns the ticket id"""
+    ticket_id = uuid.uuid4().hex
+    get_queue().enqueue(ticket_id, list(principal_key(user)), items)
+    return ticket_id
+
+
+def get_ticket(user, ticket_id):
+    """The state of a ticket, or None when it does not exist or belongs to someone else"""
+    ticket = get_queue().get_ticket(ticket_id)
+    if ticket is None or tuple(ticket['principal']) != principal_key(user):
+        return None
+    return ticket
+
+
+def _process(entry):
+    kind, pk = entry['principal']
+    user = PRINCIPAL_MODELS[kind].objects.filter(pk=pk).first()
+    if user is None:
+        return FAILED, {'errors': 'The submitting account no longer exists.'}
+    results = ingest_submissions(user, entry['items'], compute_access_scope(user).project_ids)
+    # Round-trip through JSON so ids, UUIDs and datetimes are stored as plain values
+    return DONE, json.loads(_dumps(results))
+
+
+def requeue_abandoned(queue=None):
+    """
+    Queue again the tickets claimed more than SUBMISSION_QUEUE_VISIBILITY_TIMEOUT seconds
+    ago and never finished. Younger claims may still be in progress elsewhere and are left
+    alone. Returns the number of tickets requeued.
+    """
+    timeout = getattr(settings, 'SUBMISSION_QUEUE_VISIBILITY_TIMEOUT', 600)
+    return (queue or get_queue()).requeue_stale(older_than=timezone.now() - timedelta(seconds=timeout))
+
+
+def drain_queue(limit=None):
+    """
+    Claim queued tickets and write their submissions to FormSubmission, one bulk insert
+    per ticket. Tickets claimed more than SUBMISSION_QUEUE_VISIBILITY_TIMEOUT seconds ago
+    and never finished (their worker stopped) are queued again first, whichever of the
+    thread, Celery or command drains runs. Returns the number of tickets processed.
+    """
+    if not queue_enabled():
+        return 0
+    queue = get_queue()
+    requeue_abandoned(queue)
+    entries = queue.claim(limit or getattr(settings, 'SUBMISSION_QUEUE_BATCH_SIZE', 50))
+    for entry in entries:
+        try:
+            state, result = _process(entry)
+        except Exception as e:
+            state, result = FAILED, {'errors': str(e)}
+        queue.complete(entry, state, result)
+    return len(entries)
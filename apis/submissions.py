@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import Ba, UAdmin, User, FormSubmission, Project
+from .serializers import BulkFormSubmissionItemSerializer
+from .rollups import record_created
+from .answers import projection_enabled, project_answers
+
+
+def access_denied_message(user):
+    """The access error SubmitFormView reports for each kind of principal"""
+    if isinstance(user, Ba):
+        return 'This BA is not assigned to the specified project.'
+    if isinstance(user, UAdmin):
+        return 'This Admin does not have access to the specified project.'
+    return 'This User does not have access to the specified project.'
+
+
+def can_submit(user):
+    """Whether user can own a stored submission: FormSubmission.user points at a User"""
+    return isinstance(user, User)
+
+
+# Why BAs and admins are refused: they have no User to save submissions against
+SUBMITTER_REQUIRED = 'Form submissions are saved against a User account; BA and admin accounts cannot submit forms.'
+
+
+def owns_submission(user, submission):
+    """Whether a stored submission was made by user (submissions are saved against a User)"""
+    return isinstance(user, User) and submission.user_id == user.id
+
+
+def find_submission(submission_uuid):
+    """The submission already stored under a client-generated id, or None"""
+    if not submission_uuid:
+        return None
+    return FormSubmission.objects.filter(submission_uuid=submission_uuid).first()
+
+
+def _result(index, key, result_status, **extra):
+    return {'index': index, 'idempotency_key': key, 'status': result_status, **extra}
+
+
+def ingest_submissions(user, items, allowed_project_ids):
+    """
+    Validate and insert a batch of form submissions for one user.
+
+    Each item is checked on its own, but project existence and access are resolved once
+    per distinct project. Valid items are inserted with bulk_create in a single
+    transaction. Returns one result per item, in input order, with a status of
+    'created', 'existing' (already stored under that idempotency key by an earlier
+    upload), 'invalid', 'forbidden' or 'duplicate' (idempotency key repeated in the
+    batch; the result points at the first item with that key).
+    """
+    try:
+        return _ingest(user, items, allowed_project_ids)
+    except IntegrityError:
+        # A concurrent upload stored some of the same keys first; they now come back as existing
+        return _ingest(user, items, allowed_project_ids)
+
+
+def _ingest(user, items, allowed_project_ids):
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = BulkFormSubmissionItemSerializer(data=item)
+        if not serializer.is_valid():
+            key = item.get('idempotency_key') if isinstance(item, dict) else None
+            results[index] = _result(index, key, 'invalid', errors=serializer.errors)
+        else:
+            valid.append((index, serializer.validated_data))
+
+    project_ids = {data['project'] for _, data in valid}
+    known_project_ids = set(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+    existing = {
+        submission.submission_uuid: submission
+        for submission in FormSubmission.objects.filter(
+            submission_uuid__in={data['idempotency_key'] for _, data in valid}
+        ).only('id', 'user_id', 'submitted_at', 'submission_uuid')
+    }
+    denied = access_denied_message(user)
+
+    first_by_key = {}
+    pending = []
+    for index, data in valid:
+        key = data['idempotency_key']
+        if key in first_by_key:
+            results[index] = _result(index, key, 'duplicate', duplicate_of=first_by_key[key])
+            continue
+        first_by_key[key] = index
+        if key in existing:
+            # Retried upload: report the stored row without writing again
+            original = existing[key]
+            if owns_submission(user, original):
+                results[index] = _result(index, key, 'existing', id=original.id, submitted_at=original.submitted_at)
+            else:
+                results[index] = _result(index, key, 'invalid', errors={'idempotency_key': ['Already used by another submission.']})
+        elif data['project'] not in known_project_ids:
+            results[index] = _result(index, key, 'invalid', errors={'project': ['Invalid pk - object does not exist.']})
+        elif data['project'] not in allowed_project_ids:
+            results[index] = _result(index, key, 'forbidden', errors=denied)
+        elif not can_submit(user):
+            results[index] = _result(index, key, 'forbidden', errors=SUBMITTER_REQUIRED)
+        else:
+            pending.append((index, data))
+
+    submissions = [
+        FormSubmission(
+            user=user,
+            project_id=data['project'],
+            form_section_id=data.get('form_section_id'),
+            answers=data['answers'],
+            submission_uuid=data['idempotency_key'],
+        )
+        for _, data in pending
+    ]
+    if submissions:
+        batch_size = getattr(settings, 'BULK_INSERT_BATCH_SIZE', 500)
+        with transaction.atomic():
+            FormSubmission.objects.bulk_create(submissions, batch_size=batch_size)
+            if any(submission.pk is None for submission in submissions):
+                # MySQL returns no ids from a bulk insert; look them up by submission_uuid
+                ids = dict(FormSubmission.objects.filter(
+                    submission_uuid__in=[submission.submission_uuid for submission in submissions]
+                ).values_list('submission_uuid', 'id'))
+                for submission in submissions:
+                    submission.pk = ids.get(submission.submission_uuid)
+            # bulk_create sends no post_save, so keep the row-count rollups and
+            # answer projections in step here
+            record_created('form_submission', submissions)
+            if projection_enabled():
+                project_answers(submissions)
+
+    for (index, data), submission in zip(pending, submissions):
+        results[index] = _result(
+            index, data['idempotency_key'], 'created',
+            id=submission.pk, submitted_at=submission.submitted_at,
+        )
+    return results
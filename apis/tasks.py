@@ -0,0 +1,21 @@
+from celery import shared_task
+from .caching import cache_is_shared
+from .dashboard import refresh_dashboard_snapshots
+from .submission_queue import drain_queue
+
+
+@shared_task(name='apis.tasks.refresh_dashboard_snapshots')
+def refresh_dashboard_snapshots_task():
+    """
+    Rebuild every agency's dashboard snapshot. Skipped when the cache is per-process: the
+    Celery worker's copy would never reach the web workers, which refresh their own.
+    """
+    if not cache_is_shared():
+        return 0
+    return len(refresh_dashboard_snapshots())
+
+
+@shared_task(name='apis.tasks.drain_submission_queue')
+def drain_submission_queue_task():
+    """Write queued form submissions to the database"""
+    return drain_queue()
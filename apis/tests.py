@@ -1,3 +1,574 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.backends.utils import CursorWrapper
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import submission_queue, views
+from .access_scope import get_access_scope, scope_cache
+from .aggregation import AggregateQuery
+from .answers import _to_number, field_kind, project_answers, project_fields_cache
+from .authentication import resolve_token, token_cache
+from .change_feed import ChangeFeed, QuerySetChangeFeed, decode_feed_cursor
+from .collection_query import CollectionQuery, column_cache, column_field_cache, decode_cursor
+from .form_definitions import definition_cache_timeout, get_form_version
+from .models import (
+    Agency, User, UAdmin, AdminAuthToken, Ba, BaProject, Project, ProjectAssoc,
+    AirtelCombined, FormSubmission, SubmissionAnswer
+)
+from .submissions import ingest_submissions
+from .views import SubmitFormView
+
+
+def make_agency(name='Agency', holding_table='airtel_combined'):
+    return Agency.objects.create(name=name, country='KE', holding_table=holding_table)
+
+
+def make_project(agency, name='Project'):
+    return Project.objects.create(name=name, client='Client', top_table='airtel_combined', rank=1, company=agency.id)
+
+
+def make_user(agency, username='user'):
+    user = User.objects.create(name=username, username=username, password='secret', region='Nairobi', agency=agency)
+    # User has no is_authenticated of its own; IsAuthenticated needs one on forced requests
+    user.is_authenticated = True
+    return user
+
+
+def make_admin(*agencies):
+    admin = UAdmin.objects.create(u_name='admin', p_phrase='secret', powers='all')
+    admin.agencies.add(*agencies)
+    return admin
+
+
+def admin_client(admin):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Admin_Token ' + AdminAuthToken.objects.create(admin=admin).key)
+    return client
+
+
+def submission_item(project, key=None, **answers):
+    return {'idempotency_key': key or str(uuid.uuid4()), 'project': project.id, 'answers': answers or {'q': 1}}
+
+
+class CacheStateMixin:
+    """Empties the process-level caches, which outlive the per-test transaction"""
+
+    def setUp(self):
+        super().setUp()
+        for local_cache in (token_cache, scope_cache, column_cache, column_field_cache, project_fields_cache):
+            local_cache.clear()
+        cache.clear()
+
+
+@override_settings(SUBMISSION_QUEUE_ENABLED=True, SUBMISSION_QUEUE_URL='')
+class SubmissionQueueTests(CacheStateMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.queue = submission_queue.SQLiteSubmissionQueue(os.path.join(directory, 'queue.sqlite3'))
+        patcher = mock.patch.object(submission_queue, '_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.user = make_user(self.agency)
+
+    def test_enqueue_then_drain_writes_the_submissions(self):
+        ticket = submission_queue.enqueue_submissions(self.user, [submission_item(self.project) for _ in range(3)])
+        self.assertEqual(submission_queue.get_ticket(self.user, ticket)['state'], submission_queue.QUEUED)
+        self.assertEqual(FormSubmission.objects.count(), 0)
+
+        self.assertEqual(submission_queue.drain_queue(), 1)
+
+        settled = submission_queue.get_ticket(self.user, ticket)
+        self.assertEqual(settled['state'], submission_queue.DONE)
+        self.assertEqual([result['status'] for result in settled['result']], ['created'] * 3)
+        self.assertEqual(FormSubmission.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(submission_queue.drain_queue(), 0)
+
+    def test_ticket_is_hidden_from_other_principals(self):
+        ticket = submission_queue.enqueue_submissions(self.user, [submission_item(self.project)])
+        other = make_user(self.agency, username='other')
+        self.assertIsNone(submission_queue.get_ticket(other, ticket))
+
+    def test_ticket_of_a_deleted_account_fails(self):
+        ticket = submission_queue.enqueue_submissions(self.user, [submission_item(self.project)])
+        user_id = self.user.id
+        self.user.delete()
+        submission_queue.drain_queue()
+        self.assertEqual(self.queue.get_ticket(ticket)['state'], submission_queue.FAILED)
+        self.assertFalse(FormSubmission.objects.filter(user_id=user_id).exists())
+
+    def test_recent_claims_are_not_requeued(self):
+        ticket = submission_queue.enqueue_submissions(self.user, [submission_item(self.project)])
+        self.assertEqual(len(self.queue.claim(10)), 1)
+
+        # Still within the visibility timeout: another drainer may be working on it
+        self.assertEqual(submission_queue.requeue_abandoned(), 0)
+        self.assertEqual(submission_queue.drain_queue(), 0)
+        self.assertEqual(self.queue.get_ticket(ticket)['state'], submission_queue.PROCESSING)
+
+    def test_abandoned_claims_are_requeued_and_drained(self):
+        ticket = submission_queue.enqueue_submissions(self.user, [submission_item(self.project)])
+        self.queue.claim(10)
+
+        with override_settings(SUBMISSION_QUEUE_VISIBILITY_TIMEOUT=0):
+            self.assertEqual(submission_queue.drain_queue(), 1)
+        self.assertEqual(self.queue.get_ticket(ticket)['state'], submission_queue.DONE)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+
+class BulkSubmitTests(CacheStateMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.other_project = make_project(make_agency('Other'))
+        self.user = make_user(self.agency)
+
+    def ingest(self, items, user=None):
+        return ingest_submissions(user or self.user, items, {self.project.id})
+
+    def test_item_statuses(self):
+        repeated = str(uuid.uuid4())
+        results = self.ingest([
+            submission_item(self.project, repeated),
+            submission_item(self.project, repeated),
+            submission_item(self.other_project),
+            {'idempotency_key': str(uuid.uuid4()), 'project': 999999, 'answers': {}},
+            {'idempotency_key': 'not-a-uuid', 'project': self.project.id, 'answers': {}},
+            'junk',
+        ])
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'duplicate', 'forbidden', 'invalid', 'invalid', 'invalid'],
+        )
+        self.assertEqual(results[1]['duplicate_of'], 0)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_retried_upload_returns_the_stored_rows(self):
+        items = [submission_item(self.project) for _ in range(3)]
+        first = self.ingest(items)
+        retry = self.ingest(items + [submission_item(self.project)])
+        self.assertEqual([result['status'] for result in retry], ['existing'] * 3 + ['created'])
+        self.assertEqual([result['id'] for result in retry[:3]], [result['id'] for result in first])
+        self.assertEqual(FormSubmission.objects.count(), 4)
+
+    def test_key_of_another_users_submission_is_invalid(self):
+        item = submission_item(self.project)
+        self.ingest([item])
+        results = self.ingest([item], user=make_user(self.agency, username='other'))
+        self.assertEqual(results[0]['status'], 'invalid')
+        self.assertIn('idempotency_key', results[0]['errors'])
+
+    def test_admins_get_a_single_403(self):
+        client = admin_client(make_admin(self.agency))
+        response = client.post('/api/submit-form/bulk/', {'submissions': [submission_item(self.project)] * 3}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('results', response.json()['data'])
+        self.assertEqual(FormSubmission.objects.count(), 0)
+
+    def test_view_reports_per_item_results(self):
+        request = APIRequestFactory().post(
+            '/api/submit-form/bulk/',
+            {'submissions': [submission_item(self.project), submission_item(self.other_project)]},
+            format='json',
+        )
+        force_authenticate(request, user=self.user)
+        response = views.BulkSubmitFormView.as_view()(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['data']['created'], response.data['data']['failed']), (1, 1))
+
+
+class SubmissionUuidTests(CacheStateMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.user = make_user(self.agency)
+        self.other = make_user(self.agency, username='other')
+        self.submission_uuid = str(uuid.uuid4())
+
+    def post(self, user):
+        request = APIRequestFactory().post('/api/submit-form/', {
+            'project': self.project.id, 'answers': {'q': 1}, 'submission_uuid': self.submission_uuid,
+        }, format='json')
+        force_authenticate(request, user=user)
+        return SubmitFormView.as_view()(request)
+
+    def racing(self):
+        """Let the pre-insert lookup miss once, as when a concurrent retry inserts in between"""
+        real = views.find_submission
+        calls = []
+
+        def find_submission(submission_uuid):
+            calls.append(submission_uuid)
+            return None if len(calls) == 1 else real(submission_uuid)
+        return mock.patch.object(views, 'find_submission', find_submission)
+
+    def test_retry_returns_the_original(self):
+        created = self.post(self.user)
+        retried = self.post(self.user)
+        self.assertEqual((created.status_code, retried.status_code), (201, 200))
+        self.assertEqual(retried.data['data']['id'], created.data['data']['id'])
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_uuid_of_another_user_conflicts(self):
+        self.post(self.user)
+        response = self.post(self.other)
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn('answers', response.data['data'])
+
+    def test_race_returns_the_original_to_its_owner(self):
+        created = self.post(self.user)
+        with self.racing():
+            retried = self.post(self.user)
+        self.assertEqual(retried.status_code, 200)
+        self.assertEqual(retried.data['data']['id'], created.data['data']['id'])
+
+    def test_race_does_not_leak_another_users_submission(self):
+        self.post(self.user)
+        with self.racing():
+            response = self.post(self.other)
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn('answers', response.data['data'])
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+
+class BulkCreateTests(CacheStateMixin, TestCase):
+    url = '/api/data/airtel-combined/bulk-create/'
+
+    @classmethod
+    def setUpTestData(cls):
+        # Collection tables carry sub_* columns the models do not declare
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {quote('airtel_combined')} ADD COLUMN {quote('sub_qty')} integer NULL")
+            cursor.execute(f"ALTER TABLE {quote('airtel_combined')} ADD COLUMN {quote('sub_name')} varchar(5) NULL")
+
+    def setUp(self):
+        super().setUp()
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.client = admin_client(make_admin(self.agency))
+
+    def post(self, rows, query=''):
+        return self.client.post(self.url + query, rows, format='json')
+
+    def sub_values(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sub_qty, sub_name FROM airtel_combined ORDER BY id")
+            return cursor.fetchall()
+
+    def test_rows_keep_sub_columns_and_get_defaults(self):
+        response = self.post([{'sub_qty': '3', 'sub_name': 'abc'}, {'sub_qty': 4}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['created'], 2)
+        self.assertEqual(self.sub_values(), [(3, 'abc'), (4, None)])
+        row = AirtelCombined.objects.first()
+        self.assertEqual((row.project, row.t_date), (self.project.id, date.today()))
+
+    def test_unknown_and_id_columns_are_rejected(self):
+        for column in ('sub_missing', 'id'):
+            response = self.post([{column: 1}])
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(AirtelCombined.objects.count(), 0)
+
+    def test_invalid_sub_values_fail_the_upload(self):
+        response = self.post([{'sub_qty': 1}, {'sub_qty': 'many', 'sub_name': 'far too long'}])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['data']['errors']
+        self.assertEqual(errors[0]['row'], 2)
+        self.assertEqual(set(errors[0]['errors']), {'sub_qty', 'sub_name'})
+        self.assertEqual(AirtelCombined.objects.count(), 0)
+
+    def test_partial_writes_the_valid_rows(self):
+        response = self.post([{'sub_qty': 1}, {'sub_qty': 'many'}, {'project': self.project.id + 1000}], '?partial=1')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['failed']), (1, 2))
+        self.assertEqual([error['row'] for error in data['errors']], [2, 3])
+        self.assertEqual(AirtelCombined.objects.count(), 1)
+
+    def failing_chunk(self, marker):
+        """Make the database reject the executemany of any chunk holding marker"""
+        real = CursorWrapper.executemany
+
+        def executemany(cursor, sql, param_list):
+            param_list = list(param_list)
+            if any(marker in row for row in param_list):
+                raise DatabaseError('rejected')
+            return real(cursor, sql, param_list)
+        return mock.patch.object(CursorWrapper, 'executemany', executemany)
+
+    @override_settings(BULK_INSERT_BATCH_SIZE=2)
+    def test_database_error_writes_nothing(self):
+        rows = [{'image_url': 'ok'}] * 4 + [{'image_url': 'bad'}]
+        with self.failing_chunk('bad'):
+            response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        data = response.json()['data']
+        self.assertEqual(data['created'], 0)
+        self.assertEqual(data['errors'], [{'rows': [5], 'errors': 'rejected'}])
+        self.assertEqual(AirtelCombined.objects.count(), 0)
+
+    @override_settings(BULK_INSERT_BATCH_SIZE=2)
+    def test_partial_database_error_reports_the_chunk(self):
+        rows = [{'image_url': 'ok'}, {'image_url': 'bad'}, {'image_url': 'ok'}]
+        with self.failing_chunk('bad'):
+            response = self.post(rows, '?partial=1')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['failed']), (1, 2))
+        self.assertEqual(data['errors'], [{'rows': [1, 2], 'errors': 'rejected'}])
+        self.assertEqual(AirtelCombined.objects.count(), 1)
+
+
+@override_settings(ANSWER_PROJECTION_ENABLED=True)
+class AnswerProjectionTests(CacheStateMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.user = make_user(self.agency)
+        self.fields = {
+            column_name: ProjectAssoc.objects.create(
+                project=self.project.id, report_display_name=column_name, column_name=column_name, rank=rank,
+                field_type=field_type, multiple=0, options_available=0, options_id=0,
+            )
+            for rank, (column_name, field_type) in enumerate([
+                ('qty', 'Number'), ('visited', 'date'), ('brands', 'checkbox'), ('phone', 'phone_number'),
+            ])
+        }
+
+    def answers_of(self, submission):
+        return {
+            (row.column_name, row.value_text): (row.value_number, row.value_date)
+            for row in SubmissionAnswer.objects.filter(submission=submission)
+        }
+
+    def test_field_kind_matches_whole_types(self):
+        self.assertEqual(
+            [field_kind(field_type) for field_type in ('Number', ' date ', 'phone_number', 'update', None)],
+            ['number', 'date', 'text', 'text', 'text'],
+        )
+
+    def test_non_finite_numbers_are_dropped(self):
+        for value in ('nan', 'inf', '-Infinity', '1e999', float('nan'), 10 ** 400, 'many'):
+            self.assertIsNone(_to_number(value), value)
+        self.assertEqual(_to_number('1,250.5'), 1250.5)
+
+    def test_saved_submission_is_projected(self):
+        submission = FormSubmission.objects.create(user=self.user, project=self.project, answers={
+            'qty': '12', 'visited': '2024-05-01', 'brands': ['a', 'b'], 'phone': '0712', 'stale': 'x',
+        })
+        self.assertEqual(self.answers_of(submission), {
+            ('qty', '12'): (12.0, None),
+            ('visited', '2024-05-01'): (None, date(2024, 5, 1)),
+            ('brands', 'a'): (None, None),
+            ('brands', 'b'): (None, None),
+            ('phone', '0712'): (None, None),
+        })
+
+    def test_list_answers_map_field_ids_to_columns(self):
+        submission = FormSubmission.objects.create(user=self.user, project=self.project, answers=[
+            {'field_id': self.fields['qty'].id, 'value': 'inf'},
+            {'field_id': 'visited', 'answer': '2024-05-02'},
+        ])
+        self.assertEqual(self.answers_of(submission), {
+            ('qty', 'inf'): (None, None),
+            ('visited', '2024-05-02'): (None, date(2024, 5, 2)),
+        })
+
+    def test_reprojection_replaces_rows(self):
+        submission = FormSubmission.objects.create(user=self.user, project=self.project, answers={'qty': 1})
+        submission.answers = {'qty': 2}
+        submission.save()
+        self.assertEqual(self.answers_of(submission), {('qty', '2'): (2.0, None)})
+        self.assertEqual(project_answers([submission], replace=True), 1)
+
+
+class KeysetAndLimitTests(CacheStateMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.user = make_user(self.agency)
+        AirtelCombined.objects.bulk_create([AirtelCombined(project=self.project.id) for _ in range(5)])
+        self.ids = list(AirtelCombined.objects.order_by('id').values_list('id', flat=True))
+
+    def collection_pages(self, page_size):
+        pages, params = [], {'page_size': str(page_size), 'columns': 'project'}
+        while True:
+            query = CollectionQuery('airtel_combined', params)
+            with connection.cursor() as cursor:
+                cursor.execute(*query.sql())
+                rows, next_cursor = query.split_page(cursor.fetchall())
+            pages.append(len(rows))
+            if next_cursor is None:
+                return pages, query
+            params = {**params, 'cursor': next_cursor}
+
+    def test_collection_keyset_pages(self):
+        pages, query = self.collection_pages(2)
+        self.assertEqual(pages, [2, 2, 1])
+        self.assertEqual(query.columns, ['project'])
+
+    def test_collection_cursor_is_the_last_id(self):
+        query = CollectionQuery('airtel_combined', {'page_size': '2'})
+        with connection.cursor() as cursor:
+            cursor.execute(*query.sql())
+            _, next_cursor = query.split_page(cursor.fetchall())
+        self.assertEqual(decode_cursor(next_cursor), self.ids[1])
+        with self.assertRaises(ValidationError):
+            decode_cursor('not-a-cursor')
+
+    def test_page_sizes_below_one_are_rejected(self):
+        for page_size in ('0', '-1'):
+            with self.assertRaises(ValidationError):
+                CollectionQuery('airtel_combined', {'page_size': page_size})
+        self.assertEqual(CollectionQuery('airtel_combined', {'cursor': ''}).page_size, 20)
+
+    def test_aggregate_limits(self):
+        for limit in ('0', '-1'):
+            with self.assertRaises(ValidationError):
+                AggregateQuery('airtel_combined', {'group_by': 'project', 'limit': limit}, {self.project.id})
+        query = AggregateQuery('airtel_combined', {'group_by': 'project'}, {self.project.id})
+        self.assertEqual(query.limit, 10000)
+        with connection.cursor() as cursor:
+            cursor.execute(*query.sql())
+            rows, truncated = query.split_page(cursor.fetchall())
+        self.assertEqual((len(rows), truncated), (1, False))
+
+    def test_change_feed_is_abstract(self):
+        with self.assertRaises(TypeError):
+            ChangeFeed(['id'], {})
+
+    def feed_pages(self, feed_class, params):
+        ids = []
+        while True:
+            rows, next_cursor, has_more = feed_class(params).page()
+            ids += [row[0] for row in rows]
+            params = {**params, 'cursor': next_cursor}
+            if not has_more:
+                return ids, next_cursor
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+    def test_change_feed_pages_and_resumes(self):
+        submissions = [FormSubmission.objects.create(user=self.user, project=self.project, answers={}) for _ in range(5)]
+        feed = lambda params: QuerySetChangeFeed(FormSubmission.objects.all(), params)
+        ids, cursor = self.feed_pages(feed, {'limit': '2'})
+        self.assertEqual(ids, [submission.id for submission in submissions])
+        self.assertEqual(decode_feed_cursor(cursor), (None, submissions[-1].id))
+
+        later = FormSubmission.objects.create(user=self.user, project=self.project, answers={})
+        self.assertEqual(self.feed_pages(feed, {'cursor': cursor})[0], [later.id])
+        for limit in ('0', '-5'):
+            with self.assertRaises(ValidationError):
+                feed({'limit': limit})
+        with self.assertRaises(ValidationError):
+            feed({'since': '2024-01-01'})
+
+    def test_change_feed_holds_back_unsettled_rows(self):
+        submissions = [FormSubmission.objects.create(user=self.user, project=self.project, answers={}) for _ in range(4)]
+        settled = timezone.now() - timedelta(minutes=10)
+        FormSubmission.objects.exclude(id=submissions[1].id).update(submitted_at=settled)
+        feed = lambda params: QuerySetChangeFeed(FormSubmission.objects.all(), params, settle_column='submitted_at')
+
+        # The page ends before the first unsettled id, even though later ids are settled
+        ids, cursor = self.feed_pages(feed, {})
+        self.assertEqual(ids, [submissions[0].id])
+
+        FormSubmission.objects.filter(id=submissions[1].id).update(submitted_at=settled)
+        self.assertEqual(self.feed_pages(feed, {'cursor': cursor})[0], [submission.id for submission in submissions[1:]])
+
+
+class CacheInvalidationTests(CacheStateMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.agency = make_agency()
+        self.project = make_project(self.agency)
+        self.admin = make_admin(self.agency)
+
+    def scope(self, user):
+        return get_access_scope(SimpleNamespace(user=user))
+
+    def test_token_cache_serves_warm_keys(self):
+        token = AdminAuthToken.objects.create(admin=self.admin)
+        self.assertEqual(resolve_token('admin_token', token.key)[0].pk, self.admin.pk)
+        with self.assertNumQueries(0):
+            resolve_token('admin_token', token.key)
+
+    def test_deleted_token_is_dropped(self):
+        token = AdminAuthToken.objects.create(admin=self.admin)
+        resolve_token('admin_token', token.key)
+        token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            resolve_token('admin_token', token.key)
+
+    def test_deactivated_user_is_dropped(self):
+        user = make_user(self.agency)
+        key = user.auth_tokens.create().key
+        resolve_token('token', key)
+        user.active_status = 0
+        user.save()
+        with self.assertRaises(AuthenticationFailed):
+            resolve_token('token', key)
+
+    def test_scope_cache_follows_project_changes(self):
+        self.assertEqual(self.scope(self.admin).project_ids, {self.project.id})
+        with self.assertNumQueries(0):
+            self.scope(self.admin)
+        added = make_project(self.agency, name='Added')
+        self.assertEqual(self.scope(self.admin).project_ids, {self.project.id, added.id})
+
+    def test_scope_cache_follows_ba_assignments(self):
+        ba = Ba.objects.create(name='ba', phone='0700', company=self.agency.id, pass_code='x')
+        self.assertEqual(self.scope(ba).project_ids, set())
+        BaProject.objects.create(ba_id=ba.id, project_id=self.project.id, start_date=date.today(), end_date=date.today())
+        self.assertEqual(self.scope(ba).project_ids, {self.project.id})
+
+    def test_scope_cache_follows_admin_agencies(self):
+        other = make_agency('Other')
+        self.admin.agencies.add(other)
+        self.assertEqual(self.scope(self.admin).agency_ids, {self.agency.id, other.id})
+        self.admin.agencies.remove(other)
+        self.assertEqual(self.scope(self.admin).agency_ids, {self.agency.id})
+
+    def test_form_version_bumps_after_commit(self):
+        version = get_form_version(self.project.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            ProjectAssoc.objects.create(
+                project=self.project.id, report_display_name='Qty', column_name='qty', rank=1,
+                field_type='number', multiple=0, options_available=0, options_id=0,
+            )
+            self.assertEqual(get_form_version(self.project.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_form_version(self.project.id), version + 1)
+
+    def test_definitions_expire_quickly_in_a_per_process_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(definition_cache_timeout(), 30)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://localhost:6379'}}):
+            self.assertEqual(definition_cache_timeout(), 86400)
@@ -9,11 +9,13 @@ from .views import (
     ContainerOptionsViewSet, CoopViewSet, Coop2ViewSet,
     FormSubSectionViewSet, InputGroupViewSet, InputOptionsViewSet, LoginView,
     AdminLoginView, UAdminViewSet, BaLoginView, ProjectHeadWithProjectsView,
-    UnifiedFormView, UnifiedFormFieldView, UnifiedFormSectionView, ProfileView, SubmitFormView,
-    ProjectFormFieldsView, DashboardStatsView, CollectionView, FormSectionViewSet
+    UnifiedFormView, UnifiedFormFieldView, UnifiedFormSectionView, ProfileView, SubmitFormView, BulkSubmitFormView,
+    SubmissionTicketView, SubmissionExportView,
+    ProjectFormFieldsView, DashboardStatsView, CollectionView, FormSectionViewSet,
+    CollectionChangesView, SubmissionChangesView
 )
-from .rich_views import BaRichDataView, BaDataWithRecordsView
-from .data_views import WideDataFilterView, ProjectDataView
+from .rich_views import BaRichDataView, BaDataWithRecordsView, ProjectFormDefinitionView
+from .data_views import WideDataFilterView, ProjectDataView, AggregateDataView
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -54,13 +56,20 @@ urlpatterns = [
     path('ba-login/', BaLoginView.as_view(), name='ba-login'),
     path('profile/', ProfileView.as_view(), name='user-profile'),
     path('submit-form/', SubmitFormView.as_view(), name='submit-form'),
+    path('submit-form/bulk/', BulkSubmitFormView.as_view(), name='submit-form-bulk'),
+    path('submit-form/tickets/<str:ticket>/', SubmissionTicketView.as_view(), name='submission-ticket'),
+    path('submissions/export/<int:project_id>/', SubmissionExportView.as_view(), name='submission-export'),
+    path('submissions/changes/', SubmissionChangesView.as_view(), name='submission-changes'),
     
     # Rich API endpoints
     path('rich-data/ba-rich-data/', BaRichDataView.as_view(), name='ba-rich-data'),
+    path('rich-data/ba-rich-data/<int:ba_id>/', BaRichDataView.as_view(), name='ba-rich-data-detail'),
     path('rich-data/ba-data-with-records/<int:ba_id>/', BaDataWithRecordsView.as_view(), name='ba-data-with-records'),
+    path('rich-data/form-definition/<int:project_id>/', ProjectFormDefinitionView.as_view(), name='form-definition'),
     
     # Data filtering endpoints
     path('data/wide-filter/', WideDataFilterView.as_view(), name='wide-data-filter'),
+    path('data/aggregate/', AggregateDataView.as_view(), name='data-aggregate'),
     path('data/project-data/<int:project_id>/', ProjectDataView.as_view(), name='project-data'),
     
     path('project-heads-with-projects/', ProjectHeadWithProjectsView.as_view(), name='project-head-with-projects-list'),
@@ -74,6 +83,7 @@ urlpatterns = [
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
     
     path('collection/<str:collection_name>/', CollectionView.as_view(), name='collection-data'),
+    path('collection/<str:collection_name>/changes/', CollectionChangesView.as_view(), name='collection-changes'),
     
     path('', include(router.urls)),
 ]
@@ -1,12 +1,20 @@
+import csv
+import json
+import uuid
+from collections import Counter
 from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
-from django.core.exceptions import ObjectDoesNotExist
+from django.http import StreamingHttpResponse, FileResponse
+from django.urls import reverse
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
 from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
 from rest_framework.views import APIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.parsers import JSONParser, MultiPartParser
 from .models import (
     User, Agency, Project, ProjectHead, Branch, Outlet, UserOutlet,
     AirtelCombined, CokeCombined, BaimsCombined, KspcaCombined, SaffCombined,
@@ -44,16 +52,35 @@ from .serializers import (
     InputGroupSerializer, InputGroupListSerializer,
     InputOptionsSerializer, InputOptionsListSerializer,
     UAdminSerializer,
-    FormSubmissionSerializer,
+    FormSubmissionSerializer, BulkFormSubmissionItemSerializer,
     ProjectWithDataCountSerializer, ProjectHeadWithProjectCountSerializer
 )
 from django.db import models
 from django.contrib.auth.hashers import check_password
 from rest_framework.authtoken.models import Token
-from .authentication import TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication
+from .authentication import MultiTokenAuthentication, AdminTokenAuthentication
+from .access_scope import get_access_scope, invalidate_access_scopes
+from .pagination import KeysetPagination
+from .counting import PageLengthCount, ExactCount, EstimatedCount, CachedCount
+from .renderers import NDJSONRenderer, CSVRenderer, ParquetRenderer, ArrowFileRenderer, ArrowStreamRenderer
+from .streaming import STREAM_CONTENT_TYPES, streaming_query_response, csv_chunks
+from .columnar import COLUMNAR_CONTENT_TYPES, columnar_available, columnar_query_response
+from .submission_export import EXPORT_FORMATS, iter_submission_rows, xlsx_file
+from .collection_query import ALLOWED_COLLECTION_TABLES, CollectionQuery, date_param, int_param, get_table_columns, get_column_fields
+from .change_feed import TableChangeFeed, QuerySetChangeFeed
 from datetime import date, timedelta
 from apis.nested_serializers import ProjectAssocNestedSerializer
-from django.db import connection
+from .form_schema import group_input_options
+from .dashboard import get_agency_snapshots, refresh_dashboard_snapshots
+from .scheduler import start_periodic
+from .caching import cache_is_shared
+from .submissions import ingest_submissions, find_submission, owns_submission, can_submit, SUBMITTER_REQUIRED
+from .rollups import ROLLUP_SOURCES, record_rows, rollups_enabled
+from .parsers import CSVParser, read_csv_rows
+from .submission_queue import wants_async, enqueue_submissions, get_ticket, drain_queue, queue_enabled
+from django.db import connection, transaction, DatabaseError, IntegrityError
+from django.conf import settings
+from django.utils import timezone
 from django.db.models import Count, Q
 
 
@@ -127,6 +154,9 @@ def custom_exception_handler(exc, context):
 # Generic BaseViewSet to be inherited by other viewsets
 class BaseViewSet(viewsets.ModelViewSet):
     """Base ViewSet with standardized response format"""
+    keyset_pagination_class = KeysetPagination
+    # How data.count is computed on list; see apis/counting.py
+    count_strategy = PageLengthCount()
     
     def get_object(self):
         """Override to provide better error messages"""
@@ -138,18 +168,34 @@ class BaseViewSet(viewsets.ModelViewSet):
             raise ObjectDoesNotExist(f"{model_name} with ID '{item_id}' does not exist.")
     
     def list(self, request, *args, **kwargs):
-        """List all items"""
+        """List all items, one keyset page at a time when ?cursor= or ?page_size= is given"""
         try:
             queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
+            paginator = self.keyset_pagination_class()
+            paginated = paginator.is_requested(request)
+            if paginated:
+                items = paginator.paginate_queryset(queryset, request, view=self)
+            else:
+                items = list(queryset)
+
+            serializer = self.get_serializer(items, many=True)
+            data = {
+                'items': serializer.data,
+                'count': self.count_strategy.count(queryset, items)
+            }
+            if paginated:
+                data['next_cursor'] = paginator.get_next_cursor()
             return Response({
                 'success': True,
-                'message': f'Successfully retrieved {queryset.count()} items',
-                'data': {
-                    'items': serializer.data,
-                    'count': queryset.count()
-                }
+                'message': f'Successfully retrieved {len(items)} items',
+                'data': data
             })
+        except NotFound as e:
+            return Response({
+                'success': False,
+                'message': 'Invalid pagination cursor',
+                'data': {'errors': str(e)}
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'success': False,
@@ -303,6 +349,8 @@ class UserViewSet(viewsets.ModelViewSet):
     
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    # Paginated user lists report the total number of matching users
+    count_strategy = ExactCount()
     
     def get_serializer_class(self):
         """Use different serializers for different actions"""
@@ -351,15 +399,33 @@ class UserViewSet(viewsets.ModelViewSet):
                     models.Q(username__icontains=search)
                 )
             
-            serializer = self.get_serializer(queryset, many=True)
+            paginator = KeysetPagination()
+            paginated = paginator.is_requested(request)
+            if paginated:
+                users = paginator.paginate_queryset(queryset, request, view=self)
+            else:
+                users = list(queryset)
+
+            serializer = self.get_serializer(users, many=True)
+            data = {
+                'users': serializer.data,
+                'count': self.count_strategy.count(queryset, users)
+            }
+            if paginated:
+                data['next_cursor'] = paginator.get_next_cursor()
             return Response({
                 'success': True,
-                'message': f'Successfully retrieved {queryset.count()} users',
+                'message': f'Successfully retrieved {len(users)} users',
+                'data': data
+            })
+        except NotFound as e:
+            return Response({
+                'success': False,
+                'message': 'Invalid pagination cursor',
                 'data': {
-                    'users': serializer.data,
-                    'count': queryset.count()
+                    'errors': str(e)
                 }
-            })
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'success': False,
@@ -653,23 +719,11 @@ class AgencyViewSet(BaseViewSet):
     """ViewSet for Agency model"""
     queryset = Agency.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-
-        if isinstance(user, UAdmin):
-            return Agency.objects.filter(admins=user)
-
-        if isinstance(user, Ba):
-            if user.company:
-                return Agency.objects.filter(id=user.company)
-            return Agency.objects.none()
-
-        if hasattr(user, 'agency') and user.agency:
-            return Agency.objects.filter(id=user.agency.id)
-
-        return Agency.objects.none()
+        scope = get_access_scope(self.request)
+        return Agency.objects.filter(id__in=scope.agency_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -680,23 +734,11 @@ class ProjectViewSet(BaseViewSet):
     """ViewSet for Project model"""
     queryset = Project.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
 
     def get_queryset(self):
-        user = self.request.user
-        
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            return Project.objects.filter(company__in=agency_ids)
-
-        if isinstance(user, Ba):
-            project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-            return Project.objects.filter(id__in=project_ids)
-
-        if hasattr(user, 'agency') and user.agency:
-            return Project.objects.filter(company=user.agency.id)
-            
-        return Project.objects.none()
+        scope = get_access_scope(self.request)
+        return Project.objects.filter(id__in=scope.project_ids)
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -709,11 +751,11 @@ class ProjectViewSet(BaseViewSet):
         company_id = data.get('company')
         if not company_id:
             if isinstance(user, UAdmin):
-                agencies = user.agencies.all()
-                if agencies.count() == 0:
+                agency_ids = get_access_scope(request).agency_ids
+                if len(agency_ids) == 0:
                     return Response({"success": False, "message": "Admin user is not associated with any company."}, status=status.HTTP_403_FORBIDDEN)
-                if agencies.count() == 1:
-                    company_id = agencies.first().id
+                if len(agency_ids) == 1:
+                    company_id = next(iter(agency_ids))
                 else:
                     return Response({"success": False, "message": "Admin with multiple companies must specify a 'company' ID."}, status=status.HTTP_400_BAD_REQUEST)
                 data['company'] = company_id
@@ -740,19 +782,11 @@ class ProjectHeadViewSet(BaseViewSet):
     """ViewSet for ProjectHead model"""
     queryset = ProjectHead.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            return ProjectHead.objects.filter(company__in=agency_ids)
-        allowed_agency_ids = []
-        if isinstance(user, Ba):
-            allowed_agency_ids = [user.company] if user.company else []
-        elif hasattr(user, 'agency') and user.agency:
-            allowed_agency_ids = [user.agency.id]
-        return ProjectHead.objects.filter(company__in=allowed_agency_ids)
+        scope = get_access_scope(self.request)
+        return ProjectHead.objects.filter(company__in=scope.agency_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -772,19 +806,18 @@ class ProjectHeadViewSet(BaseViewSet):
         company_id = None
 
         if isinstance(user, UAdmin):
-            agencies = user.agencies.all()
-            if agencies.count() == 0:
+            allowed_company_ids = get_access_scope(request).agency_ids
+            if len(allowed_company_ids) == 0:
                 return Response({"success": False, "message": "Admin user is not associated with any company."}, status=status.HTTP_403_FORBIDDEN)
             
             if not company_id_from_request:
-                if agencies.count() == 1:
-                    company_id = agencies.first().id
+                if len(allowed_company_ids) == 1:
+                    company_id = next(iter(allowed_company_ids))
                 else:
                     return Response({"success": False, "message": "Admin with multiple companies must specify a 'company' ID."}, status=status.HTTP_400_BAD_REQUEST)
             else:
                 company_id = company_id_from_request
 
-            allowed_company_ids = agencies.values_list('id', flat=True)
             if int(company_id) not in allowed_company_ids:
                 return Response({"success": False, "message": "You do not have permission for this company."}, status=status.HTTP_403_FORBIDDEN)
 
@@ -822,7 +855,7 @@ class ProjectHeadViewSet(BaseViewSet):
             return Response({'success': False, 'message': 'ProjectHead not found.'}, status=404)
         # Permission check
         if isinstance(user, UAdmin):
-            allowed_agency_ids = user.agencies.values_list('id', flat=True)
+            allowed_agency_ids = get_access_scope(request).agency_ids
             if project_head.company not in allowed_agency_ids:
                 return Response({'success': False, 'message': 'You do not have permission to update this ProjectHead.'}, status=403)
         elif isinstance(user, Ba):
@@ -851,7 +884,7 @@ class ProjectHeadViewSet(BaseViewSet):
             return Response({'success': False, 'message': 'ProjectHead not found.'}, status=404)
         # Permission check
         if isinstance(user, UAdmin):
-            allowed_agency_ids = user.agencies.values_list('id', flat=True)
+            allowed_agency_ids = get_access_scope(request).agency_ids
             if project_head.company not in allowed_agency_ids:
                 return Response({'success': False, 'message': 'You do not have permission to delete this ProjectHead.'}, status=403)
         elif isinstance(user, Ba):
@@ -866,21 +899,11 @@ class BranchViewSet(BaseViewSet):
     """ViewSet for Branch model"""
     queryset = Branch.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            return Branch.objects.filter(agency_id__in=agency_ids)
-        
-        if isinstance(user, Ba) and user.company:
-            return Branch.objects.filter(agency_id=user.company)
-
-        if hasattr(user, 'agency') and user.agency:
-            return Branch.objects.filter(agency_id=user.agency.id)
-            
-        return Branch.objects.none()
+        scope = get_access_scope(self.request)
+        return Branch.objects.filter(agency_id__in=scope.agency_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -891,13 +914,13 @@ class OutletViewSet(BaseViewSet):
     """ViewSet for Outlet model"""
     queryset = Outlet.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
         user = self.request.user
         
         if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
+            agency_ids = get_access_scope(self.request).agency_ids
             user_ids = User.objects.filter(agency_id__in=agency_ids).values_list('id', flat=True)
             outlet_ids = UserOutlet.objects.filter(user__in=user_ids).values_list('outlet', flat=True)
             return Outlet.objects.filter(id__in=outlet_ids)
@@ -924,12 +947,12 @@ class UserOutletViewSet(BaseViewSet):
     """ViewSet for UserOutlet model"""
     queryset = UserOutlet.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
         user = self.request.user
         if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
+            agency_ids = get_access_scope(self.request).agency_ids
             user_ids = User.objects.filter(agency_id__in=agency_ids).values_list('id', flat=True)
             return UserOutlet.objects.filter(user__in=user_ids)
         if isinstance(user, User):
@@ -947,26 +970,198 @@ class UserOutletViewSet(BaseViewSet):
 
 # Data Collection ViewSets
 
-class AirtelCombinedViewSet(BaseViewSet):
+class DataCollectionBulkMixin:
+    """
+    Adds POST <data-route>/bulk-create/ to the DataCollectionBase viewsets: rows come as a
+    JSON array ({"rows": [...]} also works), a text/csv body or a multipart "file" CSV upload.
+    Columns are matched against the table's real columns (including the sub_* columns the
+    models do not declare); an upload naming any other column is rejected. Rows without a
+    project get ?project= or the caller's only project, rows without a t_date get today's;
+    every project is checked against the access scope. Values are type-checked against the
+    model field or, for sub_* columns, the introspected column type. Rows are inserted in
+    chunks of BULK_INSERT_BATCH_SIZE, all in one transaction: nothing is inserted if any row
+    is invalid or the database rejects one. With ?partial=1 the valid rows are inserted and
+    each chunk commits on its own; a chunk the database rejects is reported by row numbers.
+    """
+
+    def infer_project(self, request):
+        """The caller's project when their scope holds exactly one; raises ValidationError otherwise"""
+        user = request.user
+        if isinstance(user, Ba):
+            none, many = 'No projects assigned to this BA', 'Multiple projects assigned to this BA'
+        elif isinstance(user, UAdmin):
+            none, many = 'No projects found for this admin', 'Multiple projects found for this admin'
+        elif hasattr(user, 'agency') and user.agency:
+            none, many = 'No projects found for this user', 'Multiple projects found for this user'
+        else:
+            raise ValidationError('Could not determine project from user context. Please specify the project.')
+        project_ids = list(get_access_scope(request).project_ids)
+        if len(project_ids) == 1:
+            return project_ids[0]
+        raise ValidationError(f'{many if project_ids else none}. Please specify the project.')
+
+    def _bulk_rows(self, request):
+        if 'file' in request.FILES:
+            try:
+                return list(read_csv_rows(request.FILES['file'].file))
+            except (csv.Error, UnicodeDecodeError) as e:
+                raise ValidationError(f'CSV parse error - {e}')
+        data = request.data
+        if isinstance(data, dict) and 'rows' in data:
+            data = data['rows']
+        if not isinstance(data, list):
+            raise ValidationError('Expected a JSON array of rows, a CSV body or a CSV file upload.')
+        return data
+
+    def _bulk_columns(self, table, rows):
+        """The columns the upload fills, in table order; raises ValidationError on unknown ones"""
+        table_columns = get_table_columns(table)
+        supplied = {key for row in rows if isinstance(row, dict) for key in row}
+        unknown = sorted((supplied - set(table_columns)) | (supplied & {'id'}))
+        if unknown:
+            raise ValidationError(f"Unknown or read-only columns for {table}: {', '.join(unknown)}")
+        # project and t_date are always written: the ORM would fill them on create too
+        return [column for column in table_columns if column in supplied or column in ('project', 't_date')]
+
+    def _bulk_row(self, row, columns, fields, defaults):
+        """The row's values in column order; raises DjangoValidationError with per-column errors"""
+        values, errors = [], {}
+        for column in columns:
+            value = row.get(column)
+            if value in (None, '') and column in defaults:
+                value = defaults[column]
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            field = fields.get(column)
+            if field is not None and value is not None:
+                try:
+                    value = field.to_python(value)
+                    field.run_validators(value)
+                except DjangoValidationError as e:
+                    errors[column] = e.messages
+            values.append(value)
+        if values[columns.index('project')] is None:
+            errors['project'] = ['This field is required.']
+        if errors:
+            raise DjangoValidationError(errors)
+        return values
+
+    @action(detail=False, methods=['post'], url_path='bulk-create',
+            parser_classes=[JSONParser, CSVParser, MultiPartParser])
+    def bulk_create(self, request):
+        try:
+            rows = self._bulk_rows(request)
+            max_rows = getattr(settings, 'BULK_CREATE_MAX_ROWS', 50000)
+            if not rows or len(rows) > max_rows:
+                raise ValidationError(f'Send between 1 and {max_rows} rows per request.')
+            default_project = int_param(request.query_params, 'project')
+            if default_project is None and any(isinstance(row, dict) and not row.get('project') for row in rows):
+                # Resolved once for the whole upload
+                default_project = self.infer_project(request)
+            model = self.queryset.model
+            table = model._meta.db_table
+            columns = self._bulk_columns(table, rows)
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'message': 'Invalid data provided',
+                'data': {'errors': e.detail}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Declared model fields first; the sub_* columns get fields from introspection
+            fields = dict(get_column_fields(table))
+            fields.update({field.column: field for field in model._meta.concrete_fields})
+            defaults = {'project': default_project, 't_date': date.today()}
+            allowed_project_ids = get_access_scope(request).project_ids
+            chunk_size = getattr(settings, 'BULK_INSERT_BATCH_SIZE', 500)
+            project_index, date_index = columns.index('project'), columns.index('t_date')
+
+            errors = []
+            # (row numbers, row values) of each chunk
+            chunks = []
+            for start in range(0, len(rows), chunk_size):
+                numbers, values = [], []
+                for number, row in enumerate(rows[start:start + chunk_size], start=start + 1):
+                    if not isinstance(row, dict):
+                        errors.append({'row': number, 'errors': 'Expected an object.'})
+                        continue
+                    try:
+                        row_values = self._bulk_row(row, columns, fields, defaults)
+                    except DjangoValidationError as e:
+                        errors.append({'row': number, 'errors': e.message_dict})
+                        continue
+                    if row_values[project_index] not in allowed_project_ids:
+                        errors.append({'row': number, 'errors': {'project': ['You do not have access to this project.']}})
+                    else:
+                        numbers.append(number)
+                        values.append(row_values)
+                if values:
+                    chunks.append((numbers, values))
+
+            partial = request.query_params.get('partial', '').lower() in ('1', 'true', 'yes')
+            created = 0
+            if not errors or partial:
+                quote = connection.ops.quote_name
+                sql = (f"INSERT INTO {quote(table)} ({', '.join(quote(column) for column in columns)}) "
+                       f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+                def insert(values):
+                    with transaction.atomic():
+                        with connection.cursor() as cursor:
+                            cursor.executemany(sql, values)
+                        # Raw inserts send no post_save; keep the row-count rollups in step
+                        if table in ROLLUP_SOURCES and rollups_enabled():
+                            counts = Counter((row[project_index], row[date_index]) for row in values)
+                            for (project_id, day), delta in counts.items():
+                                record_rows(table, project_id, day, delta)
+
+                if partial:
+                    for numbers, values in chunks:
+                        try:
+                            insert(values)
+                        except DatabaseError as e:
+                            errors.append({'rows': numbers, 'errors': str(e)})
+                        else:
+                            created += len(values)
+                else:
+                    numbers = []
+                    try:
+                        with transaction.atomic():
+                            for numbers, values in chunks:
+                                insert(values)
+                                created += len(values)
+                    except DatabaseError as e:
+                        created = 0
+                        errors.append({'rows': numbers, 'errors': str(e)})
+
+            return Response({
+                'success': not errors,
+                'message': f'{created} of {len(rows)} rows created',
+                'data': {
+                    'created': created,
+                    'failed': sum(len(error['rows']) if 'rows' in error else 1 for error in errors),
+                    'errors': errors,
+                }
+            }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred while creating the items',
+                'data': {'errors': str(e)}
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AirtelCombinedViewSet(DataCollectionBulkMixin, BaseViewSet):
     """ViewSet for AirtelCombined model"""
     queryset = AirtelCombined.objects.all()
+    count_strategy = CachedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return AirtelCombined.objects.filter(project__in=project_ids)
-        if isinstance(user, Ba):
-            # Get projects assigned to this BA
-            project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-            return AirtelCombined.objects.filter(project__in=project_ids)
-        if hasattr(user, 'agency') and user.agency:
-            project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-            return AirtelCombined.objects.filter(project__in=project_ids)
-        return AirtelCombined.objects.none()
+        scope = get_access_scope(self.request)
+        return AirtelCombined.objects.filter(project__in=scope.project_ids)
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -975,39 +1170,12 @@ class AirtelCombinedViewSet(BaseViewSet):
 
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
-        user = request.user
         # If project is not provided, try to infer it
         if 'project' not in data or not data['project']:
-            project_id = None
-            if isinstance(user, Ba):
-                # Find projects assigned to this BA
-                project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-                if len(project_ids) == 1:
-                    project_id = project_ids[0]
-                elif len(project_ids) == 0:
-                    return Response({"success": False, "message": "No projects assigned to this BA. Please specify the project."}, status=400)
-                else:
-                    return Response({"success": False, "message": "Multiple projects assigned to this BA. Please specify the project."}, status=400)
-            elif isinstance(user, UAdmin):
-                agency_ids = user.agencies.values_list('id', flat=True)
-                project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-                if len(project_ids) == 1:
-                    project_id = project_ids[0]
-                elif len(project_ids) == 0:
-                    return Response({"success": False, "message": "No projects found for this admin. Please specify the project."}, status=400)
-                else:
-                    return Response({"success": False, "message": "Multiple projects found for this admin. Please specify the project."}, status=400)
-            elif hasattr(user, 'agency') and user.agency:
-                project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-                if len(project_ids) == 1:
-                    project_id = project_ids[0]
-                elif len(project_ids) == 0:
-                    return Response({"success": False, "message": "No projects found for this user. Please specify the project."}, status=400)
-                else:
-                    return Response({"success": False, "message": "Multiple projects found for this user. Please specify the project."}, status=400)
-            else:
-                return Response({"success": False, "message": "Could not determine project from user context. Please specify the project."}, status=400)
-            data['project'] = project_id
+            try:
+                data['project'] = self.infer_project(request)
+            except ValidationError as e:
+                return Response({"success": False, "message": e.detail[0]}, status=400)
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -1018,104 +1186,64 @@ class AirtelCombinedViewSet(BaseViewSet):
             'data': {'item': serializer.data}
         }, status=status.HTTP_201_CREATED, headers=headers)
 
-class CokeCombinedViewSet(BaseViewSet):
+class CokeCombinedViewSet(DataCollectionBulkMixin, BaseViewSet):
     """ViewSet for CokeCombined model"""
     queryset = CokeCombined.objects.all()
+    count_strategy = CachedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return CokeCombined.objects.filter(project__in=project_ids)
-        if isinstance(user, Ba):
-            # Get projects assigned to this BA
-            project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-            return CokeCombined.objects.filter(project__in=project_ids)
-        if hasattr(user, 'agency') and user.agency:
-            project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-            return CokeCombined.objects.filter(project__in=project_ids)
-        return CokeCombined.objects.none()
+        scope = get_access_scope(self.request)
+        return CokeCombined.objects.filter(project__in=scope.project_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
             return CokeCombinedListSerializer
         return CokeCombinedSerializer
 
-class BaimsCombinedViewSet(BaseViewSet):
+class BaimsCombinedViewSet(DataCollectionBulkMixin, BaseViewSet):
     """ViewSet for BaimsCombined model"""
     queryset = BaimsCombined.objects.all()
+    count_strategy = CachedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return BaimsCombined.objects.filter(project__in=project_ids)
-        if isinstance(user, Ba):
-            # Get projects assigned to this BA
-            project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-            return BaimsCombined.objects.filter(project__in=project_ids)
-        if hasattr(user, 'agency') and user.agency:
-            project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-            return BaimsCombined.objects.filter(project__in=project_ids)
-        return BaimsCombined.objects.none()
+        scope = get_access_scope(self.request)
+        return BaimsCombined.objects.filter(project__in=scope.project_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
             return BaimsCombinedListSerializer
         return BaimsCombinedSerializer
 
-class KspcaCombinedViewSet(BaseViewSet):
+class KspcaCombinedViewSet(DataCollectionBulkMixin, BaseViewSet):
     """ViewSet for KspcaCombined model"""
     queryset = KspcaCombined.objects.all()
+    count_strategy = CachedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return KspcaCombined.objects.filter(project__in=project_ids)
-        if isinstance(user, Ba):
-            # Get projects assigned to this BA
-            project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-            return KspcaCombined.objects.filter(project__in=project_ids)
-        if hasattr(user, 'agency') and user.agency:
-            project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-            return KspcaCombined.objects.filter(project__in=project_ids)
-        return KspcaCombined.objects.none()
+        scope = get_access_scope(self.request)
+        return KspcaCombined.objects.filter(project__in=scope.project_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
             return KspcaCombinedListSerializer
         return KspcaCombinedSerializer
 
-class SaffCombinedViewSet(BaseViewSet):
+class SaffCombinedViewSet(DataCollectionBulkMixin, BaseViewSet):
     """ViewSet for SaffCombined model"""
     queryset = SaffCombined.objects.all()
+    count_strategy = CachedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return SaffCombined.objects.filter(project__in=project_ids)
-        if isinstance(user, Ba):
-            # Get projects assigned to this BA
-            project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-            return SaffCombined.objects.filter(project__in=project_ids)
-        if hasattr(user, 'agency') and user.agency:
-            project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-            return SaffCombined.objects.filter(project__in=project_ids)
-        return SaffCombined.objects.none()
+        scope = get_access_scope(self.request)
+        return SaffCombined.objects.filter(project__in=scope.project_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1125,8 +1253,9 @@ class SaffCombinedViewSet(BaseViewSet):
 class RedbullOutletViewSet(BaseViewSet):
     """ViewSet for RedbullOutlet model"""
     queryset = RedbullOutlet.objects.all()
+    count_strategy = EstimatedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1136,8 +1265,9 @@ class RedbullOutletViewSet(BaseViewSet):
 class TotalKenyaViewSet(BaseViewSet):
     """ViewSet for TotalKenya model"""
     queryset = TotalKenya.objects.all()
+    count_strategy = EstimatedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1147,8 +1277,9 @@ class TotalKenyaViewSet(BaseViewSet):
 class AppDataViewSet(BaseViewSet):
     """ViewSet for AppData model"""
     queryset = AppData.objects.all()
+    count_strategy = EstimatedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1159,18 +1290,11 @@ class BaViewSet(BaseViewSet):
     """ViewSet for Ba model"""
     queryset = Ba.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            return Ba.objects.filter(company__in=agency_ids)
-        elif isinstance(user, Ba):
-            return Ba.objects.filter(id=user.id)
-        elif hasattr(user, 'agency') and user.agency:
-            return Ba.objects.filter(company=user.agency.id)
-        return Ba.objects.none()
+        scope = get_access_scope(self.request)
+        return Ba.objects.filter(id__in=scope.ba_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1190,11 +1314,11 @@ class BaViewSet(BaseViewSet):
         company_id = None
 
         if isinstance(user, UAdmin):
-            agencies = user.agencies.all()
-            if agencies.count() == 0:
+            agency_ids = get_access_scope(request).agency_ids
+            if len(agency_ids) == 0:
                 return Response({"success": False, "message": "Admin user is not associated with any company."}, status=status.HTTP_403_FORBIDDEN)
-            if agencies.count() == 1:
-                company_id = agencies.first().id
+            if len(agency_ids) == 1:
+                company_id = next(iter(agency_ids))
             else:
                 return Response({"success": False, "message": "Admin with multiple companies must specify a company in the UI."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1238,6 +1362,8 @@ class BaViewSet(BaseViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         BaProject.objects.bulk_create(ba_projects)
+        # bulk_create bypasses post_save, so refresh cached scopes explicitly
+        invalidate_access_scopes()
         
         return Response({
             'success': True,
@@ -1264,7 +1390,7 @@ class BaViewSet(BaseViewSet):
             
             # Check if user can modify this BA
             if isinstance(user, UAdmin):
-                agency_ids = user.agencies.values_list('id', flat=True)
+                agency_ids = get_access_scope(request).agency_ids
                 if ba.company not in agency_ids:
                     return Response({
                         'success': False,
@@ -1337,7 +1463,7 @@ class BaViewSet(BaseViewSet):
             
             # Check if user can modify this BA
             if isinstance(user, UAdmin):
-                agency_ids = user.agencies.values_list('id', flat=True)
+                agency_ids = get_access_scope(request).agency_ids
                 if ba.company not in agency_ids:
                     return Response({
                         'success': False,
@@ -1410,7 +1536,7 @@ class BaViewSet(BaseViewSet):
             
             # Check if user can delete this BA
             if isinstance(user, UAdmin):
-                agency_ids = user.agencies.values_list('id', flat=True)
+                agency_ids = get_access_scope(request).agency_ids
                 if ba.company not in agency_ids:
                     return Response({
                         'success': False,
@@ -1474,7 +1600,7 @@ class BackendViewSet(BaseViewSet):
     """ViewSet for Backend model"""
     queryset = Backend.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1485,16 +1611,12 @@ class BaProjectViewSet(BaseViewSet):
     """ViewSet for BaProject model"""
     queryset = BaProject.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
         user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            ba_ids = Ba.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return BaProject.objects.filter(ba_id__in=ba_ids)
-        if isinstance(user, Ba):
-            return BaProject.objects.filter(ba_id=user.id)
+        if isinstance(user, (UAdmin, Ba)):
+            return BaProject.objects.filter(ba_id__in=get_access_scope(self.request).ba_ids)
         return BaProject.objects.none()
 
     def get_serializer_class(self):
@@ -1506,22 +1628,11 @@ class ProjectAssocViewSet(BaseViewSet):
     """ViewSet for ProjectAssoc model"""
     queryset = ProjectAssoc.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
-            return ProjectAssoc.objects.filter(project__in=project_ids)
-        
-        allowed_project_ids = []
-        if isinstance(user, Ba):
-            allowed_project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
-        elif hasattr(user, 'agency') and user.agency:
-            allowed_project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
-
-        return ProjectAssoc.objects.filter(project__in=allowed_project_ids)
+        scope = get_access_scope(self.request)
+        return ProjectAssoc.objects.filter(project__in=scope.project_ids)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1539,7 +1650,7 @@ class ProjectAssocViewSet(BaseViewSet):
         if 'project' not in data or not data['project']:
             project_id = None
             if isinstance(user, Ba):
-                project_ids = BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True)
+                project_ids = list(get_access_scope(request).project_ids)
                 if len(project_ids) == 1:
                     project_id = project_ids[0]
                 elif len(project_ids) == 0:
@@ -1548,8 +1659,7 @@ class ProjectAssocViewSet(BaseViewSet):
                     return Response({"success": False, "message": "Multiple projects assigned to this BA. Please specify the project."}, status=400)
             
             elif isinstance(user, UAdmin):
-                agency_ids = user.agencies.values_list('id', flat=True)
-                project_ids = Project.objects.filter(company__in=agency_ids).values_list('id', flat=True)
+                project_ids = list(get_access_scope(request).project_ids)
                 if len(project_ids) == 1:
                     project_id = project_ids[0]
                 elif len(project_ids) == 0:
@@ -1558,7 +1668,7 @@ class ProjectAssocViewSet(BaseViewSet):
                     return Response({"success": False, "message": "Multiple projects found for this admin. Please specify the project."}, status=400)
 
             elif hasattr(user, 'agency') and user.agency:
-                project_ids = Project.objects.filter(company=user.agency.id).values_list('id', flat=True)
+                project_ids = list(get_access_scope(request).project_ids)
                 if len(project_ids) == 1:
                     project_id = project_ids[0]
                 elif len(project_ids) == 0:
@@ -1584,7 +1694,7 @@ class ContainersViewSet(BaseViewSet):
     """ViewSet for Containers model"""
     queryset = Containers.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1595,7 +1705,7 @@ class ContainerOptionsViewSet(BaseViewSet):
     """ViewSet for ContainerOptions model"""
     queryset = ContainerOptions.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1605,8 +1715,9 @@ class ContainerOptionsViewSet(BaseViewSet):
 class CoopViewSet(BaseViewSet):
     """ViewSet for Coop model"""
     queryset = Coop.objects.all()
+    count_strategy = EstimatedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1616,8 +1727,9 @@ class CoopViewSet(BaseViewSet):
 class Coop2ViewSet(BaseViewSet):
     """ViewSet for Coop2 model"""
     queryset = Coop2.objects.all()
+    count_strategy = EstimatedCount()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1628,20 +1740,11 @@ class FormSectionViewSet(BaseViewSet):
     """ViewSet for FormSection model"""
     queryset = FormSection.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_queryset(self):
-        user = self.request.user
         # Get allowed project IDs for this user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            allowed_project_ids = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        elif isinstance(user, Ba):
-            allowed_project_ids = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        elif hasattr(user, 'agency') and user.agency:
-            allowed_project_ids = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
-        else:
-            allowed_project_ids = []
+        allowed_project_ids = get_access_scope(self.request).project_ids
 
         # Check for ?project=<id> in query params
         project_id = self.request.query_params.get('project')
@@ -1687,18 +1790,8 @@ class FormSectionViewSet(BaseViewSet):
     def retrieve(self, request, *args, **kwargs):
         # Treat <pk> as project (form) id and return all form sections for that project
         project_id = kwargs.get('pk')
-        user = self.request.user
-
         # Get allowed project IDs for this user
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            allowed_project_ids = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        elif isinstance(user, Ba):
-            allowed_project_ids = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        elif hasattr(user, 'agency') and user.agency:
-            allowed_project_ids = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
-        else:
-            allowed_project_ids = []
+        allowed_project_ids = get_access_scope(self.request).project_ids
 
         try:
             project_id = int(project_id)
@@ -1716,7 +1809,7 @@ class FormSubSectionViewSet(BaseViewSet):
     """ViewSet for FormSubSection model"""
     queryset = FormSubSection.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1727,7 +1820,7 @@ class InputGroupViewSet(BaseViewSet):
     """ViewSet for InputGroup model"""
     queryset = InputGroup.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1738,7 +1831,7 @@ class InputOptionsViewSet(BaseViewSet):
     """ViewSet for InputOptions model"""
     queryset = InputOptions.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     
     def get_serializer_class(self):
         return InputOptionsListSerializer if self.action == 'list' else InputOptionsSerializer
@@ -1950,16 +2043,14 @@ class BaLoginView(APIView):
         })
 
 class ProjectHeadWithProjectsView(APIView):
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk=None):
         user = request.user
         # Allow for UAdmin and Ba
-        if isinstance(user, UAdmin):
-            agency_ids = user.agencies.values_list('id', flat=True)
-        elif isinstance(user, Ba):
-            agency_ids = [user.company] if user.company else []
+        if isinstance(user, (UAdmin, Ba)):
+            agency_ids = get_access_scope(request).agency_ids
         else:
             return Response({'detail': 'Only admins and BAs can access this endpoint.'}, status=403)
         
@@ -2061,7 +2152,7 @@ class ProjectHeadWithProjectsView(APIView):
             return Response({'success': False, 'message': 'ProjectHead not found.'}, status=404)
         # Permission check
         if isinstance(user, UAdmin):
-            allowed_agency_ids = user.agencies.values_list('id', flat=True)
+            allowed_agency_ids = get_access_scope(request).agency_ids
             if project_head.company not in allowed_agency_ids:
                 return Response({'success': False, 'message': 'You do not have permission to update this ProjectHead.'}, status=403)
         elif isinstance(user, Ba):
@@ -2092,7 +2183,7 @@ class ProjectHeadWithProjectsView(APIView):
             return Response({'success': False, 'message': 'ProjectHead not found.'}, status=404)
         # Permission check
         if isinstance(user, UAdmin):
-            allowed_agency_ids = user.agencies.values_list('id', flat=True)
+            allowed_agency_ids = get_access_scope(request).agency_ids
             if project_head.company not in allowed_agency_ids:
                 return Response({'success': False, 'message': 'You do not have permission to delete this ProjectHead.'}, status=403)
         elif isinstance(user, Ba):
@@ -2107,18 +2198,8 @@ class ProjectFormFieldsView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request, project_id=None):
         user = request.user
-        project_ids = []
-        # Admin: all projects in their agencies
-        if hasattr(user, 'agencies'):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        # BA: projects assigned to them
-        elif hasattr(user, 'company') and hasattr(user, 'id') and hasattr(user, 'is_authenticated'):
-            from .models import BaProject
-            project_ids = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        # Agency user: projects for their agency
-        elif hasattr(user, 'agency') and user.agency:
-            project_ids = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
+        # Projects in the caller's agencies, or assigned to the BA
+        project_ids = get_access_scope(request).project_ids
         # If no projects found, return empty
         if not project_ids:
             return Response({'form_fields': []})
@@ -2135,25 +2216,16 @@ class ProjectFormFieldsView(APIView):
                 return Response({'form_fields': [], 'error': 'You do not have access to this project'}, status=403)
             project_ids = [pid]
         # Get all form fields for these projects
-        form_fields = ProjectAssoc.objects.filter(project__in=project_ids).order_by('project', 'rank')
-        serializer = ProjectAssocNestedSerializer(form_fields, many=True)
+        form_fields = list(ProjectAssoc.objects.filter(project__in=project_ids).order_by('project', 'rank'))
+        input_options = group_input_options([field.id for field in form_fields])
+        serializer = ProjectAssocNestedSerializer(form_fields, many=True, context={'input_options': input_options})
         return Response({'form_fields': serializer.data})
 
     def post(self, request, project_id=None):
         user = request.user
         data = request.data.copy()
-        project_ids = []
-        # Admin: all projects in their agencies
-        if hasattr(user, 'agencies'):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        # BA: projects assigned to them
-        elif hasattr(user, 'company') and hasattr(user, 'id') and hasattr(user, 'is_authenticated'):
-            from .models import BaProject
-            project_ids = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        # Agency user: projects for their agency
-        elif hasattr(user, 'agency') and user.agency:
-            project_ids = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
+        # Projects in the caller's agencies, or assigned to the BA
+        project_ids = get_access_scope(request).project_ids
         # If no projects found, return error
         if not project_ids:
             return Response({'success': False, 'message': 'No accessible projects found.'}, status=403)
@@ -2173,7 +2245,7 @@ class ProjectFormFieldsView(APIView):
         else:
             # If only one project, use it
             if len(project_ids) == 1:
-                pid = project_ids[0]
+                pid = next(iter(project_ids))
             else:
                 return Response({'success': False, 'message': 'Multiple projects available. Please specify project.'}, status=400)
         data['project'] = pid
@@ -2193,15 +2265,7 @@ class ProjectFormFieldsView(APIView):
             return Response({'success': False, 'message': 'Form field not found.'}, status=404)
         # Check project access
         project_id = form_field.project
-        allowed_projects = []
-        if hasattr(user, 'agencies'):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            allowed_projects = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        elif hasattr(user, 'company') and hasattr(user, 'id') and hasattr(user, 'is_authenticated'):
-            from .models import BaProject
-            allowed_projects = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        elif hasattr(user, 'agency') and user.agency:
-            allowed_projects = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
+        allowed_projects = get_access_scope(request).project_ids
         if project_id not in allowed_projects:
             return Response({'success': False, 'message': 'You do not have access to this project.'}, status=403)
         serializer = ProjectAssocSerializer(form_field, data=request.data, partial=True)
@@ -2223,15 +2287,7 @@ class ProjectFormFieldsView(APIView):
             return Response({'success': False, 'message': 'Form field not found.'}, status=404)
         # Check project access
         project_id = form_field.project
-        allowed_projects = []
-        if hasattr(user, 'agencies'):
-            agency_ids = user.agencies.values_list('id', flat=True)
-            allowed_projects = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        elif hasattr(user, 'company') and hasattr(user, 'id') and hasattr(user, 'is_authenticated'):
-            from .models import BaProject
-            allowed_projects = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        elif hasattr(user, 'agency') and user.agency:
-            allowed_projects = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
+        allowed_projects = get_access_scope(request).project_ids
         if project_id not in allowed_projects:
             return Response({'success': False, 'message': 'You do not have access to this project.'}, status=403)
         form_field.delete()
@@ -2241,16 +2297,7 @@ class UnifiedFormFieldView(APIView):
     permission_classes = [IsAuthenticated]
 
     def _get_allowed_projects_for_user(self, user):
-        project_ids = []
-        if hasattr(user, 'agencies'): # UAdmin
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        elif hasattr(user, 'company') and hasattr(user, 'id') and hasattr(user, 'is_authenticated'): # BA
-            from .models import BaProject
-            project_ids = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        elif hasattr(user, 'agency') and user.agency: # Regular User
-            project_ids = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
-        return project_ids
+        return get_access_scope(self.request).project_ids
 
     def get(self, request, id):
         """GET all form fields for a given form_id (project_id)"""
@@ -2261,8 +2308,9 @@ class UnifiedFormFieldView(APIView):
         if form_id not in allowed_projects:
             return Response({'success': False, 'message': 'You do not have access to this project.'}, status=403)
         
-        form_fields = ProjectAssoc.objects.filter(project=form_id).order_by('rank')
-        serializer = ProjectAssocNestedSerializer(form_fields, many=True)
+        form_fields = list(ProjectAssoc.objects.filter(project=form_id).order_by('rank'))
+        input_options = group_input_options([field.id for field in form_fields])
+        serializer = ProjectAssocNestedSerializer(form_fields, many=True, context={'input_options': input_options})
         return Response({'success': True, 'form_fields': serializer.data})
 
     def post(self, request, id):
@@ -2324,16 +2372,7 @@ class UnifiedFormSectionView(APIView):
     permission_classes = [IsAuthenticated]
 
     def _get_allowed_projects_for_user(self, user):
-        project_ids = []
-        if hasattr(user, 'agencies'): # UAdmin
-            agency_ids = user.agencies.values_list('id', flat=True)
-            project_ids = list(Project.objects.filter(company__in=agency_ids).values_list('id', flat=True))
-        elif hasattr(user, 'company') and hasattr(user, 'id') and hasattr(user, 'is_authenticated'): # BA
-            from .models import BaProject
-            project_ids = list(BaProject.objects.filter(ba_id=user.id).values_list('project_id', flat=True))
-        elif hasattr(user, 'agency') and user.agency: # Regular User
-            project_ids = list(Project.objects.filter(company=user.agency.id).values_list('id', flat=True))
-        return project_ids
+        return get_access_scope(self.request).project_ids
 
     def get(self, request, id):
         """GET all form sections for a given form_id (project_id)"""
@@ -2465,7 +2504,7 @@ class UnifiedFormView(APIView):
 
 class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
 
     def get(self, request):
         user = request.user
@@ -2503,9 +2542,36 @@ class ProfileView(APIView):
 
 class SubmitFormView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
+
+    def existing_response(self, request, original):
+        """The stored submission for a retried submission_uuid; 409 if it belongs to someone else"""
+        if not owns_submission(request.user, original):
+            return Response({
+                'success': False,
+                'message': 'Invalid data provided',
+                'data': {'submission_uuid': ['Already used by another submission.']}
+            }, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'success': True,
+            'message': 'Form already submitted',
+            'data': FormSubmissionSerializer(original, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
 
     def post(self, request):
+        if wants_async(request):
+            return self._enqueue(request)
+
+        # A retry of a submission that was already stored gets the original back,
+        # without validating or writing again
+        try:
+            submission_uuid = uuid.UUID(str(request.data.get('submission_uuid') or ''))
+        except ValueError:
+            submission_uuid = None
+        original = find_submission(submission_uuid)
+        if original is not None:
+            return self.existing_response(request, original)
+
         serializer = FormSubmissionSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             try:
@@ -2513,8 +2579,10 @@ class SubmitFormView(APIView):
                 user = request.user
                 project_id = serializer.validated_data.get('project').id
                 
+                allowed_project_ids = get_access_scope(request).project_ids
+
                 if isinstance(user, Ba):
-                    if not BaProject.objects.filter(ba_id=user.id, project_id=project_id).exists():
+                    if project_id not in allowed_project_ids:
                         return Response({
                             'success': False,
                             'message': 'Access Denied',
@@ -2523,9 +2591,7 @@ class SubmitFormView(APIView):
                 
                 # Check if the user is a 'UAdmin' and has access to the project
                 elif isinstance(user, UAdmin):
-                    admin_agencies = user.agencies.all()
-                    agency_ids = [agency.id for agency in admin_agencies]
-                    if not Project.objects.filter(id=project_id, company__in=agency_ids).exists():
+                    if project_id not in allowed_project_ids:
                         return Response({
                             'success': False,
                             'message': 'Access Denied',
@@ -2534,14 +2600,22 @@ class SubmitFormView(APIView):
 
                 # Check if the user is a standard 'User' and has access to the project
                 elif isinstance(user, User):
-                    if not (user.agency and Project.objects.filter(id=project_id, company=user.agency.id).exists()):
+                    if project_id not in allowed_project_ids:
                          return Response({
                             'success': False,
                             'message': 'Access Denied',
                             'data': {'errors': 'This User does not have access to the specified project.'}
                         }, status=status.HTTP_403_FORBIDDEN)
 
-                submission = serializer.save(user=user)
+                try:
+                    with transaction.atomic():
+                        submission = serializer.save(user=user)
+                except IntegrityError:
+                    # A concurrent retry stored the same submission_uuid first
+                    submission = find_submission(serializer.validated_data.get('submission_uuid'))
+                    if submission is None:
+                        raise
+                    return self.existing_response(request, submission)
                 
                 # Prepare the response data, using the serializer's to_representation method
                 response_data = FormSubmissionSerializer(submission, context={'request': request}).data
@@ -2565,68 +2639,310 @@ class SubmitFormView(APIView):
             'data': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    def _enqueue(self, request):
+        """Check the submission's shape only and queue it; access and writes happen in the worker"""
+        data = request.data
+        item = {
+            'idempotency_key': data.get('submission_uuid') or str(uuid.uuid4()),
+            'project': data.get('project'),
+            'form_section_id': data.get('form_section_id'),
+            'answers': data.get('answers'),
+        }
+        serializer = BulkFormSubmissionItemSerializer(data=item)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid data provided',
+                'data': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return queued_response(request, [item])
+
+
+def submitter_required_response():
+    """403 for BAs and admins, which cannot own a FormSubmission (see can_submit)"""
+    return Response({
+        'success': False,
+        'message': 'Access Denied',
+        'data': {'errors': SUBMITTER_REQUIRED}
+    }, status=status.HTTP_403_FORBIDDEN)
+
+
+def queued_response(request, items):
+    """Queue submission items and answer 202 with the ticket to poll"""
+    if not can_submit(request.user):
+        return submitter_required_response()
+    try:
+        ticket = enqueue_submissions(request.user, items)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred during submission',
+            'data': {'errors': str(e)}
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Without a Celery broker, the queue is drained by a thread in one elected worker
+    start_periodic('submission-queue', getattr(settings, 'SUBMISSION_QUEUE_POLL_INTERVAL', 5), drain_queue)
+    return Response({
+        'success': True,
+        'message': 'Submission queued',
+        'data': {
+            'ticket': ticket,
+            'status': 'queued',
+            'count': len(items),
+            'status_url': request.build_absolute_uri(reverse('submission-ticket', args=[ticket])),
+        }
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+class BulkSubmitFormView(APIView):
+    """
+    Accepts a batch of form submissions in one request, e.g. a device syncing the forms
+    it captured offline. Body: {"submissions": [{"idempotency_key", "project",
+    "form_section_id", "answers"}, ...]} or the bare list, where idempotency_key is a
+    client-generated UUID stored as the submission's submission_uuid. Access is checked
+    once per distinct project and valid items are inserted in one transaction; the
+    response carries a result per item, matched to the client's idempotency keys, and
+    items already stored by an earlier upload come back as 'existing'.
+
+    Only User accounts can submit: FormSubmission.user points at a User, so BA and admin
+    tokens get a single 403 for the whole batch. BA devices sync through a User account.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [MultiTokenAuthentication]
+
+    def post(self, request):
+        if not can_submit(request.user):
+            return submitter_required_response()
+        items = request.data.get('submissions') if isinstance(request.data, dict) else request.data
+        max_items = getattr(settings, 'BULK_SUBMISSION_MAX_ITEMS', 1000)
+        if not isinstance(items, list) or not items:
+            return Response({
+                'success': False,
+                'message': 'Invalid data provided',
+                'data': {'errors': 'Expected a non-empty list of submissions.'}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > max_items:
+            return Response({
+                'success': False,
+                'message': 'Invalid data provided',
+                'data': {'errors': f'At most {max_items} submissions can be sent per request.'}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if wants_async(request):
+            errors = {
+                index: serializer.errors
+                for index, serializer in enumerate(BulkFormSubmissionItemSerializer(data=item) for item in items)
+                if not serializer.is_valid()
+            }
+            if errors:
+                return Response({
+                    'success': False,
+                    'message': 'Invalid data provided',
+                    'data': {'errors': errors}
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return queued_response(request, items)
+
+        try:
+            results = ingest_submissions(request.user, items, get_access_scope(request).project_ids)
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred during submission',
+                'data': {'errors': str(e)}
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        failed = sum(1 for result in results if result['status'] in ('invalid', 'forbidden'))
+        return Response({
+            'success': failed == 0,
+            'message': f'{created} of {len(results)} submissions saved',
+            'data': {
+                'created': created,
+                'failed': failed,
+                'results': results,
+            }
+        }, status=status.HTTP_201_CREATED if created else (
+            status.HTTP_400_BAD_REQUEST if failed else status.HTTP_200_OK
+        ))
+
+
+class SubmissionTicketView(APIView):
+    """
+    Reports the state of a queued submission ticket (queued, processing, done or failed)
+    and, once done, the per-item results. Only the principal that queued it can see it.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [MultiTokenAuthentication]
+
+    def get(self, request, ticket):
+        try:
+            data = get_ticket(request.user, ticket) if queue_enabled() else None
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred',
+                'data': {'errors': str(e)}
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if data is None:
+            return Response({
+                'success': False,
+                'message': 'Ticket not found',
+                'data': {}
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        data.pop('principal', None)
+        return Response({
+            'success': True,
+            'message': f"Ticket is {data['state']}",
+            'data': data
+        })
+
+
+class SubmissionExportView(APIView):
+    """
+    Downloads a project's form submissions as a spreadsheet, one row per submission and
+    one column per form field (named by report_display_name, in rank order).
+
+    Query Parameters:
+    - file_type: csv (default, streamed) or xlsx (needs openpyxl)
+    - start_date / end_date: submission date range (YYYY-MM-DD)
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [MultiTokenAuthentication]
+
+    def get(self, request, project_id):
+        if project_id not in get_access_scope(request).project_ids:
+            return Response({
+                'success': False,
+                'message': 'Access Denied',
+                'data': {'errors': 'You do not have access to this project.'}
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        file_type = request.query_params.get('file_type', 'csv')
+        try:
+            if file_type not in EXPORT_FORMATS:
+                raise ValidationError({'file_type': f"Use one of {', '.join(EXPORT_FORMATS)}."})
+            start_date = date_param(request.query_params, 'start_date')
+            end_date = date_param(request.query_params, 'end_date')
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'message': 'Invalid query parameters',
+                'data': {'errors': e.detail}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows = iter_submission_rows(project_id, start_date, end_date)
+            filename = f'project_{project_id}_submissions.{file_type}'
+            if file_type == 'csv':
+                response = StreamingHttpResponse(csv_chunks(rows), content_type=EXPORT_FORMATS['csv'])
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
+            try:
+                handle = xlsx_file(rows, title=f'Project {project_id}')
+            except ImportError:
+                return Response({
+                    'success': False,
+                    'message': 'XLSX export is not available on this server; use file_type=csv.',
+                    'data': {}
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return FileResponse(handle, as_attachment=True, filename=filename, content_type=EXPORT_FORMATS['xlsx'])
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred during export',
+                'data': {'errors': str(e)}
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
 class DashboardStatsView(APIView):
     """
     Provides statistics for the dashboard based on the logged-in user's permissions.
-    Returns total BA count and a list of project heads with their project and data counts.
+    Returns total BA count and a list of project heads with their project and data counts,
+    served from per-agency snapshots that are refreshed in the background.
+    Admins can pass ?fresh=1 to recompute their own agencies' snapshots instead of reading them.
     """
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        
-        accessible_project_heads = ProjectHead.objects.none()
-        total_ba_count = 0
-
-        # Determine accessible project heads and BAs based on user type
-        if isinstance(user, UAdmin):
-            admin_agencies = user.agencies.all()
-            if admin_agencies:
-                agency_ids = [a.id for a in admin_agencies]
-                accessible_project_heads = ProjectHead.objects.filter(company__in=agency_ids)
-                total_ba_count = Ba.objects.filter(company__in=agency_ids).count()
+        # A recompute scans the data tables; only admins may force one, and only for their agencies
+        fresh = isinstance(user, UAdmin) and request.query_params.get('fresh', '').lower() in ('1', 'true', 'yes')
+
+        # Without a Celery broker, snapshots are refreshed by a thread in one elected worker;
+        # with a per-process cache each worker refreshes its own
+        start_periodic(
+            'dashboard-snapshots',
+            getattr(settings, 'DASHBOARD_SNAPSHOT_INTERVAL', 300),
+            refresh_dashboard_snapshots,
+            shared=cache_is_shared(),
+        )
 
-        elif isinstance(user, Ba):
-            if hasattr(user, 'company'):
-                # A BA can see all project heads from their company
-                accessible_project_heads = ProjectHead.objects.filter(company=user.company)
-                # The BA count is just 1 for the BA themselves
-                total_ba_count = 1
-        
-        elif isinstance(user, User):
-            if hasattr(user, 'agency') and user.agency:
-                accessible_project_heads = ProjectHead.objects.filter(company=user.agency.id)
-                total_ba_count = Ba.objects.filter(company=user.agency.id).count()
+        # Agencies visible to a UAdmin (assigned agencies), a BA or a User (their own)
+        agency_ids = get_access_scope(request).agency_ids
+        snapshots = get_agency_snapshots(agency_ids, fresh=fresh) if agency_ids else {}
 
-        # Now, serialize the accessible project heads
-        project_heads_data = ProjectHeadWithProjectCountSerializer(accessible_project_heads, many=True).data
+        project_heads_data = sorted(
+            (head for snapshot in snapshots.values() for head in snapshot['project_heads']),
+            key=lambda head: head['id'],
+        )
+        if isinstance(user, Ba):
+            # The BA count is just 1 for the BA themselves
+            total_ba_count = 1
+        else:
+            total_ba_count = sum(snapshot['total_bas'] for snapshot in snapshots.values())
+        # Oldest snapshot served, so clients know how stale the figures can be
+        generated_at = min((snapshot['generated_at'] for snapshot in snapshots.values()), default=None)
 
         return Response({
             'success': True,
             'message': 'Dashboard statistics retrieved successfully.',
             'data': {
-                'total_projects': accessible_project_heads.count(),
+                'total_projects': len(project_heads_data),
                 'total_bas': total_ba_count,
-                'projects': project_heads_data
+                'projects': project_heads_data,
+                'generated_at': generated_at or timezone.now().isoformat(),
             }
         })
 
-ALLOWED_COLLECTION_TABLES = [
-    'app_data', 'saff_combined', 'coke_combined', 'airtel_combined',
-    'baims_combined', 'kspca_combined', 'redbull_outlet', 'total_kenya',
-    'coop', 'coop2'
-]
+
+def allowed_collection_tables(user):
+    """The collection tables a user may read: the holding tables of their agency or agencies"""
+    if isinstance(user, UAdmin):
+        return list(user.agencies.values_list('holding_table', flat=True).distinct())
+    if isinstance(user, Ba):
+        if user.company:
+            try:
+                # The BA's company is an agency ID
+                agency = Agency.objects.get(id=user.company)
+                if agency.holding_table:
+                    return [agency.holding_table]
+            except Agency.DoesNotExist:
+                pass
+        return []
+    if hasattr(user, 'agency') and user.agency and user.agency.holding_table:
+        return [user.agency.holding_table]
+    return []
+
 
 class CollectionView(APIView):
     """
     A view to retrieve data from a specific collection (table).
     The user must have access to the collection via their agency's holding_table.
-    Returns data as an array of arrays.
+    Returns data as an array of arrays, streams every row with ?format=ndjson|csv, or
+    as typed columns with ?format=parquet|arrow|arrows (Parquet, Arrow IPC file or stream).
+
+    Query Parameters (see CollectionQuery):
+    - columns: comma-separated columns to return
+    - project, start_date, end_date, min_id, max_id: filters
+    - cursor, page_size: keyset pagination on id
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, AdminTokenAuthentication, BaTokenAuthentication]
+    authentication_classes = [MultiTokenAuthentication]
+    renderer_classes = [
+        JSONRenderer, NDJSONRenderer, CSVRenderer, ParquetRenderer, ArrowFileRenderer, ArrowStreamRenderer
+    ]
 
     def get(self, request, collection_name, *args, **kwargs):
         # Validate that the collection name is a recognized table to prevent misuse
@@ -2636,27 +2952,8 @@ class CollectionView(APIView):
                 "message": f"Invalid or disallowed collection: {collection_name}"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        user = request.user
-        allowed_tables = []
-
-        # Determine which tables the user is allowed to see based on their role and agency
-        if isinstance(user, UAdmin):
-            allowed_tables = list(user.agencies.values_list('holding_table', flat=True).distinct())
-        elif isinstance(user, Ba):
-            if user.company:
-                try:
-                    # The BA's company is an agency ID
-                    agency = Agency.objects.get(id=user.company)
-                    if agency.holding_table:
-                        allowed_tables = [agency.holding_table]
-                except Agency.DoesNotExist:
-                    allowed_tables = []
-        elif hasattr(user, 'agency') and user.agency:
-            if user.agency.holding_table:
-                allowed_tables = [user.agency.holding_table]
-
         # Check if the requested collection is in the user's list of allowed tables
-        if collection_name not in allowed_tables:
+        if collection_name not in allowed_collection_tables(request.user):
             return Response({
                 "success": False,
                 "message": "You do not have permission to access this collection."
@@ -2664,25 +2961,141 @@ class CollectionView(APIView):
 
         # Safely fetch data using a raw query since the table name is dynamic but validated
         try:
+            # Columns and filters are checked against the table's real columns
+            query = CollectionQuery(collection_name, request.query_params)
+
+            # Export modes stream batches off a server-side cursor instead of buffering the table
+            export_format = request.query_params.get('format')
+            if export_format in STREAM_CONTENT_TYPES:
+                sql, params = query.sql(paginate=False)
+                return streaming_query_response(sql, params, export_format, filename=collection_name)
+            if export_format in COLUMNAR_CONTENT_TYPES:
+                if not columnar_available():
+                    return Response({
+                        "success": False,
+                        "message": f"{export_format} export is not available on this server; use format=csv or ndjson."
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                sql, params = query.sql(paginate=False)
+                return columnar_query_response(collection_name, sql, params, export_format, filename=collection_name)
+
             with connection.cursor() as cursor:
-                # The table name is validated against a safelist, so this is safe.
-                cursor.execute(f"SELECT * FROM {collection_name}")
-                
-                headers = [col[0] for col in cursor.description]
+                cursor.execute(*query.sql())
                 rows = cursor.fetchall()
+            rows, next_cursor = query.split_page(rows)
 
             # Convert the list of tuples from the DB into a list of lists for the JSON response
             data_as_lists = [list(row) for row in rows]
 
-            return Response({
+            response_data = {
                 "success": True,
                 "collection": collection_name,
-                "headers": headers,
+                "headers": query.columns,
                 "data": data_as_lists
-            })
+            }
+            if query.paginated:
+                response_data["next_cursor"] = next_cursor
+            return Response(response_data)
+
+        except ValidationError as e:
+            return Response({
+                "success": False,
+                "message": "Invalid query parameters",
+                "errors": e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
             return Response({
                 "success": False,
                 "message": f"An error occurred while fetching data: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def change_feed_response(source, feed):
+    rows, next_cursor, has_more = feed.page()
+    return Response({
+        "success": True,
+        "source": source,
+        "mode": feed.mode,
+        "headers": feed.columns,
+        "count": len(rows),
+        "data": rows,
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    })
+
+
+class CollectionChangesView(APIView):
+    """
+    Change feed of a collection table for incremental syncs: the rows added after a cursor
+    (or modified after it, once the table has an updated_at column), oldest first.
+    Store next_cursor and pass it back as ?cursor= on the next sync; keep paging while
+    has_more is true. Rows are only held back for in-flight transactions when the table
+    has updated_at (see ChangeFeed).
+
+    Query Parameters (see ChangeFeed):
+    - cursor: next_cursor of the previous page
+    - since: start point for tables with updated_at (date or ISO datetime)
+    - limit: rows per page
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [MultiTokenAuthentication]
+
+    def get(self, request, collection_name):
+        if collection_name not in ALLOWED_COLLECTION_TABLES:
+            return Response({
+                "success": False,
+                "message": f"Invalid or disallowed collection: {collection_name}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if collection_name not in allowed_collection_tables(request.user):
+            return Response({
+                "success": False,
+                "message": "You do not have permission to access this collection."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            feed = TableChangeFeed(collection_name, get_table_columns(collection_name), request.query_params)
+            return change_feed_response(collection_name, feed)
+        except ValidationError as e:
+            return Response({
+                "success": False,
+                "message": "Invalid query parameters",
+                "errors": e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": f"An error occurred while fetching changes: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SubmissionChangesView(APIView):
+    """
+    Change feed of the form submissions of the projects the caller can access, paged like
+    CollectionChangesView. ?project= narrows it to one project. Submissions younger than
+    CHANGE_FEED_SETTLE_SECONDS are held back until they can no longer be overtaken.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [MultiTokenAuthentication]
+
+    def get(self, request):
+        try:
+            project_ids = get_access_scope(request).project_ids
+            project_id = int_param(request.query_params, 'project')
+            if project_id is not None:
+                project_ids = project_ids & {project_id}
+            feed = QuerySetChangeFeed(
+                FormSubmission.objects.filter(project_id__in=project_ids), request.query_params,
+                settle_column='submitted_at',
+            )
+            return change_feed_response('form_submission', feed)
+        except ValidationError as e:
+            return Response({
+                "success": False,
+                "message": "Invalid query parameters",
+                "errors": e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": f"An error occurred while fetching changes: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,8 @@
+# Load the Celery app when Celery is installed so shared tasks bind to it;
+# without it, periodic jobs fall back to the in-process scheduler (apis/scheduler.py).
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -0,0 +1,10 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'baims.settings')
+
+app = Celery('baims')
+# Every CELERY_* Django setting configures the app
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -109,9 +109,8 @@ REST_FRAMEWORK = {
     # Default authentication classes
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'apis.authentication.TokenAuthentication',
-        'apis.authentication.AdminTokenAuthentication',
-        'apis.authentication.BaTokenAuthentication',
+        # Parses the Authorization header once and routes Token / Admin_Token / Ba_Token
+        'apis.authentication.MultiTokenAuthentication',
     ],
     # Default permission classes
     'DEFAULT_PERMISSION_CLASSES': [
@@ -134,6 +133,111 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'apis.views.custom_exception_handler',
 }
 
+# Authentication token cache (in-process, per worker). Deleting a token only clears the
+# cache of the worker that handled the delete, so keep the TTL short.
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+TOKEN_CACHE_MAX_ENTRIES = config('TOKEN_CACHE_MAX_ENTRIES', default=10000, cast=int)
+
+# Per-principal access scope cache (agencies, projects and BAs a caller may see)
+ACCESS_SCOPE_CACHE_TTL = config('ACCESS_SCOPE_CACHE_TTL', default=30, cast=int)
+ACCESS_SCOPE_CACHE_MAX_ENTRIES = config('ACCESS_SCOPE_CACHE_MAX_ENTRIES', default=5000, cast=int)
+
+# Cache shared by all workers when REDIS_URL is set (form definitions, dashboard snapshots),
+# otherwise a per-process in-memory cache
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Background jobs run on Celery when a broker is configured (defaults to REDIS_URL),
+# otherwise on a daemon thread inside one web worker per host (elected through a lock file)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL)
+CELERY_TASK_IGNORE_RESULT = True
+
+# Per-agency dashboard snapshots: refreshed every DASHBOARD_SNAPSHOT_INTERVAL seconds and
+# dropped from the cache after DASHBOARD_SNAPSHOT_TIMEOUT if refreshes stop. With the
+# per-process cache every web worker refreshes its own copy instead of one elected worker
+DASHBOARD_SNAPSHOT_INTERVAL = config('DASHBOARD_SNAPSHOT_INTERVAL', default=300, cast=int)
+DASHBOARD_SNAPSHOT_TIMEOUT = config('DASHBOARD_SNAPSHOT_TIMEOUT', default=900, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'refresh-dashboard-snapshots': {
+        'task': 'apis.tasks.refresh_dashboard_snapshots',
+        'schedule': DASHBOARD_SNAPSHOT_INTERVAL,
+    },
+}
+
+# Seconds a rendered form definition stays cached. Edits bump its version in the cache,
+# which only reaches every worker when the cache is shared (REDIS_URL set). With the
+# per-process cache the timeout is capped at FORM_DEFINITION_LOCAL_CACHE_TIMEOUT, which
+# bounds how long other workers may serve a definition from before an edit.
+FORM_DEFINITION_CACHE_TIMEOUT = config('FORM_DEFINITION_CACHE_TIMEOUT', default=86400, cast=int)
+FORM_DEFINITION_LOCAL_CACHE_TIMEOUT = config('FORM_DEFINITION_LOCAL_CACHE_TIMEOUT', default=30, cast=int)
+
+# Keep per-project, per-day row counts in the data_rollup table and serve dashboard totals
+# from it. Off by default: after the table is migrated, turn it on and then run
+# `manage.py rebuild_data_rollups` once so the totals start out correct.
+DATA_ROLLUPS_ENABLED = config('DATA_ROLLUPS_ENABLED', default=False, cast=bool)
+
+# Project FormSubmission.answers into the submission_answer table (typed, indexed values)
+# on write. Off by default: after the table is migrated, turn it on and then run
+# `manage.py backfill_submission_answers` once for the existing submissions.
+ANSWER_PROJECTION_ENABLED = config('ANSWER_PROJECTION_ENABLED', default=False, cast=bool)
+
+# Upper bound for ?page_size= on keyset-paginated list endpoints
+KEYSET_PAGE_SIZE_MAX = config('KEYSET_PAGE_SIZE_MAX', default=500, cast=int)
+
+# Seconds a CachedCount list total may be reused before it is recomputed
+COUNT_CACHE_TTL = config('COUNT_CACHE_TTL', default=60, cast=int)
+
+# Rows per page of the change feeds (collection/<table>/changes/, submissions/changes/)
+CHANGE_FEED_PAGE_SIZE = config('CHANGE_FEED_PAGE_SIZE', default=1000, cast=int)
+CHANGE_FEED_MAX_PAGE_SIZE = config('CHANGE_FEED_MAX_PAGE_SIZE', default=10000, cast=int)
+# Rows written more recently than this are left for the next sync, so rows of transactions
+# still committing are not overtaken by the cursor (0 turns the margin off)
+CHANGE_FEED_SETTLE_SECONDS = config('CHANGE_FEED_SETTLE_SECONDS', default=60, cast=int)
+
+# Most groups returned by /data/aggregate/
+AGGREGATE_MAX_GROUPS = config('AGGREGATE_MAX_GROUPS', default=10000, cast=int)
+
+# Rows fetched per round trip when streaming exports off a server-side cursor
+STREAM_BATCH_SIZE = config('STREAM_BATCH_SIZE', default=2000, cast=int)
+# Rows per Parquet row group / Arrow record batch in columnar exports (?format=parquet|arrow|arrows)
+COLUMNAR_BATCH_SIZE = config('COLUMNAR_BATCH_SIZE', default=50000, cast=int)
+
+# Most submissions accepted by one bulk submission request, and rows per INSERT
+BULK_SUBMISSION_MAX_ITEMS = config('BULK_SUBMISSION_MAX_ITEMS', default=1000, cast=int)
+BULK_INSERT_BATCH_SIZE = config('BULK_INSERT_BATCH_SIZE', default=500, cast=int)
+# Most rows accepted by one bulk-create request on the data viewsets
+BULK_CREATE_MAX_ROWS = config('BULK_CREATE_MAX_ROWS', default=50000, cast=int)
+
+# Opt-in accept-and-enqueue mode for form submissions (?async=1 or `Prefer: respond-async`):
+# requests are queued in Redis (SUBMISSION_QUEUE_URL) or, without it, a local SQLite file
+# and written by `manage.py drain_submission_queue`, Celery beat or an in-process thread
+SUBMISSION_QUEUE_ENABLED = config('SUBMISSION_QUEUE_ENABLED', default=False, cast=bool)
+SUBMISSION_QUEUE_URL = config('SUBMISSION_QUEUE_URL', default=REDIS_URL)
+SUBMISSION_QUEUE_PATH = config('SUBMISSION_QUEUE_PATH', default=os.path.join(BASE_DIR, 'submission_queue.sqlite3'))
+SUBMISSION_QUEUE_BATCH_SIZE = config('SUBMISSION_QUEUE_BATCH_SIZE', default=50, cast=int)
+SUBMISSION_QUEUE_POLL_INTERVAL = config('SUBMISSION_QUEUE_POLL_INTERVAL', default=5, cast=int)
+# Seconds after which a claimed ticket that never finished is taken to be orphaned and queued again
+SUBMISSION_QUEUE_VISIBILITY_TIMEOUT = config('SUBMISSION_QUEUE_VISIBILITY_TIMEOUT', default=600, cast=int)
+# Seconds a finished ticket can still be polled
+SUBMISSION_TICKET_TTL = config('SUBMISSION_TICKET_TTL', default=604800, cast=int)
+if SUBMISSION_QUEUE_ENABLED:
+    CELERY_BEAT_SCHEDULE['drain-submission-queue'] = {
+        'task': 'apis.tasks.drain_submission_queue',
+        'schedule': SUBMISSION_QUEUE_POLL_INTERVAL,
+    }
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
 ]